@@ -0,0 +1,68 @@
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from intro_to_python import ENGINES, count_letters, get_path, read_names
+
+
+def generate_names_file(filepath: Path, number_of_names: int, seed: int = 0) -> None:
+    """Writes a synthetic file of comma-separated names, sampled from Data/Navneliste.txt.
+
+    A few names are given danish letters so the non-ASCII code paths are exercised as well.
+
+    Args:
+        filepath: The path of the file to write.
+        number_of_names: The number of names in the file.
+        seed: The seed of the random number generator.
+    """
+    rng = random.Random(seed)
+    sample_names = [name.capitalize() for name in read_names(get_path("../Data/Navneliste.txt"))]
+    sample_names += ["Søren", "Åse", "Æbbe", "Bjørn", "Kåre"]
+
+    with open(filepath, "w") as file:
+        names_left = number_of_names
+        while names_left > 0:
+            batch_size = min(names_left, 100_000)
+            file.write(",".join(rng.choices(sample_names, k=batch_size)))
+            names_left -= batch_size
+            if names_left > 0:
+                file.write(",")
+
+
+def time_engine(filepath: Path, engine: str, workers: int | None, repeat: int) -> tuple[float, dict[str, int]]:
+    """Returns the best wall time out of repeat runs of an engine and the letter count it produced."""
+    best_time = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        letter_count = count_letters(filepath, engine, workers)
+        best_time = min(best_time, time.perf_counter() - start)
+    return best_time, letter_count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark of the letter counting engines")
+    parser.add_argument("-n", "--names", type=int, default=2_000_000, help="number of names in the synthetic file (default: 2000000)")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="number of runs per engine, the best is reported (default: 3)")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="number of processes used by the parallel engine (default: number of CPUs)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        filepath = Path(temp_dir) / "names.txt"
+        generate_names_file(filepath, args.names)
+        size_in_mb = filepath.stat().st_size / 1024**2
+        print(f"Counting letters in {args.names} names ({size_in_mb:.1f} MB), best of {args.repeat} runs")
+
+        baseline_time, baseline_count = time_engine(filepath, "python", args.workers, args.repeat)
+        for engine in ENGINES:
+            if engine == "python":
+                elapsed, letter_count = baseline_time, baseline_count
+            else:
+                elapsed, letter_count = time_engine(filepath, engine, args.workers, args.repeat)
+            assert letter_count == baseline_count, f"{engine} engine disagrees with the python engine"
+            print(f"{engine:>10}: {elapsed:7.3f} s  {size_in_mb / elapsed:8.1f} MB/s  speedup {baseline_time / elapsed:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,53 @@
 from pathlib import Path
 import argparse
+import codecs
+import heapq
+import locale
 import os
-from wordcloud import WordCloud
+import pickle
+import sys
+import tempfile
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from functools import cached_property
+from itertools import islice
+from typing import Any, TextIO
+
+# Makes the shared modules in the project root importable when the script is run directly
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common.cache import ResultCache, add_cache_arguments
+from common.chunking import split_file
+from common.imports import lazy_import
+from common.profiling import add_profile_arguments, profiled, start_profiler, stop_profiler
+
+np = lazy_import("numpy")
+
+# Number of characters read from the names file at a time
+CHUNK_SIZE = 1024 * 1024
+ENGINES = ("python", "vectorized", "parallel")
+# Number of names sorted in memory at a time by external_sort and the number of runs merged at once
+RUN_SIZE = 1_000_000
+MAX_OPEN_RUNS = 256
+RUN_BATCH_SIZE = 10_000
+# Sort key of each of the orders the names can be shown in
+SORT_KEYS = {"alphabetical": None, "length": len}
+
+def read_names(filepath: Path, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """Reads a file containing names separated by commas and yields the names one at a time.
+
+    The file is read in chunks of chunk_size characters, so memory use stays constant no matter
+    how large the file is. Names that are split across two chunks are joined before being yielded.
 
-def read_names(filepath: Path) -> list[str]:
-    """Reads a file containing names separated by commas and returns a list of names.
-    
     Args:
         filepath: The Path object pointing to the file containing comma-separated names.
-        
+        chunk_size: The number of characters read from the file at a time.
+
     Returns:
-        A list of cleaned, lowercase names with whitespace stripped.
-        
+        An iterator of cleaned, lowercase names with whitespace stripped.
+
     Raises:
         FileNotFoundError: If the specified file does not exist.
-        ValueError: If the file is empty or contains no valid names.
+        ValueError: If the file is empty or contains no valid names, raised when the iterator is consumed.
         IOError: If there are issues reading the file.
     """
     if not filepath.exists():
@@ -23,43 +56,440 @@ def read_names(filepath: Path) -> list[str]:
         raise ValueError(f"Path is not a file: {filepath}")
     if not os.access(filepath, os.R_OK):
         raise IOError(f"No read permissions for file: {filepath}")
-    
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be positive, got: {chunk_size}")
+
+    return _stream_names(filepath, chunk_size)
+
+
+@profiled("read_names")
+def _stream_names(filepath: Path, chunk_size: int) -> Iterator[str]:
+    """Yields the comma-separated names of a file chunk by chunk, see read_names."""
+    has_content = False
+    remainder = ""
     with open(filepath, "r") as file:
-        file_content = file.read().strip()
+        while chunk := file.read(chunk_size):
+            if not has_content and not chunk.isspace():
+                has_content = True
+            # The last element may be the beginning of a name continuing in the next chunk
+            *names, remainder = (remainder + chunk).split(",")
+            for name in names:
+                yield name.strip().lower()
 
-    if not file_content:
+    if not has_content:
         raise ValueError(f"File is empty: {filepath}")
-    
-    list_of_names = file_content.lower().split(",")
-    # Removes whitespace around individual names by looping over each name
-    stripped_list_of_names = [name.strip() for name in list_of_names]
 
-    return stripped_list_of_names
+    yield remainder.strip().lower()
 
 
-def count_letters_in_names(names: list[str]) -> dict[str, int]:
-    """Counts the occurrences of each letter in the list of names.
-    
+def count_letters_in_names(names: Iterable[str]) -> dict[str, int]:
+    """Counts the occurrences of each letter in the names.
+
     Args:
-        names: A list of name strings
-        
+        names: An iterable of name strings, e.g. a list or the iterator returned by read_names
+
     Returns:
         A dictionary mapping each letter to its count across all names.
-        
+
     Raises:
-        ValueError: If the names list is empty.
+        ValueError: If there are no names.
     """
-    if not names:
-        raise ValueError(f"names list can't be empty")
+    has_names = False
     letter_count = {}
     for name in names:
+        has_names = True
         for letter in name:
             # Skips empty strings and non-alphabetical characters
             if letter.isalpha(): 
                 letter_count[letter] = letter_count.get(letter, 0) + 1
+    if not has_names:
+        raise ValueError(f"names list can't be empty")
     return letter_count
 
 
+def count_letters_in_text(text: str) -> dict[str, int]:
+    """Counts the occurrences of each letter in a block of text using NumPy.
+
+    ASCII text is counted with a single bincount over its bytes. Other text is converted to an array
+    of Unicode code points, code points below 256 are counted with bincount and the rest (rare in names)
+    with np.unique. Only the distinct characters are then checked with str.isalpha.
+
+    Args:
+        text: The text to count letters in.
+
+    Returns:
+        A dictionary mapping each letter to its count in the text.
+    """
+    if text.isascii():
+        code_counts = np.bincount(np.frombuffer(text.encode("ascii"), dtype=np.uint8), minlength=128)
+        distinct_codes = np.flatnonzero(code_counts)
+        counts = code_counts[distinct_codes]
+    else:
+        code_points = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+        is_latin1 = code_points < 256
+        latin1_counts = np.bincount(code_points[is_latin1], minlength=256)
+        other_codes, other_counts = np.unique(code_points[~is_latin1], return_counts=True)
+        distinct_codes = np.concatenate([np.flatnonzero(latin1_counts), other_codes])
+        counts = np.concatenate([latin1_counts[latin1_counts > 0], other_counts])
+
+    letter_count = {}
+    for code, count in zip(distinct_codes.tolist(), counts.tolist()):
+        letter = chr(code)
+        if letter.isalpha():
+            letter_count[letter] = count
+    return letter_count
+
+
+def merge_letter_counts(letter_counts: Iterable[dict[str, int]]) -> dict[str, int]:
+    """Merges several letter counts into one by summing the counts of each letter.
+
+    Args:
+        letter_counts: An iterable of dictionaries mapping letters to counts.
+
+    Returns:
+        A dictionary mapping each letter to its total count.
+    """
+    merged_count = {}
+    for letter_count in letter_counts:
+        for letter, count in letter_count.items():
+            merged_count[letter] = merged_count.get(letter, 0) + count
+    return merged_count
+
+
+def count_letters_vectorized(names: Iterable[str], batch_size: int = CHUNK_SIZE) -> dict[str, int]:
+    """Counts the occurrences of each letter in the names, gives the same result as count_letters_in_names.
+
+    The names are joined into batches of roughly batch_size characters which are counted in bulk by
+    count_letters_in_text, instead of looking at one character at a time in Python.
+
+    Args:
+        names: An iterable of name strings, e.g. a list or the iterator returned by read_names
+        batch_size: The approximate number of characters counted at a time.
+
+    Returns:
+        A dictionary mapping each letter to its count across all names.
+
+    Raises:
+        ValueError: If there are no names.
+    """
+    has_names = False
+    batch = []
+    batch_length = 0
+    partial_counts = []
+    for name in names:
+        has_names = True
+        batch.append(name)
+        batch_length += len(name)
+        if batch_length >= batch_size:
+            partial_counts.append(count_letters_in_text("".join(batch)))
+            batch = []
+            batch_length = 0
+    if not has_names:
+        raise ValueError(f"names list can't be empty")
+    partial_counts.append(count_letters_in_text("".join(batch)))
+    return merge_letter_counts(partial_counts)
+
+
+def _count_letters_in_byte_range(filepath: Path, start: int, end: int) -> tuple[dict[str, int], bool]:
+    """Counts the letters between two byte offsets of a names file, used by the worker processes.
+
+    Returns:
+        The letter count of the range and whether the range contained anything but whitespace.
+    """
+    decoder = codecs.getincrementaldecoder(locale.getpreferredencoding(False))()
+    has_content = False
+    partial_counts = []
+    with open(filepath, "rb") as file:
+        file.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            block = file.read(min(CHUNK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            # The incremental decoder keeps multi-byte characters split between two blocks intact
+            text = decoder.decode(block, final=remaining <= 0).lower()
+            if not has_content and text and not text.isspace():
+                has_content = True
+            partial_counts.append(count_letters_in_text(text))
+    return merge_letter_counts(partial_counts), has_content
+
+
+def count_letters_parallel(filepath: Path, workers: int | None = None) -> dict[str, int]:
+    """Counts the occurrences of each letter in a names file using a pool of processes.
+
+    The file is split into byte ranges at commas, each range is counted by count_letters_in_text in a
+    separate process and the partial counts are merged. Gives the same result as count_letters_in_names
+    on the names returned by read_names.
+
+    Args:
+        filepath: The Path object pointing to the file containing comma-separated names.
+        workers: The number of processes to use, defaults to the number of CPUs.
+
+    Returns:
+        A dictionary mapping each letter to its count across all names.
+
+    Raises:
+        ValueError: If the file is empty or the number of workers isn't positive.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError(f"workers must be positive, got: {workers}")
+
+    # Files smaller than a chunk per worker aren't worth splitting
+    number_of_parts = max(1, min(workers, filepath.stat().st_size // CHUNK_SIZE))
+    # Splitting at commas means no name, and no multi-byte character, is cut in two
+    byte_ranges = split_file(filepath, number_of_parts, delimiter=b",")
+    if len(byte_ranges) == 1:
+        results = [_count_letters_in_byte_range(filepath, *byte_ranges[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            starts, ends = zip(*byte_ranges)
+            results = list(executor.map(_count_letters_in_byte_range, [filepath] * len(byte_ranges), starts, ends))
+
+    if not any(has_content for _, has_content in results):
+        raise ValueError(f"File is empty: {filepath}")
+    return merge_letter_counts(letter_count for letter_count, _ in results)
+
+
+@profiled("count_letters")
+def count_letters(filepath: Path, engine: str = "python", workers: int | None = None) -> dict[str, int]:
+    """Counts the occurrences of each letter in a names file with the chosen counting engine.
+
+    Args:
+        filepath: The Path object pointing to the file containing comma-separated names.
+        engine: One of ENGINES, "python" counts one character at a time, "vectorized" counts in bulk
+            with NumPy and "parallel" splits the file across a pool of processes.
+        workers: The number of processes used by the parallel engine.
+
+    Returns:
+        A dictionary mapping each letter to its count across all names.
+
+    Raises:
+        ValueError: If the engine is unknown or the file is empty.
+    """
+    if engine == "python":
+        return count_letters_in_names(read_names(filepath))
+    if engine == "vectorized":
+        return count_letters_vectorized(read_names(filepath))
+    if engine == "parallel":
+        read_names(filepath) # validates the file before starting any processes
+        return count_letters_parallel(filepath, workers)
+    raise ValueError(f"Unknown engine: {engine}, expected one of {ENGINES}")
+
+
+def _write_run(names: list[str], run_path: Path) -> None:
+    """Writes a sorted run of names to a temporary file as a sequence of pickled batches."""
+    with open(run_path, "wb") as file:
+        for start in range(0, len(names), RUN_BATCH_SIZE):
+            pickle.dump(names[start:start + RUN_BATCH_SIZE], file, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _read_run(run_path: Path) -> Iterator[str]:
+    """Yields the names of a run written by _write_run, one batch in memory at a time."""
+    with open(run_path, "rb") as file:
+        while True:
+            try:
+                yield from pickle.load(file)
+            except EOFError:
+                return
+
+
+def external_sort(names: Iterable[str], key: Callable[[str], Any] | None = None, run_size: int = RUN_SIZE,
+                  temp_dir: Path | None = None) -> Iterator[str]:
+    """Sorts names that don't fit in memory and yields them in sorted order.
+
+    The names are sorted in runs of run_size names which are spilled to temporary files, the runs are
+    then merged with heapq.merge. Like sorted, the sort is stable, so names with equal keys keep their
+    order from the input.
+
+    Args:
+        names: An iterable of name strings, e.g. the iterator returned by read_names
+        key: A function computing the sort key of a name, the names themselves are compared if None.
+        run_size: The maximum number of names kept in memory at a time.
+        temp_dir: The directory the temporary files are created in, defaults to the system temp directory.
+
+    Returns:
+        An iterator of the names in sorted order.
+
+    Raises:
+        ValueError: If run_size isn't positive.
+    """
+    if run_size < 1:
+        raise ValueError(f"run_size must be positive, got: {run_size}")
+    return _merge_sorted_runs(names, key, run_size, temp_dir)
+
+
+def _merge_sorted_runs(names: Iterable[str], key: Callable[[str], Any] | None, run_size: int,
+                       temp_dir: Path | None) -> Iterator[str]:
+    """Yields the names sorted by spilling and merging runs, see external_sort."""
+    with tempfile.TemporaryDirectory(dir=temp_dir, prefix="external_sort_") as run_dir:
+        run_paths = []
+        names = iter(names)
+        while run := list(islice(names, run_size)):
+            run.sort(key=key)
+            if not run_paths and len(run) < run_size:
+                # Everything fits in a single run, so nothing has to be spilled to disk
+                yield from run
+                return
+            run_path = Path(run_dir) / f"run_{len(run_paths)}"
+            _write_run(run, run_path)
+            run_paths.append(run_path)
+
+        # Merges the runs in several passes if there are too many to keep open at once, runs are
+        # merged in their original order so the sort stays stable
+        merge_pass = 0
+        while len(run_paths) > MAX_OPEN_RUNS:
+            merged_paths = []
+            for start in range(0, len(run_paths), MAX_OPEN_RUNS):
+                group = run_paths[start:start + MAX_OPEN_RUNS]
+                merged_path = Path(run_dir) / f"merged_{merge_pass}_{len(merged_paths)}"
+                with open(merged_path, "wb") as file:
+                    merged_names = heapq.merge(*(_read_run(run_path) for run_path in group), key=key)
+                    while batch := list(islice(merged_names, RUN_BATCH_SIZE)):
+                        pickle.dump(batch, file, protocol=pickle.HIGHEST_PROTOCOL)
+                for run_path in group:
+                    run_path.unlink()
+                merged_paths.append(merged_path)
+            run_paths = merged_paths
+            merge_pass += 1
+
+        yield from heapq.merge(*(_read_run(run_path) for run_path in run_paths), key=key)
+
+
+def top_names(names: Iterable[str], number_of_names: int, key: Callable[[str], Any] | None = None) -> list[str]:
+    """Returns the first names in sorted order without sorting all of them.
+
+    Only number_of_names names are kept in a heap at a time. The result is the same as
+    sorted(names, key=key)[:number_of_names].
+
+    Args:
+        names: An iterable of name strings, e.g. the iterator returned by read_names
+        number_of_names: The number of names to return.
+        key: A function computing the sort key of a name, the names themselves are compared if None.
+
+    Returns:
+        A list of the first number_of_names names in sorted order.
+    """
+    return heapq.nsmallest(number_of_names, names, key=key)
+
+
+@profiled("write_names")
+def write_names(names: Iterable[str], file: TextIO) -> None:
+    """Writes names to a text file, one name per line.
+
+    Args:
+        names: An iterable of name strings.
+        file: The open text file to write to, e.g. sys.stdout.
+    """
+    file.writelines(f"{name}\n" for name in names)
+
+
+class NameCorpus:
+    """The names of a file together with views derived from them, each computed at most once.
+
+    The views are computed the first time they are used and cached afterwards, so combining several
+    command line flags never repeats work. The names are only kept in memory when a sorted view needs
+    them, the letter frequency is otherwise counted while streaming the file.
+
+    Args:
+        filepath: The Path object pointing to the file containing comma-separated names.
+        engine: The engine used to count letters, one of ENGINES.
+        workers: The number of processes used by the parallel engine.
+        keep_names: If True the names are read into memory once and reused by every view.
+        cache: An optional on-disk cache the letter frequency is stored in between runs.
+    """
+
+    def __init__(self, filepath: Path, engine: str = "python", workers: int | None = None, keep_names: bool = False,
+                 cache: ResultCache | None = None):
+        read_names(filepath) # validates the file before any view is computed
+        self.filepath = filepath
+        self.engine = engine
+        self.workers = workers
+        self.keep_names = keep_names
+        self.cache = cache
+
+    @cached_property
+    def names(self) -> list[str]:
+        """The names in the order they appear in the file."""
+        return list(read_names(self.filepath))
+
+    @cached_property
+    def letter_frequency(self) -> dict[str, int]:
+        """The number of occurrences of each letter across all names."""
+        if self.cache is None:
+            return self._count_letters()
+        # Every engine gives the same result, so the engine isn't part of the cache key
+        return self.cache.get_or_compute(self.filepath, {"view": "letter_frequency"}, self._count_letters)
+
+    def _count_letters(self) -> dict[str, int]:
+        names_in_memory = self.keep_names or "names" in self.__dict__
+        if names_in_memory and self.engine == "python":
+            return count_letters_in_names(self.names)
+        if names_in_memory and self.engine == "vectorized":
+            return count_letters_vectorized(self.names)
+        return count_letters(self.filepath, self.engine, self.workers)
+
+    @cached_property
+    def alphabetical(self) -> list[str]:
+        """The names sorted alphabetically."""
+        return sorted(self.names)
+
+    @cached_property
+    def _names_by_length(self) -> dict[int, list[str]]:
+        """The names grouped by their length, in the order they appear in the file."""
+        names_by_length = {}
+        for name in self.names:
+            names_by_length.setdefault(len(name), []).append(name)
+        return dict(sorted(names_by_length.items()))
+
+    @cached_property
+    def by_length(self) -> list[str]:
+        """The names sorted by length, names of equal length keep their order from the file."""
+        # Concatenating the length groups gives the same order as sorted(names, key=len) without comparisons
+        return [name for names in self._names_by_length.values() for name in names]
+
+    @cached_property
+    def length_histogram(self) -> dict[int, int]:
+        """The number of names of each length, sorted by length."""
+        return {length: len(names) for length, names in self._names_by_length.items()}
+
+
+def show_sorted_names(corpus: NameCorpus, order: str, top: int | None = None, external: bool = False,
+                      run_size: int = RUN_SIZE, output_dir: Path | None = None) -> None:
+    """Prints the names in sorted order or writes them to a file.
+
+    Args:
+        corpus: The NameCorpus of the names file.
+        order: One of the keys of SORT_KEYS.
+        top: If given only the first top names are shown, found without sorting every name.
+        external: If True the names are sorted on disk with external_sort and printed one per line.
+        run_size: The maximum number of names kept in memory by external_sort.
+        output_dir: If given the names are written to a file in this directory, one per line.
+    """
+    key = SORT_KEYS[order]
+    if top is not None:
+        sorted_names = top_names(read_names(corpus.filepath), top, key)
+    elif external:
+        sorted_names = external_sort(read_names(corpus.filepath), key, run_size)
+    elif order == "alphabetical":
+        sorted_names = corpus.alphabetical
+    else:
+        sorted_names = corpus.by_length
+
+    if output_dir is not None:
+        output_dir.mkdir(exist_ok=True, parents=True) # raises OSError if directory cannot be created
+        output_path = output_dir / f"names_{order}.txt"
+        with open(output_path, "w") as file:
+            write_names(sorted_names, file)
+        print(f"Names written to {output_path}")
+    elif external:
+        write_names(sorted_names, sys.stdout)
+    else:
+        print(sorted_names)
+
+
 def get_path(filepath: str) -> Path:
     """Returns the path object from an input string, this ensures compatibility across different OS paths.
 
@@ -87,47 +517,79 @@ def main():
                        help="path to the file containing names")
     parser.add_argument("--wordcloud", action="store_true",
                        help="generate a wordcloud of the letter frequencies in the names")
+    parser.add_argument("-e", "--engine", choices=ENGINES, default="python",
+                       help="engine used to count letters (default: python)")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                       help="number of processes used by the parallel engine (default: number of CPUs)")
+    parser.add_argument("-t", "--top", type=int, default=None,
+                       help="only show the first TOP names of the sorted lists")
+    parser.add_argument("--external-sort", action="store_true",
+                       help="sort the names on disk for files larger than memory and print one name per line")
+    parser.add_argument("--run-size", type=int, default=RUN_SIZE,
+                       help=f"number of names sorted in memory at a time by --external-sort (default: {RUN_SIZE})")
+    parser.add_argument("-o", "--output-dir", type=str, default=None,
+                       help="write the sorted lists to files in this directory, one name per line")
+    add_cache_arguments(parser)
+    add_profile_arguments(parser)
     
     # Extract commandline arguments as booleans
     args = parser.parse_args()
     
     try:
         data_path = get_path(args.input)
-        list_of_names = read_names(data_path)
+        output_dir = get_path(args.output_dir) if args.output_dir else None
+        # The names are only kept in memory if they have to be sorted in memory, otherwise the file is streamed
+        sorts_in_memory = (args.alphabetical or args.length) and args.top is None and not args.external_sort
+        profiler = start_profiler(args, "intro_to_python")
+        corpus = NameCorpus(data_path, args.engine, args.workers, keep_names=sorts_in_memory,
+                            cache=ResultCache.from_args(args))
+
+        if args.wordcloud or args.count:
+            with profiler.stage("letter_frequency", nbytes=data_path.stat().st_size):
+                letter_frequency = corpus.letter_frequency
 
         if args.wordcloud:
-            wordcloud = WordCloud(width=800, height=400)
-            letter_frequency = count_letters_in_names(list_of_names)
-            wordcloud.generate_from_frequencies(letter_frequency)
-            output_path = get_path("../plots/wordcloud.png")
-            wordcloud.to_file(output_path)
+            with profiler.stage("wordcloud"):
+                # Imported here as wordcloud pulls in PIL and matplotlib, which the other options don't need
+                from wordcloud import WordCloud
+                wordcloud = WordCloud(width=800, height=400)
+                wordcloud.generate_from_frequencies(letter_frequency)
+                output_path = get_path("../plots/wordcloud.png")
+                wordcloud.to_file(output_path)
             print(f"Wordcloud saved to {output_path}")
 
         if args.count:
             print("Number of occurences of alphabetical characters")
-            letter_frequency = count_letters_in_names(sorted(list_of_names))
-            print(letter_frequency)
+            print(dict(sorted(letter_frequency.items())))
 
         if args.alphabetical:
             print("List of names sorted alphabetically")
-            print(sorted(list_of_names))
+            with profiler.stage("sort_alphabetical", nbytes=data_path.stat().st_size):
+                show_sorted_names(corpus, "alphabetical", args.top, args.external_sort, args.run_size, output_dir)
 
         if args.length:
             print("List of names sorted by length")
-            print(sorted(list_of_names, key=len))
+            with profiler.stage("sort_length", nbytes=data_path.stat().st_size):
+                show_sorted_names(corpus, "length", args.top, args.external_sort, args.run_size, output_dir)
         
         print(f"Successfully read names from file: {data_path}")
      
     except FileNotFoundError as e:
         print(f"Error: {e}")
+        sys.exit(1)
 
     except ValueError as e:
         print(f"Error: {e}")
+        sys.exit(1)
 
     except IOError as e:
         print(f"Error: {e}")
         print(f"File permissions of {data_path} ")
         print(f"Read: {os.access(data_path, os.R_OK)}, Write: {os.access(data_path, os.W_OK)}, Execute: {os.access(data_path, os.X_OK)}")
+        sys.exit(1)
+
+    finally:
+        stop_profiler()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
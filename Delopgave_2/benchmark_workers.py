@@ -0,0 +1,68 @@
+import argparse
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from logfile_analysis import LOG_LEVELS, TIMESTAMP_LENGTH, classify_log_parallel, classify_log_stream, get_path, iter_log
+
+
+def generate_log_file(filepath: Path, number_of_lines: int, seed: int = 0) -> None:
+    """Writes a synthetic log file in the "YYYY-MM-DD HH:MM:SS LEVEL message" format.
+
+    The messages are sampled from the example log in Data/ and the timestamps increase by a few seconds per line.
+
+    Args:
+        filepath: The path of the file to write.
+        number_of_lines: The number of lines in the file.
+        seed: The seed of the random number generator.
+    """
+    rng = random.Random(seed)
+    sample_log = get_path("../Data/app_log (logfil analyse) - random.txt")
+    messages = {level: [] for level in LOG_LEVELS}
+    for line in iter_log(sample_log):
+        level, _, message = line[TIMESTAMP_LENGTH + 1:].partition(" ")
+        if level in messages:
+            messages[level].append(message)
+
+    timestamp = datetime(2024, 2, 25, 9, 15, 32)
+    with open(filepath, "w") as file:
+        for _ in range(number_of_lines):
+            level = rng.choice(LOG_LEVELS)
+            file.write(f"{timestamp:%Y-%m-%d %H:%M:%S} {level} {rng.choice(messages[level])}\n")
+            timestamp += timedelta(seconds=rng.randint(0, 30))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark of classifying a log file with a pool of processes")
+    parser.add_argument("-n", "--lines", type=int, default=2_000_000, help="number of lines in the synthetic log (default: 2000000)")
+    parser.add_argument("-w", "--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="worker counts to benchmark (default: 1 2 4 8)")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="number of runs per worker count, the best is reported (default: 3)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        log_path = Path(temp_dir) / "app.log"
+        output_dir = Path(temp_dir) / "output"
+        output_dir.mkdir()
+        generate_log_file(log_path, args.lines)
+        size_in_mb = log_path.stat().st_size / 1024**2
+        print(f"Classifying {args.lines} lines ({size_in_mb:.1f} MB), best of {args.repeat} runs")
+
+        benchmarks = [("stream", lambda: classify_log_stream(iter_log(log_path), output_dir))]
+        for workers in args.workers:
+            benchmarks.append((f"{workers} workers", lambda workers=workers: classify_log_parallel(log_path, output_dir, workers)))
+
+        for name, classify_log in benchmarks:
+            best_time = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                summary = classify_log()
+                best_time = min(best_time, time.perf_counter() - start)
+            classified_lines = sum(counts["lines"] for counts in summary.values())
+            assert classified_lines == args.lines, f"{name} classified {classified_lines} of {args.lines} lines"
+            print(f"{name:>12}: {best_time:7.3f} s  {args.lines / best_time:12,.0f} lines/s")
+
+
+if __name__ == "__main__":
+    main()
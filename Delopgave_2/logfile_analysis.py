@@ -1,6 +1,97 @@
+from __future__ import annotations
+
 import os
+import sys
 import argparse 
+import bisect
+import bz2
+import calendar
+import csv
+import glob
+import gzip
+import hashlib
+import json
+import locale
+import lzma
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from array import array
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
 from pathlib import Path
+from itertools import chain, islice
+from typing import BinaryIO, TextIO
+
+# Makes the shared modules in the project root importable when the script is run directly
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common.cache import ResultCache, add_cache_arguments
+from common.chunking import split_file
+from common.imports import lazy_import
+from common.profiling import add_profile_arguments, profiled, start_profiler, stop_profiler
+
+np = lazy_import("numpy")
+
+LOG_LEVELS = ("INFO", "WARNING", "ERROR", "SUCCESS")
+LEVEL_CODES = {level: code for code, level in enumerate(LOG_LEVELS)}
+# Log lines start with a "YYYY-MM-DD HH:MM:SS" timestamp followed by a space and the level
+TIMESTAMP_LENGTH = 19
+# Size of the buffer of each per-level output file
+WRITE_BUFFER_SIZE = 1024 * 1024
+CHECKPOINT_FILE_NAME = ".checkpoint.json"
+# The sparse index is stored next to the log file and records the offset of every INDEX_EVERY'th line
+INDEX_SUFFIX = ".idx"
+INDEX_EVERY = 10_000
+# Below this many bytes the binary search stops and the remaining lines are scanned
+SEARCH_SCAN_SIZE = 64 * 1024
+# Number of lines parsed into columns before they are folded into the aggregate
+AGGREGATE_BATCH_SIZE = 1_000_000
+AGGREGATE_FORMATS = ("csv", "json")
+# Compressed log files are decompressed as streams by the opener of their suffix
+COMPRESSED_OPENERS = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+# Lines are passed from the reader threads in batches, and each reader is at most READ_QUEUE_BATCHES batches ahead
+READ_BATCH_LINES = 10_000
+READ_QUEUE_BATCHES = 16
+
+
+@dataclass
+class Checkpoint:
+    """How far a log file has been processed by the incremental and follow modes.
+
+    Attributes:
+        log_path: The resolved path of the log file.
+        offset: The byte offset right after the last processed line.
+        inode: The inode of the log file, changes when the file is rotated.
+        last_line_hash: A hash of the last processed line, used to detect a rewritten file.
+        last_line_length: The length of the last processed line in bytes, including the newline.
+    """
+    log_path: str
+    offset: int = 0
+    inode: int = 0
+    last_line_hash: str = ""
+    last_line_length: int = 0
+
+
+@dataclass
+class LogIndex:
+    """A sparse index from timestamps to byte offsets of a log file.
+
+    Attributes:
+        checkpoint: How far the log file has been indexed, used to extend the index when lines are appended.
+        every: The index records the timestamp and offset of every every'th line.
+        line_count: The number of lines indexed so far.
+        timestamps: The timestamps of the indexed lines, in the order of the file.
+        offsets: The byte offsets of the indexed lines.
+    """
+    checkpoint: Checkpoint
+    every: int = INDEX_EVERY
+    line_count: int = 0
+    timestamps: list[str] = field(default_factory=list)
+    offsets: list[int] = field(default_factory=list)
 
 
 def read_file(filepath: Path) -> list[str]:
@@ -34,6 +125,186 @@ def read_file(filepath: Path) -> list[str]:
     return messages
 
 
+def iter_log(filepath: Path) -> Iterator[str]:
+    """Reads a file of log messages seperated by \n and yields the messages one at a time.
+
+    Only one line is kept in memory at a time, unlike read_file.
+
+    Args:
+        filepath: The Path object pointing to the file containing log files.
+
+    Returns:
+        An iterator of log messages with whitespace stripped.
+
+    Raises:
+        FileNotFoundError: If the specified file does not exist.
+        ValueError: If the path is not a file.
+        IOError: If there are issues reading the file.
+    """
+    if not filepath.exists():
+        raise FileNotFoundError(f"File not found at: {filepath}")
+    if not filepath.is_file():
+        raise ValueError(f"Path is not a file: {filepath}")
+    if not os.access(filepath, os.R_OK):
+        raise IOError(f"No read permissions for file: {filepath}")
+
+    return _stream_lines(filepath)
+
+
+@profiled("read_log")
+def _stream_lines(filepath: Path) -> Iterator[str]:
+    """Yields the stripped lines of a file, see iter_log."""
+    with open_log(filepath) as file:
+        for line in file:
+            yield line.strip()
+
+
+def is_compressed(filepath: Path) -> bool:
+    """Returns True if the log file is compressed with gzip, bz2 or xz, judged by its suffix."""
+    return filepath.suffix in COMPRESSED_OPENERS
+
+
+def open_log(filepath: Path) -> TextIO:
+    """Opens a log file for reading as text, decompressing gzip, bz2 and xz files as a stream.
+
+    Args:
+        filepath: The Path object pointing to the log file.
+
+    Returns:
+        The file opened in text mode.
+
+    Raises:
+        OSError: If the file cannot be opened.
+    """
+    opener = COMPRESSED_OPENERS.get(filepath.suffix)
+    if opener is None:
+        return open(filepath, "r")
+    return opener(filepath, "rt")
+
+
+def _rotation_order(filepath: Path) -> tuple[int, str]:
+    """Returns a sort key placing rotated logs oldest first, e.g. app.log.2.bz2, app.log.1.gz, app.log."""
+    name = filepath.stem if is_compressed(filepath) else filepath.name
+    _, _, rotation = name.rpartition(".")
+    # The current log has no rotation number and is the newest
+    return (-int(rotation) if rotation.isdigit() else 1, name)
+
+
+def resolve_log_paths(pattern: str) -> list[Path]:
+    """Returns the log files matching a path, a directory or a glob pattern, relative to the script directory.
+
+    The files of a directory or a glob pattern are sorted so rotated logs come oldest first.
+
+    Args:
+        pattern: A path to a log file, a directory of log files or a glob pattern such as "logs/app.log*".
+
+    Returns:
+        A list of paths to log files.
+
+    Raises:
+        FileNotFoundError: If the pattern doesn't match any file.
+    """
+    log_path = get_path(pattern)
+    if log_path.is_dir():
+        log_paths = [path for path in log_path.iterdir() if path.is_file()]
+    elif glob.has_magic(pattern):
+        log_paths = [Path(path) for path in glob.glob(str(get_path(".") / pattern)) if Path(path).is_file()]
+    else:
+        return [log_path]
+
+    if not log_paths:
+        raise FileNotFoundError(f"No log files found at: {log_path}")
+    return sorted(log_paths, key=_rotation_order)
+
+
+def _read_into_queue(filepath: Path, line_queue: queue.Queue, stop: threading.Event) -> None:
+    """Reads the lines of a log file in batches into a queue, used by the reader threads of iter_logs.
+
+    The queue ends with None, or with the exception that stopped the reading.
+    """
+    def put(item: list[str] | BaseException | None) -> bool:
+        while not stop.is_set():
+            try:
+                line_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        with open_log(filepath) as file:
+            while batch := list(islice(file, READ_BATCH_LINES)):
+                if not put([line.strip() for line in batch]):
+                    return
+    except Exception as error:
+        put(error)
+        return
+    put(None)
+
+
+def iter_logs(filepaths: list[Path], readers: int = 4) -> Iterator[str]:
+    """Yields the messages of several log files in order, reading and decompressing files concurrently.
+
+    Up to readers files are read by a pool of threads at a time, each at most a few batches ahead of the
+    file currently being consumed. Decompression releases the GIL, so the threads run in parallel.
+
+    Args:
+        filepaths: The Path objects pointing to the log files, in the order their messages are yielded.
+        readers: The number of files read concurrently.
+
+    Returns:
+        An iterator of log messages with whitespace stripped.
+
+    Raises:
+        FileNotFoundError: If one of the files does not exist.
+        ValueError: If one of the paths is not a file or readers isn't positive.
+        IOError: If there are issues reading a file.
+    """
+    if readers < 1:
+        raise ValueError(f"readers must be positive, got: {readers}")
+    for filepath in filepaths:
+        iter_log(filepath) # validates every file before any is read
+    if len(filepaths) == 1:
+        return _stream_lines(filepaths[0])
+    return _stream_files_concurrently(filepaths, readers)
+
+
+@profiled("read_logs")
+def _stream_files_concurrently(filepaths: list[Path], readers: int) -> Iterator[str]:
+    """Yields the messages of several log files read by a pool of threads, see iter_logs."""
+    stop = threading.Event()
+    line_queues = [queue.Queue(maxsize=READ_QUEUE_BATCHES) for _ in filepaths]
+    executor = ThreadPoolExecutor(max_workers=readers)
+    try:
+        # The files are read in submission order, so the file being consumed always has a running reader
+        for filepath, line_queue in zip(filepaths, line_queues):
+            executor.submit(_read_into_queue, filepath, line_queue, stop)
+        for line_queue in line_queues:
+            while (batch := line_queue.get()) is not None:
+                if isinstance(batch, BaseException):
+                    raise batch
+                yield from batch
+    finally:
+        # Unblocks and ends the readers if the messages weren't consumed to the end
+        stop.set()
+        executor.shutdown(cancel_futures=True)
+
+
+def parse_level(message: str) -> str | None:
+    """Returns the level of a log message, read from its fixed position after the timestamp.
+
+    Args:
+        message: A log message in the format "YYYY-MM-DD HH:MM:SS LEVEL message".
+
+    Returns:
+        The level of the message if it is one of LOG_LEVELS, otherwise None.
+    """
+    level_start = TIMESTAMP_LENGTH + 1
+    level_end = message.find(" ", level_start)
+    level = message[level_start:level_end] if level_end != -1 else message[level_start:]
+    return level if level in LOG_LEVELS else None
+
+
 def seperate_log_by_type(log: list[str]) -> dict[str, list[str]]:
     """Seperates log messages by type into a dictionary.
     
@@ -46,20 +317,15 @@ def seperate_log_by_type(log: list[str]) -> dict[str, list[str]]:
         ValueError: If the log list is empty.
     """
 
-    log_dict = {"INFO": [], "WARNING": [], "ERROR": [], "SUCCESS": []}
+    log_dict = {level: [] for level in LOG_LEVELS}
     
     if not log:
         raise ValueError(f"log list can't be empty")
         
     for message in log:
-        if "INFO" in message:
-            log_dict["INFO"].append(message)
-        elif "WARNING" in message:
-            log_dict["WARNING"].append(message)
-        elif "ERROR" in message:
-            log_dict["ERROR"].append(message)
-        elif "SUCCESS" in message:
-            log_dict["SUCCESS"].append(message)
+        level = parse_level(message)
+        if level is not None:
+            log_dict[level].append(message)
     return log_dict
 
 def write_dict_to_files(data: dict[str, list[str]]) -> None:
@@ -75,17 +341,708 @@ def write_dict_to_files(data: dict[str, list[str]]) -> None:
     if not data:
         raise ValueError("Data dictionary cannot be empty")
     
-    # Checks if there is a "logs" directory in the project root directory, if not it creates one
-    logs_dir = Path(__file__).parent.parent / "logs" / "Delopgave_2"
-    logs_dir.mkdir(exist_ok=True, parents=True) # raises OSError if directory cannot be created
+    logs_dir = get_logs_dir()
 
     for key, messages in data.items():
-        log_file_path = logs_dir / f"{key.lower()}_log.txt"
-        with open(log_file_path, "w") as file:
+        with open(get_level_file_path(logs_dir, key), "w") as file:
             for message in messages:
                 file.write(f"{message}\n")
 
 
+@profiled("classify_log")
+def classify_log_stream(messages: Iterable[str], logs_dir: Path, append: bool = False) -> dict[str, dict[str, int]]:
+    """Routes each log message to the output file of its level in a single pass.
+
+    The output files of every level are opened before reading starts and written through large buffers,
+    so memory use doesn't grow with the size of the log. The files are the same as the ones written by
+    seperate_log_by_type followed by write_dict_to_files.
+
+    Args:
+        messages: An iterable of log messages, e.g. the iterator returned by iter_log.
+        logs_dir: The directory the per-level files are written to.
+        append: If True the messages are appended to the per-level files instead of overwriting them.
+
+    Returns:
+        A dictionary with log types as keys and the number of lines and bytes written for each as values.
+
+    Raises:
+        OSError: If the output files cannot be opened.
+    """
+    summary = {level: {"lines": 0, "bytes": 0} for level in LOG_LEVELS}
+    writers = {}
+    try:
+        for level in LOG_LEVELS:
+            writers[level] = open(get_level_file_path(logs_dir, level), "a" if append else "w", buffering=WRITE_BUFFER_SIZE)
+
+        for message in messages:
+            level = parse_level(message)
+            if level is not None:
+                writers[level].write(f"{message}\n")
+                summary[level]["lines"] += 1
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    for level in LOG_LEVELS:
+        summary[level]["bytes"] = get_level_file_path(logs_dir, level).stat().st_size
+    return summary
+
+
+def _read_byte_range(log_path: Path, start: int, end: int) -> Iterator[str]:
+    """Yields the stripped lines of a log file between two byte offsets that are both at the start of a line."""
+    encoding = locale.getpreferredencoding(False)
+    with open(log_path, "rb") as file:
+        file.seek(start)
+        position = start
+        while position < end:
+            line = file.readline()
+            if not line:
+                break
+            position += len(line)
+            yield line.decode(encoding).strip()
+
+
+def _classify_byte_range(log_path: Path, start: int, end: int, chunk_dir: Path) -> dict[str, dict[str, int]]:
+    """Classifies the lines of one byte range of a log file into per-level files, used by the worker processes."""
+    chunk_dir.mkdir()
+    return classify_log_stream(_read_byte_range(log_path, start, end), chunk_dir)
+
+
+@profiled("classify_log_parallel")
+def classify_log_parallel(log_path: Path, logs_dir: Path, workers: int) -> dict[str, dict[str, int]]:
+    """Classifies a log file into per-level files using a pool of processes.
+
+    The log file is split into byte ranges at line boundaries and each range is classified into its own
+    temporary per-level files by a worker process. The temporary files are then concatenated in the order
+    of the ranges, so the per-level files are the same as the ones written by classify_log_stream.
+
+    Args:
+        log_path: The Path object pointing to the log file.
+        logs_dir: The directory the per-level files are written to.
+        workers: The number of processes to use.
+
+    Returns:
+        A dictionary with log types as keys and the number of lines and bytes written for each as values.
+
+    Raises:
+        ValueError: If the number of workers isn't positive.
+        OSError: If the files cannot be read or written.
+    """
+    if workers < 1:
+        raise ValueError(f"workers must be positive, got: {workers}")
+    iter_log(log_path) # validates the log file before starting any processes
+
+    byte_ranges = split_file(log_path, workers)
+    summary = {level: {"lines": 0, "bytes": 0} for level in LOG_LEVELS}
+    # The temporary files are created next to the output files so concatenating them doesn't cross file systems
+    with tempfile.TemporaryDirectory(dir=logs_dir, prefix=".chunks_") as temp_dir:
+        chunk_dirs = [Path(temp_dir) / str(index) for index in range(len(byte_ranges))]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_classify_byte_range, log_path, start, end, chunk_dir)
+                       for (start, end), chunk_dir in zip(byte_ranges, chunk_dirs)]
+            for future in futures:
+                for level, counts in future.result().items():
+                    summary[level]["lines"] += counts["lines"]
+
+        for level in LOG_LEVELS:
+            level_file_path = get_level_file_path(logs_dir, level)
+            with open(level_file_path, "wb") as level_file:
+                for chunk_dir in chunk_dirs:
+                    with open(get_level_file_path(chunk_dir, level), "rb") as chunk_file:
+                        shutil.copyfileobj(chunk_file, level_file, WRITE_BUFFER_SIZE)
+            summary[level]["bytes"] = level_file_path.stat().st_size
+    return summary
+
+
+def outputs_match_summary(summary: dict[str, dict[str, int]], logs_dir: Path) -> bool:
+    """Checks that the per-level files described by the summary of classify_log_stream are still intact.
+
+    Args:
+        summary: The summary returned by classify_log_stream.
+        logs_dir: The directory the per-level files were written to.
+
+    Returns:
+        True if every per-level file exists and has the size recorded in the summary.
+    """
+    for level, counts in summary.items():
+        level_file_path = get_level_file_path(logs_dir, level)
+        if not level_file_path.is_file() or level_file_path.stat().st_size != counts["bytes"]:
+            return False
+    return True
+
+
+def hash_line(line: bytes) -> str:
+    """Returns a short hash of a line of the log file."""
+    return hashlib.blake2b(line, digest_size=16).hexdigest()
+
+
+def load_checkpoint(checkpoint_path: Path, log_path: Path) -> Checkpoint | None:
+    """Loads the checkpoint of a log file.
+
+    Args:
+        checkpoint_path: The path of the checkpoint file.
+        log_path: The Path object pointing to the log file.
+
+    Returns:
+        The checkpoint, or None if there is no readable checkpoint for this log file.
+    """
+    try:
+        with open(checkpoint_path, "r") as file:
+            checkpoint = Checkpoint(**json.load(file))
+    except (OSError, ValueError, TypeError):
+        return None
+    if checkpoint.log_path != str(log_path.resolve()):
+        return None
+    return checkpoint
+
+
+def save_checkpoint(checkpoint: Checkpoint, checkpoint_path: Path) -> None:
+    """Saves a checkpoint, replacing the old one atomically so it is never left half-written.
+
+    Raises:
+        OSError: If the checkpoint cannot be written.
+    """
+    temporary_path = checkpoint_path.with_suffix(".tmp")
+    with open(temporary_path, "w") as file:
+        json.dump(asdict(checkpoint), file)
+    os.replace(temporary_path, checkpoint_path)
+
+
+def find_resume_offset(log_path: Path, checkpoint: Checkpoint) -> int:
+    """Returns the byte offset processing of the log file should continue from.
+
+    The offset of the checkpoint is only used if the log file is still the same file: it has the same
+    inode, it hasn't been truncated below the offset and the line before the offset is unchanged.
+    Otherwise the file has been rotated or rewritten and is processed from the start.
+
+    Args:
+        log_path: The Path object pointing to the log file.
+        checkpoint: The checkpoint of the previous run.
+
+    Returns:
+        The offset of the checkpoint, or 0 if the file has to be processed from the start.
+    """
+    stat = log_path.stat()
+    if stat.st_ino != checkpoint.inode or stat.st_size < checkpoint.offset:
+        return 0
+    if checkpoint.last_line_length:
+        with open(log_path, "rb") as file:
+            file.seek(checkpoint.offset - checkpoint.last_line_length)
+            if hash_line(file.read(checkpoint.last_line_length)) != checkpoint.last_line_hash:
+                return 0
+    return checkpoint.offset
+
+
+def _read_complete_lines(file: BinaryIO, checkpoint: Checkpoint) -> Iterator[str]:
+    """Yields the complete lines of a file from its current position and advances the checkpoint past them.
+
+    A line without a trailing newline may still be being written, so it is left for the next run.
+    """
+    encoding = locale.getpreferredencoding(False)
+    for line in iter(file.readline, b""):
+        if not line.endswith(b"\n"):
+            break
+        checkpoint.offset += len(line)
+        checkpoint.last_line_hash = hash_line(line)
+        checkpoint.last_line_length = len(line)
+        yield line.decode(encoding, errors="replace").strip()
+
+
+def find_rotated_log(log_path: Path, checkpoint: Checkpoint) -> Path | None:
+    """Returns the rotated file next to the log file that is the file the checkpoint was saved for.
+
+    When a log is rotated by renaming, e.g. app.log to app.log.1, the old file keeps its inode, so it is
+    found among the files whose name starts with the name of the log file. It is only returned if the
+    lines up to the checkpoint are unchanged, see find_resume_offset.
+
+    Returns:
+        The path of the rotated file, or None if it wasn't found, e.g. because it was compressed.
+    """
+    for path in sorted(log_path.parent.glob(f"{glob.escape(log_path.name)}?*")):
+        try:
+            if path.is_file() and path.stat().st_ino == checkpoint.inode and find_resume_offset(path, checkpoint) == checkpoint.offset:
+                return path
+        except OSError:
+            continue
+    return None
+
+
+def _read_rotated_lines(rotated_path: Path, offset: int) -> Iterator[str]:
+    """Yields the lines of a rotated log file after the offset, including a last line without a newline."""
+    encoding = locale.getpreferredencoding(False)
+    with open(rotated_path, "rb") as file:
+        file.seek(offset)
+        for line in file:
+            yield line.decode(encoding, errors="replace").strip()
+
+
+@profiled("process_new_lines")
+def process_new_lines(log_path: Path, logs_dir: Path) -> int:
+    """Classifies the lines appended to a log file since the last run and appends them to the per-level files.
+
+    The first run, and a run after the log file was rotated or rewritten, processes the whole file. If
+    the log was rotated by renaming it, the lines appended to the old file after the checkpoint are first
+    read from the rotated file next to it, see find_rotated_log. A rotated file that can't be found, e.g.
+    because it was compressed, deleted or the log was rotated by copying and truncating it, can't be
+    drained, so a warning is printed as the lines appended to it since the last run are skipped. A checkpoint is
+    saved after the per-level files are written, so a crash in between can at most repeat the lines of
+    one run.
+
+    Args:
+        log_path: The Path object pointing to the log file.
+        logs_dir: The directory the per-level files and the checkpoint are written to.
+
+    Returns:
+        The number of bytes processed.
+
+    Raises:
+        FileNotFoundError: If the log file does not exist.
+        ValueError: If the path is not a file.
+        OSError: If the files cannot be read or written.
+    """
+    iter_log(log_path) # validates the log file
+    checkpoint_path = logs_dir / CHECKPOINT_FILE_NAME
+    previous_checkpoint = load_checkpoint(checkpoint_path, log_path)
+    # Without a checkpoint the per-level files can't be trusted to match the log, so they are rewritten
+    append = previous_checkpoint is not None
+    start_offset = find_resume_offset(log_path, previous_checkpoint) if previous_checkpoint else 0
+
+    checkpoint = Checkpoint(log_path=str(log_path.resolve()), offset=start_offset, inode=log_path.stat().st_ino)
+    if start_offset and previous_checkpoint:
+        checkpoint.last_line_hash = previous_checkpoint.last_line_hash
+        checkpoint.last_line_length = previous_checkpoint.last_line_length
+
+    rotated_lines = iter(())
+    rotated_bytes = 0
+    if previous_checkpoint and previous_checkpoint.offset and not start_offset:
+        rotated_path = find_rotated_log(log_path, previous_checkpoint)
+        if rotated_path is None:
+            print(f"Warning: {log_path} was rotated or rewritten and the old file wasn't found, lines appended "
+                  f"to it after the last run are skipped", file=sys.stderr)
+        else:
+            rotated_lines = _read_rotated_lines(rotated_path, previous_checkpoint.offset)
+            rotated_bytes = rotated_path.stat().st_size - previous_checkpoint.offset
+
+    with open(log_path, "rb") as file:
+        file.seek(start_offset)
+        classify_log_stream(chain(rotated_lines, _read_complete_lines(file, checkpoint)), logs_dir, append=append)
+
+    save_checkpoint(checkpoint, checkpoint_path)
+    return rotated_bytes + checkpoint.offset - start_offset
+
+
+def follow_log(log_path: Path, logs_dir: Path, interval: float) -> None:
+    """Keeps classifying the lines appended to a log file until interrupted with Ctrl+C.
+
+    Args:
+        log_path: The Path object pointing to the log file.
+        logs_dir: The directory the per-level files and the checkpoint are written to.
+        interval: The number of seconds to wait between checks for new lines.
+    """
+    print(f"Following {log_path}, press Ctrl+C to stop")
+    try:
+        while True:
+            processed_bytes = process_new_lines(log_path, logs_dir)
+            if processed_bytes:
+                print(f"Processed {processed_bytes} new bytes")
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("Stopped following log file")
+
+
+def normalise_timestamp(timestamp: str) -> str:
+    """Returns a timestamp in the "YYYY-MM-DD HH:MM:SS" format of the log, e.g. "2024-02-25" or "2024-02-25 09:15".
+
+    Raises:
+        ValueError: If the timestamp is not an ISO 8601 date or date and time.
+    """
+    return datetime.fromisoformat(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def get_index_path(log_path: Path) -> Path:
+    """Returns the path of the sparse index of a log file."""
+    return log_path.with_name(f"{log_path.name}{INDEX_SUFFIX}")
+
+
+def load_index(log_path: Path, every: int) -> LogIndex | None:
+    """Loads the sparse index of a log file if it is still valid for the file.
+
+    Args:
+        log_path: The Path object pointing to the log file.
+        every: The number of lines between indexed lines the index must have been built with.
+
+    Returns:
+        The index, or None if there is no index or the log file has been rotated or rewritten since.
+    """
+    try:
+        with open(get_index_path(log_path), "r") as file:
+            index_data = json.load(file)
+        index_data["checkpoint"] = Checkpoint(**index_data["checkpoint"])
+        index = LogIndex(**index_data)
+    except (OSError, ValueError, TypeError, KeyError):
+        return None
+    if index.every != every or index.checkpoint.log_path != str(log_path.resolve()):
+        return None
+    # The index is only extended if the lines it covers are unchanged
+    if index.checkpoint.offset and find_resume_offset(log_path, index.checkpoint) != index.checkpoint.offset:
+        return None
+    return index
+
+
+def update_index(log_path: Path, every: int = INDEX_EVERY) -> LogIndex:
+    """Builds the sparse index of a log file, or extends it with the lines appended since it was built.
+
+    Args:
+        log_path: The Path object pointing to the log file.
+        every: The timestamp and offset of every every'th line are recorded.
+
+    Returns:
+        The up to date index.
+
+    Raises:
+        OSError: If the log file cannot be read or the index cannot be written.
+    """
+    index = load_index(log_path, every)
+    if index is None:
+        checkpoint = Checkpoint(log_path=str(log_path.resolve()), inode=log_path.stat().st_ino)
+        index = LogIndex(checkpoint=checkpoint, every=every)
+    return _extend_index(log_path, index)
+
+
+def _extend_index(log_path: Path, index: LogIndex) -> LogIndex:
+    """Adds the lines after the checkpoint of the index to it and saves it, see update_index."""
+    every = index.every
+    if index.checkpoint.offset == log_path.stat().st_size:
+        return index
+
+    with open(log_path, "rb") as file:
+        file.seek(index.checkpoint.offset)
+        for line in iter(file.readline, b""):
+            # A line without a trailing newline may still be being written and is indexed in a later run
+            if not line.endswith(b"\n"):
+                break
+            if index.line_count % every == 0:
+                index.timestamps.append(line[:TIMESTAMP_LENGTH].decode("ascii", errors="replace"))
+                index.offsets.append(index.checkpoint.offset)
+            index.line_count += 1
+            index.checkpoint.offset += len(line)
+            index.checkpoint.last_line_length = len(line)
+            index.checkpoint.last_line_hash = hash_line(line)
+
+    index_path = get_index_path(log_path)
+    temporary_path = index_path.with_suffix(".tmp")
+    with open(temporary_path, "w") as file:
+        json.dump(asdict(index), file)
+    os.replace(temporary_path, index_path)
+    return index
+
+
+def find_offset_in_index(index: LogIndex, timestamp: str) -> int:
+    """Returns the offset of the last indexed line before the timestamp, or 0 if there is none."""
+    position = bisect.bisect_left(index.timestamps, timestamp)
+    return index.offsets[position - 1] if position > 0 else 0
+
+
+def find_offset_by_binary_search(file: BinaryIO, timestamp: str) -> int:
+    """Returns the offset of a line before the first line at or after the timestamp, by binary search.
+
+    Only a handful of lines around the probed offsets are read, the log file must be sorted by timestamp.
+
+    Args:
+        file: The log file opened in binary mode.
+        timestamp: A timestamp in the "YYYY-MM-DD HH:MM:SS" format.
+
+    Returns:
+        The offset of the start of a line, every line before it is earlier than the timestamp.
+    """
+    target = timestamp.encode("ascii")
+    low = 0
+    high = file.seek(0, os.SEEK_END)
+    # low always is the start of a line that is earlier than the timestamp, or the start of the file
+    while high - low > SEARCH_SCAN_SIZE:
+        middle = (low + high) // 2
+        file.seek(middle)
+        file.readline() # skips the rest of the line middle falls in
+        line_start = file.tell()
+        line = file.readline()
+        if not line or line[:TIMESTAMP_LENGTH] >= target:
+            high = middle
+        else:
+            low = line_start
+    return low
+
+
+def query_time_range(log_path: Path, since: str | None = None, until: str | None = None,
+                     levels: Iterable[str] | None = None, use_index: bool = True,
+                     index_every: int = INDEX_EVERY) -> Iterator[str]:
+    """Yields the log messages between two timestamps without reading the rest of the log file.
+
+    The first line to read is found with the sparse index of the log file, which is first extended with
+    the lines appended since it was saved, or by a binary search over the file if the index is disabled,
+    doesn't exist yet or can't be written. Reading stops at the first line at or after until, so only the
+    lines in the time range are read. Building a missing index reads the whole file, so it is built after
+    the last message of the range has been yielded, for the next queries.
+
+    Args:
+        log_path: The Path object pointing to a log file sorted by timestamp.
+        since: Only messages at or after this "YYYY-MM-DD HH:MM:SS" timestamp are yielded.
+        until: Only messages before this "YYYY-MM-DD HH:MM:SS" timestamp are yielded.
+        levels: If given only messages with one of these levels are yielded.
+        use_index: If False the start of the time range is found by binary search instead of the index.
+        index_every: The number of lines between indexed lines.
+
+    Returns:
+        An iterator of the matching log messages with whitespace stripped.
+
+    Raises:
+        FileNotFoundError: If the log file does not exist.
+        ValueError: If the path is not a file.
+        IOError: If there are issues reading the file.
+    """
+    iter_log(log_path) # validates the log file
+    index = None
+    build_index = False
+    if use_index and since is not None:
+        index = load_index(log_path, index_every)
+        build_index = index is None
+        if index is not None:
+            try:
+                index = _extend_index(log_path, index)
+            except OSError:
+                index = None
+    return _stream_time_range(log_path, since, until, None if levels is None else set(levels), index,
+                              index_every if build_index else None)
+
+
+@profiled("query_time_range")
+def _stream_time_range(log_path: Path, since: str | None, until: str | None, levels: set[str] | None,
+                       index: LogIndex | None, build_index_every: int | None = None) -> Iterator[str]:
+    """Yields the messages of a time range, then builds the index if build_index_every is given, see query_time_range."""
+    encoding = locale.getpreferredencoding(False)
+    with open(log_path, "rb") as file:
+        if since is None:
+            start_offset = 0
+        elif index is not None:
+            start_offset = find_offset_in_index(index, since)
+        else:
+            start_offset = find_offset_by_binary_search(file, since)
+        file.seek(start_offset)
+
+        for line in file:
+            message = line.decode(encoding).strip()
+            timestamp = message[:TIMESTAMP_LENGTH]
+            if since is not None and timestamp < since:
+                continue
+            if until is not None and timestamp >= until:
+                break
+            if levels is None or parse_level(message) in levels:
+                yield message
+
+    if build_index_every is not None:
+        try:
+            update_index(log_path, build_index_every)
+        except OSError:
+            pass
+
+
+@dataclass
+class LogAggregate:
+    """Counts of a log file, with memory use proportional to the number of distinct messages.
+
+    Attributes:
+        minute_counts: The number of messages of each (minute, level code), minutes are epoch seconds // 60.
+        messages: The distinct (level, message text) pairs, indexed by message id.
+        message_counts: The number of occurrences of each message id.
+        first_seen: The epoch seconds each message id was first seen at.
+        last_seen: The epoch seconds each message id was last seen at.
+    """
+    minute_counts: dict[tuple[int, int], int] = field(default_factory=dict)
+    messages: list[tuple[str, str]] = field(default_factory=list)
+    message_counts: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int64))
+    first_seen: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int64))
+    last_seen: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int64))
+
+
+def parse_epoch_seconds(timestamp: str, day_cache: dict[str, int]) -> int:
+    """Converts a "YYYY-MM-DD HH:MM:SS" timestamp to seconds since the epoch, treating it as UTC.
+
+    Args:
+        timestamp: The timestamp of a log message.
+        day_cache: A dictionary from dates to the epoch seconds of their midnight, filled as dates are seen
+            so the date only has to be parsed once per day of log.
+
+    Raises:
+        ValueError: If the timestamp is not in the expected format.
+    """
+    date = timestamp[:10]
+    midnight = day_cache.get(date)
+    if midnight is None:
+        midnight = calendar.timegm(datetime.strptime(date, "%Y-%m-%d").timetuple())
+        day_cache[date] = midnight
+    return midnight + int(timestamp[11:13]) * 3600 + int(timestamp[14:16]) * 60 + int(timestamp[17:19])
+
+
+def _fold_batch(aggregate: LogAggregate, epochs: array, level_codes: array, message_ids: array) -> None:
+    """Adds a batch of parsed columns to the aggregate with vectorised NumPy operations."""
+    epoch_column = np.frombuffer(epochs, dtype=np.int64)
+    level_column = np.frombuffer(level_codes, dtype=np.int8).astype(np.int64)
+    message_column = np.frombuffer(message_ids, dtype=np.int64)
+
+    minute_keys = (epoch_column // 60) * len(LOG_LEVELS) + level_column
+    unique_keys, key_counts = np.unique(minute_keys, return_counts=True)
+    for key, count in zip(unique_keys.tolist(), key_counts.tolist()):
+        minute, level_code = divmod(key, len(LOG_LEVELS))
+        aggregate.minute_counts[(minute, level_code)] = aggregate.minute_counts.get((minute, level_code), 0) + count
+
+    # Grows the per-message columns to cover the messages first seen in this batch
+    number_of_messages = len(aggregate.messages)
+    new_messages = number_of_messages - len(aggregate.message_counts)
+    if new_messages:
+        aggregate.message_counts = np.concatenate([aggregate.message_counts, np.zeros(new_messages, dtype=np.int64)])
+        aggregate.first_seen = np.concatenate([aggregate.first_seen, np.full(new_messages, np.iinfo(np.int64).max)])
+        aggregate.last_seen = np.concatenate([aggregate.last_seen, np.full(new_messages, np.iinfo(np.int64).min)])
+    aggregate.message_counts += np.bincount(message_column, minlength=number_of_messages)
+    np.minimum.at(aggregate.first_seen, message_column, epoch_column)
+    np.maximum.at(aggregate.last_seen, message_column, epoch_column)
+
+
+@profiled("aggregate_log")
+def aggregate_log(messages: Iterable[str], batch_size: int = AGGREGATE_BATCH_SIZE) -> LogAggregate:
+    """Computes per-minute counts and per-message statistics of log messages without keeping the messages.
+
+    Each line is parsed into three compact columns, its epoch seconds as int64, its level as a small int code
+    and the id of its message text, interned in a dictionary of distinct messages. Every batch_size lines the
+    columns are folded into the aggregate and cleared, so only the distinct messages grow with the log.
+
+    Args:
+        messages: An iterable of log messages, e.g. the iterator returned by iter_log.
+        batch_size: The number of lines parsed before they are folded into the aggregate.
+
+    Returns:
+        The aggregate of the messages, lines without a known level are skipped.
+
+    Raises:
+        ValueError: If a timestamp is not in the "YYYY-MM-DD HH:MM:SS" format.
+    """
+    aggregate = LogAggregate()
+    message_ids = {}
+    day_cache = {}
+    epochs, level_codes, ids = array("q"), array("b"), array("q")
+
+    for message in messages:
+        level = parse_level(message)
+        if level is None:
+            continue
+        text = message[TIMESTAMP_LENGTH + len(level) + 2:]
+        message_id = message_ids.get((level, text))
+        if message_id is None:
+            message_id = message_ids[(level, text)] = len(aggregate.messages)
+            aggregate.messages.append((level, text))
+
+        epochs.append(parse_epoch_seconds(message[:TIMESTAMP_LENGTH], day_cache))
+        level_codes.append(LEVEL_CODES[level])
+        ids.append(message_id)
+        if len(epochs) >= batch_size:
+            _fold_batch(aggregate, epochs, level_codes, ids)
+            epochs, level_codes, ids = array("q"), array("b"), array("q")
+
+    _fold_batch(aggregate, epochs, level_codes, ids)
+    return aggregate
+
+
+def format_epoch_seconds(epoch_seconds: int) -> str:
+    """Formats seconds since the epoch as a "YYYY-MM-DD HH:MM:SS" timestamp in UTC."""
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(epoch_seconds))
+
+
+def top_messages(aggregate: LogAggregate, level: str, top: int) -> list[dict[str, str | int]]:
+    """Returns the most frequent messages of a level with their counts and first and last seen times.
+
+    Args:
+        aggregate: The aggregate returned by aggregate_log.
+        level: One of LOG_LEVELS.
+        top: The maximum number of messages returned, ties are ordered by first appearance.
+
+    Returns:
+        A list of dictionaries with the level, message, count, first_seen and last_seen of each message.
+    """
+    message_ids = np.array([message_id for message_id, (message_level, _) in enumerate(aggregate.messages)
+                            if message_level == level], dtype=np.int64)
+    if not len(message_ids):
+        return []
+    most_frequent = message_ids[np.argsort(-aggregate.message_counts[message_ids], kind="stable")[:top]]
+    return [
+        {
+            "level": level,
+            "message": aggregate.messages[message_id][1],
+            "count": int(aggregate.message_counts[message_id]),
+            "first_seen": format_epoch_seconds(int(aggregate.first_seen[message_id])),
+            "last_seen": format_epoch_seconds(int(aggregate.last_seen[message_id])),
+        }
+        for message_id in most_frequent.tolist()
+    ]
+
+
+@profiled("write_aggregate")
+def write_aggregate(aggregate: LogAggregate, logs_dir: Path, top: int = 10, output_format: str = "csv") -> list[Path]:
+    """Writes the per-minute counts and the top messages of each level of an aggregate.
+
+    Args:
+        aggregate: The aggregate returned by aggregate_log.
+        logs_dir: The directory the files are written to.
+        top: The number of most frequent messages written for each level.
+        output_format: One of AGGREGATE_FORMATS, csv writes two files and json writes a single file.
+
+    Returns:
+        The paths of the written files.
+
+    Raises:
+        ValueError: If the output format is unknown.
+        OSError: If the files cannot be written.
+    """
+    minute_rows = [
+        {"minute": format_epoch_seconds(minute * 60), "level": LOG_LEVELS[level_code], "count": count}
+        for (minute, level_code), count in sorted(aggregate.minute_counts.items())
+    ]
+    message_rows = [row for level in LOG_LEVELS for row in top_messages(aggregate, level, top)]
+
+    if output_format == "json":
+        output_path = logs_dir / "aggregate.json"
+        with open(output_path, "w") as file:
+            json.dump({"per_minute": minute_rows, "top_messages": message_rows}, file, indent=2)
+        return [output_path]
+    if output_format == "csv":
+        output_paths = []
+        for file_name, rows, columns in (("aggregate_per_minute.csv", minute_rows, ["minute", "level", "count"]),
+                                         ("aggregate_top_messages.csv", message_rows,
+                                          ["level", "message", "count", "first_seen", "last_seen"])):
+            output_path = logs_dir / file_name
+            with open(output_path, "w", newline="") as file:
+                writer = csv.DictWriter(file, fieldnames=columns)
+                writer.writeheader()
+                writer.writerows(rows)
+            output_paths.append(output_path)
+        return output_paths
+    raise ValueError(f"Unknown output format: {output_format}, expected one of {AGGREGATE_FORMATS}")
+
+
+def get_logs_dir() -> Path:
+    """Returns the directory the per-level log files are written to, creating it if it doesn't exist.
+
+    Raises:
+        OSError: If directory cannot be created.
+    """
+    # Checks if there is a "logs" directory in the project root directory, if not it creates one
+    logs_dir = Path(__file__).parent.parent / "logs" / "Delopgave_2"
+    logs_dir.mkdir(exist_ok=True, parents=True) # raises OSError if directory cannot be created
+    return logs_dir
+
+
+def get_level_file_path(logs_dir: Path, level: str) -> Path:
+    """Returns the path of the output file of a log level."""
+    return logs_dir / f"{level.lower()}_log.txt"
+
+
 def get_path(filepath: str) -> Path:
     """Returns the path object from an input string, this ensures compatibility across different OS paths.
 
@@ -101,32 +1058,103 @@ def get_path(filepath: str) -> Path:
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="Log file analysis")    
-    parser.add_argument("-f", "--file", type=str, default="../Data/app_log (logfil analyse) - random.txt")
+    parser.add_argument("-f", "--file", type=str, default="../Data/app_log (logfil analyse) - random.txt",
+                        help="log file, directory of log files or glob pattern such as \"logs/app.log*\", "
+                             "gzip, bz2 and xz files are decompressed while reading")
+    parser.add_argument("-r", "--readers", type=int, default=4,
+                        help="number of log files read concurrently when several are given (default: 4)")
+    mode_group = parser.add_mutually_exclusive_group()
+    mode_group.add_argument("--incremental", action="store_true",
+                            help="only process lines appended since the last run and append them to the output files")
+    mode_group.add_argument("--follow", action="store_true",
+                            help="keep processing lines as they are appended to the log file")
+    parser.add_argument("--interval", type=float, default=1.0,
+                        help="seconds between checks for new lines in --follow mode (default: 1.0)")
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help="number of processes classifying the log file in parallel (default: 1)")
+    parser.add_argument("--since", type=normalise_timestamp, default=None,
+                        help="print the messages at or after this time, e.g. \"2024-02-25 09:15\", instead of writing files")
+    parser.add_argument("--until", type=normalise_timestamp, default=None,
+                        help="print the messages before this time instead of writing files")
+    parser.add_argument("--level", choices=LOG_LEVELS, nargs="+", default=None,
+                        help="only print messages of these levels with --since/--until")
+    parser.add_argument("--no-index", action="store_true",
+                        help="find the start of --since by binary search instead of the sparse index next to the log file")
+    parser.add_argument("--aggregate", action="store_true",
+                        help="write per-minute counts and the most frequent messages of each level instead of the per-level files")
+    parser.add_argument("--top", type=int, default=10,
+                        help="number of most frequent messages of each level written by --aggregate (default: 10)")
+    parser.add_argument("--format", choices=AGGREGATE_FORMATS, default="csv",
+                        help="file format written by --aggregate (default: csv)")
+    add_cache_arguments(parser)
+    add_profile_arguments(parser)
         
     # Extract commandline arguments as booleans
     args = parser.parse_args()
 
     try:
-        log_path = get_path(args.file)
-        log_messages = read_file(log_path)
-        separated_logs = seperate_log_by_type(log_messages)
-        write_dict_to_files(separated_logs)
+        log_paths = resolve_log_paths(args.file)
+        log_path = log_paths[0]
+        logs_dir = get_logs_dir()
+        single_plain_file = len(log_paths) == 1 and not is_compressed(log_path)
+        if not single_plain_file and (args.since or args.until or args.follow or args.incremental):
+            raise ValueError("--since, --until, --follow and --incremental need a single uncompressed log file")
+        profiler = start_profiler(args, "logfile_analysis")
+
+        if args.since or args.until:
+            for message in query_time_range(log_path, args.since, args.until, args.level, use_index=not args.no_index):
+                print(message)
+            return
+
+        if args.aggregate:
+            cache = ResultCache.from_args(args)
+            with profiler.stage("aggregate", nbytes=sum(path.stat().st_size for path in log_paths)):
+                aggregate = cache.get_or_compute(log_paths, {"stage": "aggregate_log"},
+                                                 lambda: aggregate_log(iter_logs(log_paths, args.readers)))
+            for output_path in write_aggregate(aggregate, logs_dir, args.top, args.format):
+                print(f"Aggregate written to {output_path}")
+        elif args.follow:
+            follow_log(log_path, logs_dir, args.interval)
+        elif args.incremental:
+            processed_bytes = process_new_lines(log_path, logs_dir)
+            print(f"Processed {processed_bytes} new bytes")
+        else:
+            # A full run rewrites the output files, so a checkpoint of an earlier incremental run is stale
+            (logs_dir / CHECKPOINT_FILE_NAME).unlink(missing_ok=True)
+            cache = ResultCache.from_args(args)
+            # A cached summary means the per-level files are already up to date with the log file
+            # Byte ranges can only be split off a single uncompressed file
+            if args.workers > 1 and single_plain_file:
+                classify_log = lambda: classify_log_parallel(log_path, logs_dir, args.workers)
+            else:
+                classify_log = lambda: classify_log_stream(iter_logs(log_paths, args.readers), logs_dir)
+            # Both ways of classifying give the same files, so the number of workers isn't part of the cache key
+            with profiler.stage("classify", nbytes=sum(path.stat().st_size for path in log_paths)):
+                cache.get_or_compute(log_paths, {"stage": "classify_log_stream", "logs_dir": str(logs_dir)}, classify_log,
+                                     is_valid=lambda summary: outputs_match_summary(summary, logs_dir))
         
-        print(f"Successfully processed log file and wrote files to {log_path}")
+        print(f"Successfully processed log file and wrote files to {', '.join(str(path) for path in log_paths)}")
 
     except ValueError as ve:
         print(f"ValueError: {ve}")
+        sys.exit(1)
 
     except FileNotFoundError as fnfe:
         print(f"FileNotFoundError: {fnfe}") 
+        sys.exit(1)
     
     except IOError as e:
         print(f"Error: {e}")
         print(f"File permissions of {log_path}")
         print(f"Read: {os.access(log_path, os.R_OK)}, Write: {os.access(log_path, os.W_OK)}, Execute: {os.access(log_path, os.X_OK)}")
+        sys.exit(1)
     
     except OSError as ose:
         print(f"OSError: {ose}")
+        sys.exit(1)
+
+    finally:
+        stop_profiler()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,93 @@
+import argparse
+import multiprocessing
+import random
+import resource
+import tempfile
+import time
+from pathlib import Path
+
+from error_handling import Config, get_path, migrate_csv, migrate_csv_parallel
+
+BENCHMARK_OUTPUT_NAME = "benchmark_output.csv"
+FIRST_NAMES = ["Hailey", "Mark", "Amy", "Ashley", "Megan", "Brooke", "Leslie", "Christian", "Melissa", "Charles"]
+LAST_NAMES = ["Little", "Luna", "Chavez", "Glenn", "Evans", "Davis", "Smith", "Robinson", "Arellano", "Holmes"]
+DOMAINS = ["gmail.com", "yahoo.com", "hotmail.com"]
+
+
+def generate_customer_row(rng: random.Random, customer_id: int) -> str:
+    """Returns a line of a customer csv with roughly the defect mix of Data/source_data.csv.
+
+    About 84% of the rows are valid, the rest are blank rows, rows with an extra column, rows with an
+    empty field and rows with an empty, "nan" or negative customer_id.
+    """
+    first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    name = f"{first_name} {last_name}"
+    email = f"{first_name.lower()}.{last_name.lower()}@{rng.choice(DOMAINS)}"
+    amount = f"{rng.uniform(1, 1000):.2f}"
+    defect = rng.random()
+    if defect < 0.05:
+        return ",,,"
+    if defect < 0.10:
+        return f"{customer_id},{name},{email},,{amount}"
+    if defect < 0.13:
+        return f"{customer_id},,{email},{amount}"
+    if defect < 0.14:
+        return f",{name},{email},{amount}"
+    if defect < 0.15:
+        return f"nan,{name},{email},{amount}"
+    if defect < 0.16:
+        return f"-{customer_id},{name},{email},{amount}"
+    return f"{customer_id},{name},{email},{amount}"
+
+
+def generate_customer_file(filepath: Path, number_of_rows: int, seed: int = 0) -> None:
+    """Writes a synthetic customer csv with the columns customer_id,name,email,purchase_amount."""
+    rng = random.Random(seed)
+    with open(filepath, "w") as file:
+        file.write("customer_id,name,email,purchase_amount\n")
+        for customer_id in range(1, number_of_rows + 1):
+            file.write(generate_customer_row(rng, customer_id) + "\n")
+
+
+def _run_migration(filepath: Path, workers: int, results: multiprocessing.Queue) -> None:
+    """Migrates the file in a fresh process so its peak memory isn't affected by earlier runs."""
+    start = time.perf_counter()
+    if workers == 1:
+        summary = migrate_csv(filepath, True, BENCHMARK_OUTPUT_NAME)
+    else:
+        summary = migrate_csv_parallel(filepath, True, BENCHMARK_OUTPUT_NAME, workers)
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is in kilobytes on Linux, RUSAGE_CHILDREN reports the largest of the worker processes
+    parent_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    worker_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    results.put((elapsed, summary["rows"], parent_rss, worker_rss))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark of cleaning a csv file with a pool of processes")
+    parser.add_argument("-n", "--rows", type=int, default=10_000_000, help="number of rows in the synthetic csv (default: 10000000)")
+    parser.add_argument("-w", "--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="worker counts to benchmark (default: 1 2 4 8)")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        filepath = Path(temp_dir) / "customers.csv"
+        generate_customer_file(filepath, args.rows)
+        size_in_mb = filepath.stat().st_size / 1024**2
+        print(f"Cleaning {args.rows} rows ({size_in_mb:.1f} MB)")
+
+        try:
+            for workers in args.workers:
+                results = context.Queue()
+                process = context.Process(target=_run_migration, args=(filepath, workers, results))
+                process.start()
+                elapsed, rows_written, parent_rss, worker_rss = results.get()
+                process.join()
+                print(f"{workers:>2} workers: {elapsed:7.2f} s  {args.rows / elapsed:12,.0f} rows/s  "
+                      f"{rows_written} rows kept  peak RSS {parent_rss:6.1f} MB (largest worker {worker_rss:6.1f} MB)")
+        finally:
+            (get_path(Config.logs_dir) / BENCHMARK_OUTPUT_NAME).unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+import sys
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, fields
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+
+# The schema of the customer csv files, every row must have exactly these columns
+COLUMNS = ("customer_id", "name", "email", "purchase_amount")
+# Number of rows converted to columns at a time
+BATCH_SIZE = 1_000_000
+# Size of the buffer of the output file
+WRITE_BUFFER_SIZE = 1024 * 1024
+# Largest customer_id that fits in the int64 column
+MAX_CUSTOMER_ID = np.iinfo(np.int64).max
+
+
+@dataclass
+class CustomerColumns:
+    """Customer records stored as typed NumPy columns instead of a list of lists of strings.
+
+    The names, emails and the text of the ids and amounts are each stored as one packed UTF-8 buffer, the
+    text of row i is buffer[offsets[i]:offsets[i + 1]]. The text of the ids and amounts is kept next to
+    their values, so they are written exactly as they were read, e.g. "718.240" isn't rewritten as "718.24".
+
+    Attributes:
+        customer_id: The customer ids as int64.
+        purchase_amount: The purchase amounts as float64.
+        name_buffer: The UTF-8 encoded names, packed one after another.
+        name_offsets: The start of each name in name_buffer followed by the end of the last name.
+        email_buffer: The UTF-8 encoded emails, packed one after another.
+        email_offsets: The start of each email in email_buffer followed by the end of the last email.
+        id_buffer: The customer ids as they were written in the csv file, packed one after another.
+        id_offsets: The start of each id in id_buffer followed by the end of the last id.
+        amount_buffer: The purchase amounts as they were written in the csv file, packed one after another.
+        amount_offsets: The start of each amount in amount_buffer followed by the end of the last amount.
+    """
+    customer_id: np.ndarray
+    purchase_amount: np.ndarray
+    name_buffer: np.ndarray
+    name_offsets: np.ndarray
+    email_buffer: np.ndarray
+    email_offsets: np.ndarray
+    id_buffer: np.ndarray
+    id_offsets: np.ndarray
+    amount_buffer: np.ndarray
+    amount_offsets: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.customer_id)
+
+    @property
+    def nbytes(self) -> int:
+        """The number of bytes used by the arrays of the columns."""
+        return sum(getattr(self, column.name).nbytes for column in fields(self))
+
+    def name(self, row: int) -> str:
+        """Returns the name of a row."""
+        return self.name_buffer[self.name_offsets[row]:self.name_offsets[row + 1]].tobytes().decode()
+
+    def email(self, row: int) -> str:
+        """Returns the email of a row."""
+        return self.email_buffer[self.email_offsets[row]:self.email_offsets[row + 1]].tobytes().decode()
+
+    def rows(self) -> Iterator[list[str]]:
+        """Yields the records as lists of strings, like the rows of read_csv."""
+        name_offsets, email_offsets = self.name_offsets.tolist(), self.email_offsets.tolist()
+        id_offsets, amount_offsets = self.id_offsets.tolist(), self.amount_offsets.tolist()
+        name_bytes, email_bytes = self.name_buffer.tobytes(), self.email_buffer.tobytes()
+        id_bytes, amount_bytes = self.id_buffer.tobytes(), self.amount_buffer.tobytes()
+        for row in range(len(self)):
+            yield [
+                id_bytes[id_offsets[row]:id_offsets[row + 1]].decode(),
+                name_bytes[name_offsets[row]:name_offsets[row + 1]].decode(),
+                email_bytes[email_offsets[row]:email_offsets[row + 1]].decode(),
+                amount_bytes[amount_offsets[row]:amount_offsets[row + 1]].decode(),
+            ]
+
+
+def pack_strings(strings: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Packs an array of strings into one UTF-8 buffer and an array of offsets.
+
+    Args:
+        strings: A NumPy array of strings.
+
+    Returns:
+        The uint8 buffer and the int64 offsets, with one more offset than there are strings.
+    """
+    encoded = np.char.encode(strings, "utf-8") if len(strings) else np.zeros(0, dtype="S1")
+    lengths = np.char.str_len(encoded).astype(np.int64)
+    offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    buffer = np.frombuffer(b"".join(encoded.tolist()), dtype=np.uint8).copy()
+    return buffer, offsets
+
+
+def concatenate_columns(batches: list[CustomerColumns]) -> CustomerColumns:
+    """Concatenates batches of columns into one, shifting the offsets of the packed strings."""
+    def concatenate_offsets(offset_arrays: list[np.ndarray]) -> np.ndarray:
+        shifted = [offset_arrays[0]]
+        for offsets in offset_arrays[1:]:
+            shifted.append(offsets[1:] + shifted[-1][-1])
+        return np.concatenate(shifted)
+
+    return CustomerColumns(
+        customer_id=np.concatenate([batch.customer_id for batch in batches]),
+        purchase_amount=np.concatenate([batch.purchase_amount for batch in batches]),
+        name_buffer=np.concatenate([batch.name_buffer for batch in batches]),
+        name_offsets=concatenate_offsets([batch.name_offsets for batch in batches]),
+        email_buffer=np.concatenate([batch.email_buffer for batch in batches]),
+        email_offsets=concatenate_offsets([batch.email_offsets for batch in batches]),
+        id_buffer=np.concatenate([batch.id_buffer for batch in batches]),
+        id_offsets=concatenate_offsets([batch.id_offsets for batch in batches]),
+        amount_buffer=np.concatenate([batch.amount_buffer for batch in batches]),
+        amount_offsets=concatenate_offsets([batch.amount_offsets for batch in batches]),
+    )
+
+
+def valid_ids_mask(customer_ids: np.ndarray) -> np.ndarray:
+    """Returns a mask of the customer ids that are non-negative integers fitting in an int64.
+
+    Only the ASCII digits 0-9 are accepted, unlike str.isdigit which also accepts e.g. "²", which
+    int() can't parse. Ids of more than 18 digits are compared with the largest int64 one at a time.
+
+    Args:
+        customer_ids: A NumPy string array of customer ids.
+
+    Returns:
+        A boolean array with True for the valid ids.
+    """
+    lengths = np.char.str_len(customer_ids)
+    # Each character of a NumPy unicode string is one uint32 code point, padded with zeros
+    code_points = customer_ids.view(np.uint32).reshape(len(customer_ids), customer_ids.dtype.itemsize // 4)
+    is_ascii_digit = (code_points >= ord("0")) & (code_points <= ord("9"))
+    mask = (lengths > 0) & (is_ascii_digit | (code_points == 0)).all(axis=1)
+    for row in np.flatnonzero(mask & (lengths > len(str(MAX_CUSTOMER_ID)) - 1)):
+        mask[row] = int(customer_ids[row]) <= MAX_CUSTOMER_ID
+    return mask
+
+
+def valid_rows_mask(customer_ids: np.ndarray, names: np.ndarray, emails: np.ndarray, amounts: np.ndarray) -> np.ndarray:
+    """Returns a mask of the rows that pass the drop_empty_rows and drop_invalid_id rules, computed over whole columns.
+
+    A row is valid if no field is empty and its customer_id is a non-negative integer, see valid_ids_mask.
+    Ids that drop_invalid_id keeps but that don't fit the int64 column, like "²" or ids of 20 digits, are
+    dropped as well.
+
+    Args:
+        customer_ids, names, emails, amounts: NumPy string arrays of the four columns.
+
+    Returns:
+        A boolean array with True for the valid rows.
+    """
+    mask = valid_ids_mask(customer_ids)
+    for column in (names, emails, amounts):
+        mask &= np.char.str_len(column) > 0
+    return mask
+
+
+def parse_amounts(amounts: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Parses purchase amounts as float64, marking the ones that aren't numbers.
+
+    Returns:
+        The parsed amounts, with NaN for unparsable ones, and a mask of the amounts that could be parsed.
+    """
+    try:
+        return amounts.astype(np.float64), np.ones(len(amounts), dtype=bool)
+    except ValueError:
+        # Falls back to parsing one amount at a time only for the batches containing invalid amounts
+        parsed = np.full(len(amounts), np.nan)
+        is_number = np.zeros(len(amounts), dtype=bool)
+        for row, amount in enumerate(amounts.tolist()):
+            try:
+                parsed[row] = float(amount)
+                is_number[row] = True
+            except ValueError:
+                pass
+        return parsed, is_number
+
+
+def rows_to_columns(rows: list[list[str]]) -> tuple[CustomerColumns, int]:
+    """Converts a batch of rows to typed columns, dropping the rows that are invalid.
+
+    Rows without exactly the four columns of the schema are dropped, as are rows failing valid_rows_mask
+    and rows with an amount that isn't a number.
+
+    Args:
+        rows: A list of rows as lists of strings.
+
+    Returns:
+        The columns of the valid rows and the number of dropped rows.
+    """
+    schema_rows = [row for row in rows if len(row) == len(COLUMNS)]
+    if schema_rows:
+        customer_ids, names, emails, amounts = (np.array(column, dtype=str) for column in zip(*schema_rows))
+    else:
+        customer_ids = names = emails = amounts = np.zeros(0, dtype=str)
+
+    mask = valid_rows_mask(customer_ids, names, emails, amounts)
+    parsed_amounts, is_number = parse_amounts(np.where(mask, amounts, "0"))
+    mask &= is_number
+
+    name_buffer, name_offsets = pack_strings(names[mask])
+    email_buffer, email_offsets = pack_strings(emails[mask])
+    id_buffer, id_offsets = pack_strings(customer_ids[mask])
+    amount_buffer, amount_offsets = pack_strings(amounts[mask])
+    columns = CustomerColumns(
+        customer_id=customer_ids[mask].astype(np.int64),
+        purchase_amount=parsed_amounts[mask],
+        name_buffer=name_buffer,
+        name_offsets=name_offsets,
+        email_buffer=email_buffer,
+        email_offsets=email_offsets,
+        id_buffer=id_buffer,
+        id_offsets=id_offsets,
+        amount_buffer=amount_buffer,
+        amount_offsets=amount_offsets,
+    )
+    return columns, len(rows) - len(columns)
+
+
+def list_of_lists_size(rows: list[list[str]]) -> int:
+    """Returns the approximate number of bytes used by rows stored as a list of lists of strings."""
+    return sys.getsizeof(rows) + sum(sys.getsizeof(row) + sum(sys.getsizeof(field) for field in row) for row in rows)
+
+
+def build_columns(rows: Iterable[list[str]], skip_header: bool = True, batch_size: int = BATCH_SIZE,
+                  measure_lists: bool = False) -> tuple[CustomerColumns, int, int]:
+    """Converts rows, e.g. from read_csv, to typed columns in batches, dropping invalid rows.
+
+    Args:
+        rows: An iterable of rows as lists of strings.
+        skip_header: If True the first row is skipped as the header.
+        batch_size: The number of rows converted at a time.
+        measure_lists: If True the memory the valid rows would use as a list of lists is measured as well.
+
+    Returns:
+        The columns, the number of dropped rows and the size in bytes of the valid rows as a list of
+        lists (0 unless measure_lists is True).
+    """
+    rows = iter(rows)
+    if skip_header:
+        next(rows, None)
+
+    batches = []
+    dropped_rows = 0
+    list_bytes = 0
+    while batch := list(islice(rows, batch_size)):
+        columns, dropped = rows_to_columns(batch)
+        batches.append(columns)
+        dropped_rows += dropped
+        if measure_lists:
+            list_bytes += list_of_lists_size(list(columns.rows())) - sys.getsizeof([])
+
+    if not batches:
+        batches.append(rows_to_columns([])[0])
+    return concatenate_columns(batches), dropped_rows, list_bytes + sys.getsizeof([])
+
+
+def write_columns_csv(columns: CustomerColumns, filepath: Path) -> int:
+    """Writes the columns to a csv file without a header, like write_csv.
+
+    Returns:
+        The number of rows written.
+    """
+    with open(filepath, "w", buffering=WRITE_BUFFER_SIZE) as file:
+        for row in columns.rows():
+            file.write(",".join(row) + "\n")
+    return len(columns)
+
+
+def save_npz(columns: CustomerColumns, filepath: Path) -> None:
+    """Saves the columns to an uncompressed .npz file, which loads much faster than parsing the csv."""
+    np.savez(filepath, **{column.name: getattr(columns, column.name) for column in fields(columns)})
+
+
+def load_npz(filepath: Path) -> CustomerColumns:
+    """Loads columns saved by save_npz.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+        ValueError: If the file doesn't contain the customer columns.
+    """
+    if not filepath.exists():
+        raise FileNotFoundError(f"File not found at: {filepath}")
+    with np.load(filepath) as arrays:
+        try:
+            return CustomerColumns(**{column.name: arrays[column.name] for column in fields(CustomerColumns)})
+        except KeyError as error:
+            raise ValueError(f"File doesn't contain customer columns: {filepath}") from error
@@ -1,8 +1,27 @@
 import argparse
+import json
+import locale
 import os
+import shutil
+import sys
+import tempfile
 from pathlib import Path
-from dataclasses import dataclass
-
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import BinaryIO
+
+# Makes the shared modules in the project root importable when the script is run directly
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common.cache import ResultCache, add_cache_arguments
+from common.chunking import open_byte_range, split_file
+from common.profiling import add_profile_arguments, get_profiler, profiled, start_profiler, stop_profiler
+from integrity import DEFAULT_BLOOM_BYTES, REASONS, check_integrity, get_quarantine_path
+
+# Size of the buffer of the output file
+WRITE_BUFFER_SIZE = 1024 * 1024
+# Number of rows written between the checkpoints of the --resume mode
+CHECKPOINT_EVERY = 100_000
 
 @dataclass
 class Config:
@@ -11,19 +30,51 @@ class Config:
     output_file_name: str = "output_data.csv"
     drop_rows: bool = False
     verbose: bool = False
+    workers: int = 1
+    columnar: bool = False
+    save_npz: bool = False
+    memory_report: bool = False
+    integrity: bool = False
+    spill: bool = False
+    bloom_size_mb: int = DEFAULT_BLOOM_BYTES // 1024**2
+    resume: bool = False
+    checkpoint_every: int = CHECKPOINT_EVERY
+
 
-def read_csv(filepath: Path) -> list[list[str]]:
-    """Reads a csv file and returns its content as a list of lists of strings.
+@dataclass
+class MigrationCheckpoint:
+    """How far a migration in the --resume mode has come.
+
+    Attributes:
+        input_path: The resolved path of the input file.
+        input_size: The size of the input file, a different size means the file has changed.
+        input_mtime: The modification time of the input file in nanoseconds.
+        drop_rows: Whether rows with empty values or invalid ids are dropped.
+        input_offset: The byte offset in the input file right after the last processed line.
+        rows_written: The number of rows written to the output file.
+        output_bytes: The length of the output file in bytes.
+    """
+    input_path: str
+    input_size: int
+    input_mtime: int
+    drop_rows: bool
+    input_offset: int = 0
+    rows_written: int = 0
+    output_bytes: int = 0
+
+def read_csv(filepath: Path) -> Iterator[list[str]]:
+    """Reads a csv file and yields its rows as lists of strings, one row at a time.
     
     Args:
         filepath: The Path object pointing to the file containing log files.
         
     Returns: 
-        A list of lists of strings.
+        An iterator of lists of strings. Like splitting the whole file at newlines, a file ending with a
+        newline gives a last row containing a single empty string.
 
     Raises:
         FileNotFoundError: If the file does not exist at the given path
-        ValueError: If the given path is not a csv file or the csv file is empty.
+        ValueError: If the given path is not a csv file.
         OSError: If there are no read permissions for the file.
     """
     
@@ -36,59 +87,110 @@ def read_csv(filepath: Path) -> list[list[str]]:
     if not filepath.suffix == ".csv":
         raise ValueError(f"File is not a .csv file: {filepath}")
 
+    return _stream_rows(filepath)
+
+
+@profiled("read_csv")
+def _stream_rows(filepath: Path) -> Iterator[list[str]]:
+    """Yields the rows of a csv file, see read_csv."""
     with open(filepath, "r") as file:
-        # Double list comprehension to split lines by newline and then by comma finally stripping whitespace from each element in the csv file
-        file_contents = [[element.strip() for element in line.split(",")] for line in file.read().split("\n")]
+        yield from _split_rows(file, is_end_of_file=True)
 
-    if not file_contents:
-        raise ValueError(f"File is empty: {filepath}")
 
-    return file_contents
+def _split_rows(lines: Iterable[str], is_end_of_file: bool) -> Iterator[list[str]]:
+    """Splits lines of a csv file into rows, the end of the file gives an empty row if it ends with a newline."""
+    line = "\n"
+    for line in lines:
+        # Splits the line by comma and strips whitespace from each element
+        yield [element.strip() for element in line.split(",")]
+    # Splitting the whole file at newlines would give an empty last line after the final newline
+    if is_end_of_file and line.endswith("\n"):
+        yield [""]
 
 
-def drop_empty_rows(data: list[list[str]]) -> list[list[str]]:
+@profiled("drop_empty_rows")
+def drop_empty_rows(data: Iterable[list[str]]) -> Iterator[list[str]]:
     """Removes rows that contains any empty strings
     
     Args:
-        data: a list of lists of strings
+        data: an iterable of lists of strings
         
     Returns:
-        A list of lists of strings with no empty strings in any row
+        An iterator of lists of strings with no empty strings in any row
     
     Raises:
-        ValueError: If the data list is empty."""
+        ValueError: If the data is empty, raised when the iterator is consumed."""
     
-    if not data:
+    is_empty = True
+    for row in data:
+        is_empty = False
+        if "" not in row:
+            yield row
+    if is_empty:
         raise ValueError(f"Data can't be empty")
-    data = [row for row in data if "" not in row]
-    return data
 
 
-def drop_invalid_id(data: list[list[str]]) -> list[list[str]]:
+@profiled("drop_invalid_id")
+def drop_invalid_id(data: Iterable[list[str]]) -> Iterator[list[str]]:
     """Removes rows where the first element is either negative or a nan value, the function skips the first row of data.
     
     Args:
-        data: a list of lists of strings
+        data: an iterable of lists of strings
          
     Returns:
-        A list of lists of strings with no invalid ids in the first column
+        An iterator of lists of strings with no invalid ids in the first column
 
     Raises:
-        ValueError: If the data list is empty."""
+        ValueError: If the data is empty, raised when the iterator is consumed."""
     
-    if not data:
+    rows = iter(data)
+    # Skips the header row
+    if next(rows, None) is None:
         raise ValueError(f"Data can't be empty")
     
-    # Skips the header row, row[0] corresponds to the customer_id
-    data = [row for row in data[1:] if row[0].isdigit()]
-    return data
+    for row in rows:
+        if has_valid_id(row):
+            yield row
+
 
+def has_valid_id(row: list[str]) -> bool:
+    """Returns True if the first element of the row, the customer_id, is a non-negative integer."""
+    return row[0].isdigit()
 
-def write_csv(data: list[list[str]], file_output_name) -> None:
-    """Writes a list of lists to a csv file.
+
+def load_csv(filepath: Path, drop_rows: bool) -> Iterator[list[str]]:
+    """Reads a csv file and optionally drops rows with empty values or invalid ids.
+
+    Args:
+        filepath: The Path object pointing to the csv file.
+        drop_rows: If True rows containing empty values or invalid ids are dropped.
+
+    Returns:
+        An iterator of lists of strings.
+    """
+    file_content = read_csv(filepath)
+    if drop_rows:
+        file_content = drop_empty_rows(file_content)
+        file_content = drop_invalid_id(file_content)
+    return file_content
+
+
+def print_rows(data: Iterable[list[str]]) -> Iterator[list[str]]:
+    """Prints each row to the terminal as it passes through, used for the --verbose flag."""
+    for row in data:
+        print(row)
+        yield row
+
+
+@profiled("write_csv")
+def write_csv(data: Iterable[list[str]], file_output_name) -> int:
+    """Writes rows of strings to a csv file, one row at a time through a large write buffer.
     
     Args:
-        data: a list of lists of strings
+        data: an iterable of lists of strings
+
+    Returns:
+        The number of rows written.
 
     Raises:
         OSError: If the directory can't be created.
@@ -98,9 +200,354 @@ def write_csv(data: list[list[str]], file_output_name) -> None:
     logs_dir = get_path(Config.logs_dir)
     logs_dir.mkdir(exist_ok=True, parents=True) # raises OSError if directory cannot be created
 
-    with open(logs_dir / file_output_name, "w") as file:
+    rows_written = 0
+    with open(logs_dir / file_output_name, "w", buffering=WRITE_BUFFER_SIZE) as file:
         for row in data:
             file.write(",".join(row) + "\n") # Concatenates list elements with commas and adds a newline
+            rows_written += 1
+    return rows_written
+
+
+def migrate_csv(filepath: Path, drop_rows: bool, file_output_name: str, verbose: bool = False) -> dict[str, int]:
+    """Streams the rows of a csv file through the cleaning steps into the output csv file.
+
+    Only one row is kept in memory at a time, so the size of the file doesn't matter.
+
+    Args:
+        filepath: The Path object pointing to the csv file.
+        drop_rows: If True rows containing empty values or invalid ids are dropped.
+        file_output_name: The name of the output file in the logs directory.
+        verbose: If True each row is printed as it is written.
+
+    Returns:
+        The number of rows and bytes written to the output file.
+    """
+    rows = load_csv(filepath, drop_rows)
+    if verbose:
+        rows = print_rows(rows)
+    rows_written = write_csv(rows, file_output_name)
+    return {"rows": rows_written, "bytes": (get_path(Config.logs_dir) / file_output_name).stat().st_size}
+
+
+def _clean_byte_range(filepath: Path, start: int, end: int, is_end_of_file: bool, drop_rows: bool,
+                      chunk_path: Path) -> tuple[int, bool, bool]:
+    """Cleans the rows of one byte range of a csv file into a temporary file, used by the worker processes.
+
+    drop_invalid_id skips the first row left after drop_empty_rows, which may be in any chunk, so every
+    valid row is written here and the caller removes the one row that has to be skipped.
+
+    Returns:
+        The number of rows written, whether any row was left after drop_empty_rows and whether the first
+        of those rows was written.
+    """
+    rows_written = 0
+    has_non_empty_row = False
+    first_non_empty_row_written = False
+    with open_byte_range(filepath, start, end) as file, open(chunk_path, "w", buffering=WRITE_BUFFER_SIZE) as chunk_file:
+        rows = _split_rows(file, is_end_of_file)
+        if drop_rows:
+            rows = drop_empty_rows(rows)
+        for row in rows:
+            if drop_rows:
+                row_is_valid = has_valid_id(row)
+                if not has_non_empty_row:
+                    has_non_empty_row = True
+                    first_non_empty_row_written = row_is_valid
+                if not row_is_valid:
+                    continue
+            chunk_file.write(",".join(row) + "\n")
+            rows_written += 1
+    return rows_written, has_non_empty_row, first_non_empty_row_written
+
+
+@profiled("migrate_csv_parallel")
+def migrate_csv_parallel(filepath: Path, drop_rows: bool, file_output_name: str, workers: int) -> dict[str, int]:
+    """Cleans a csv file with a pool of processes and writes the rows in their original order.
+
+    The file is split into byte ranges at line boundaries, each range is cleaned into a temporary file by a
+    worker process and the temporary files are concatenated in order. The output is the same as the one
+    written by migrate_csv, including the header row being dropped exactly once.
+
+    Args:
+        filepath: The Path object pointing to the csv file.
+        drop_rows: If True rows containing empty values or invalid ids are dropped.
+        file_output_name: The name of the output file in the logs directory.
+        workers: The number of processes to use.
+
+    Returns:
+        The number of rows and bytes written to the output file.
+
+    Raises:
+        ValueError: If the number of workers isn't positive or no rows are left after dropping empty rows.
+        OSError: If the files cannot be read or written.
+    """
+    if workers < 1:
+        raise ValueError(f"workers must be positive, got: {workers}")
+    read_csv(filepath) # validates the file before starting any processes
+    byte_ranges = split_file(filepath, workers)
+    if not byte_ranges:
+        return migrate_csv(filepath, drop_rows, file_output_name)
+
+    logs_dir = get_path(Config.logs_dir)
+    logs_dir.mkdir(exist_ok=True, parents=True) # raises OSError if directory cannot be created
+    output_path = logs_dir / file_output_name
+    # The temporary files are created next to the output file so concatenating them doesn't cross file systems
+    with tempfile.TemporaryDirectory(dir=logs_dir, prefix=".chunks_") as temp_dir:
+        chunk_paths = [Path(temp_dir) / f"chunk_{index}.csv" for index in range(len(byte_ranges))]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_clean_byte_range, filepath, start, end, index == len(byte_ranges) - 1,
+                                       drop_rows, chunk_path)
+                       for index, ((start, end), chunk_path) in enumerate(zip(byte_ranges, chunk_paths))]
+            results = [future.result() for future in futures]
+
+        # The header row skipped by drop_invalid_id is the first row left after dropping empty rows
+        skipped_chunk = None
+        if drop_rows:
+            skipped_chunk = next((index for index, (_, has_non_empty_row, _) in enumerate(results) if has_non_empty_row), None)
+            if skipped_chunk is None:
+                raise ValueError(f"Data can't be empty")
+
+        rows_written = 0
+        with open(output_path, "wb") as output_file:
+            for index, (chunk_path, (chunk_rows, _, first_row_written)) in enumerate(zip(chunk_paths, results)):
+                with open(chunk_path, "rb") as chunk_file:
+                    if index == skipped_chunk and first_row_written:
+                        chunk_file.readline()
+                        chunk_rows -= 1
+                    shutil.copyfileobj(chunk_file, output_file, WRITE_BUFFER_SIZE)
+                rows_written += chunk_rows
+    return {"rows": rows_written, "bytes": output_path.stat().st_size}
+
+
+def migrate_csv_columnar(filepath: Path, file_output_name: str, save_binary: bool = False,
+                         memory_report: bool = False) -> dict[str, int]:
+    """Cleans a csv file through typed NumPy columns instead of lists of strings.
+
+    The rows are validated with vectorized masks, which drops the same rows as --drop-rows and also rows
+    that don't match the four column schema, have an amount that isn't a number or an id that doesn't fit
+    in an int64. The kept rows are written exactly as --drop-rows writes them. The input can also be
+    a .npz file written by an earlier run with save_binary.
+
+    Args:
+        filepath: The Path object pointing to the csv or .npz file.
+        file_output_name: The name of the output file in the logs directory.
+        save_binary: If True the columns are also saved to a .npz file next to the output file.
+        memory_report: If True the memory used by the columns is compared with a list of lists.
+
+    Returns:
+        The number of rows and bytes written to the output file.
+
+    Raises:
+        ValueError: If the file isn't a csv or .npz file.
+        OSError: If the files cannot be read or written.
+    """
+    # Imported here as the columns need NumPy, which the other ways of migrating don't
+    from customer_columns import build_columns, load_npz, save_npz, write_columns_csv
+
+    profiler = get_profiler()
+    if filepath.suffix == ".npz":
+        with profiler.stage("load_npz"):
+            columns = load_npz(filepath)
+        dropped_rows = list_bytes = 0
+    else:
+        with profiler.stage("build_columns") as stage:
+            columns, dropped_rows, list_bytes = build_columns(read_csv(filepath), measure_lists=memory_report)
+            stage.add(rows=len(columns) + dropped_rows)
+
+    logs_dir = get_path(Config.logs_dir)
+    logs_dir.mkdir(exist_ok=True, parents=True) # raises OSError if directory cannot be created
+    output_path = logs_dir / file_output_name
+    with profiler.stage("write_columns_csv") as stage:
+        stage.add(rows=write_columns_csv(columns, output_path), nbytes=output_path.stat().st_size)
+    if save_binary:
+        with profiler.stage("save_npz"):
+            save_npz(columns, output_path.with_suffix(".npz"))
+
+    if memory_report:
+        print(f"Rows kept: {len(columns)}, rows dropped: {dropped_rows}")
+        print(f"Typed columns: {columns.nbytes / 1024**2:.2f} MB")
+        if list_bytes:
+            print(f"List of lists: {list_bytes / 1024**2:.2f} MB ({list_bytes / max(columns.nbytes, 1):.1f}x the columns)")
+    return {"rows": len(columns), "bytes": output_path.stat().st_size}
+
+
+@profiled("check_integrity")
+def migrate_csv_checked(filepath: Path, file_output_name: str, spill: bool = False,
+                        bloom_bytes: int = DEFAULT_BLOOM_BYTES) -> dict[str, int]:
+    """Migrates a csv file through the integrity checks, quarantining the rows that fail them.
+
+    Besides empty fields and invalid ids, rows with the wrong number of columns, amounts that aren't
+    numbers and duplicate ids or emails are written to a quarantine file next to the output file, together
+    with the line number and reason code. The input is read once.
+
+    Args:
+        filepath: The Path object pointing to the csv file.
+        file_output_name: The name of the output file in the logs directory.
+        spill: If True the ids and emails seen are kept on disk behind a Bloom filter instead of in memory.
+        bloom_bytes: The size of the Bloom filter in spill mode.
+
+    Returns:
+        The number of rows and bytes written to the output file and the number of quarantined rows per reason.
+    """
+    rows = read_csv(filepath)
+    logs_dir = get_path(Config.logs_dir)
+    logs_dir.mkdir(exist_ok=True, parents=True) # raises OSError if directory cannot be created
+    return check_integrity(rows, logs_dir / file_output_name, spill, bloom_bytes)
+
+
+def get_partial_path(output_path: Path) -> Path:
+    """Returns the path of the temporary file the --resume mode writes to, renamed to output_path when done."""
+    return output_path.with_name(f"{output_path.name}.partial")
+
+
+def get_migration_checkpoint_path(output_path: Path) -> Path:
+    """Returns the path of the checkpoint of the --resume mode."""
+    return output_path.with_name(f"{output_path.name}.checkpoint.json")
+
+
+def load_migration_checkpoint(checkpoint_path: Path, partial_path: Path, filepath: Path,
+                              drop_rows: bool) -> MigrationCheckpoint | None:
+    """Loads the checkpoint of an interrupted migration of the input file.
+
+    Args:
+        checkpoint_path: The path of the checkpoint file.
+        partial_path: The path of the temporary output file of the interrupted migration.
+        filepath: The Path object pointing to the input file.
+        drop_rows: Whether the current run drops rows with empty values or invalid ids.
+
+    Returns:
+        The checkpoint, or None if there is no readable checkpoint for this file, options and partial output.
+    """
+    try:
+        with open(checkpoint_path, "r") as file:
+            checkpoint = MigrationCheckpoint(**json.load(file))
+    except (OSError, ValueError, TypeError):
+        return None
+    stat = filepath.stat()
+    if (checkpoint.input_path, checkpoint.input_size, checkpoint.input_mtime, checkpoint.drop_rows) != \
+            (str(filepath.resolve()), stat.st_size, stat.st_mtime_ns, drop_rows):
+        return None
+    # The output written after the checkpoint is discarded, but the output before it has to be there
+    if not partial_path.is_file() or partial_path.stat().st_size < checkpoint.output_bytes:
+        return None
+    return checkpoint
+
+
+def save_migration_checkpoint(checkpoint: MigrationCheckpoint, checkpoint_path: Path) -> None:
+    """Saves a checkpoint, replacing the old one atomically so it is never left half-written.
+
+    Raises:
+        OSError: If the checkpoint cannot be written.
+    """
+    temporary_path = checkpoint_path.with_suffix(".tmp")
+    with open(temporary_path, "w") as file:
+        json.dump(asdict(checkpoint), file)
+    os.replace(temporary_path, checkpoint_path)
+
+
+class _OffsetLineReader:
+    """Iterates over the lines of a binary file like a file opened in text mode, keeping track of the byte offset.
+
+    Lines are split at lone carriage returns too, like universal newlines. The offset is moved past a line of
+    the file when its last part is yielded, so it is only a safe place to resume from when is_at_line_end is True.
+
+    Args:
+        file: The file opened in binary mode, positioned at offset.
+        offset: The byte offset of the current position of the file.
+    """
+
+    def __init__(self, file: BinaryIO, offset: int):
+        self.file = file
+        self.offset = offset
+        self.is_at_line_end = True
+
+    def __iter__(self) -> Iterator[str]:
+        encoding = locale.getpreferredencoding(False)
+        for line in iter(self.file.readline, b""):
+            *complete_parts, last_part = line.decode(encoding).replace("\r\n", "\n").replace("\r", "\n").split("\n")
+            parts = [part + "\n" for part in complete_parts] + ([last_part] if last_part else [])
+            for index, part in enumerate(parts):
+                self.is_at_line_end = index == len(parts) - 1
+                if self.is_at_line_end:
+                    self.offset += len(line)
+                yield part
+
+
+@profiled("migrate_csv_resumable")
+def migrate_csv_resumable(filepath: Path, drop_rows: bool, file_output_name: str,
+                          checkpoint_every: int = CHECKPOINT_EVERY) -> dict[str, int]:
+    """Migrates a csv file like migrate_csv, but can continue where an interrupted run stopped.
+
+    The rows are written to a temporary file next to the output file, and every checkpoint_every rows the
+    output is flushed to disk and a checkpoint is saved with the input offset, the rows written and the
+    output length. A run finding a checkpoint for the same input file and options truncates the temporary
+    file to the checkpointed length and continues from the checkpointed offset. When the run completes the
+    temporary file is renamed to the output file, so the output file is never half-written.
+
+    Args:
+        filepath: The Path object pointing to the csv file.
+        drop_rows: If True rows containing empty values or invalid ids are dropped.
+        file_output_name: The name of the output file in the logs directory.
+        checkpoint_every: The number of rows written between checkpoints.
+
+    Returns:
+        The number of rows and bytes written to the output file.
+
+    Raises:
+        ValueError: If checkpoint_every isn't positive or the data is empty.
+        OSError: If the files cannot be read or written.
+    """
+    if checkpoint_every < 1:
+        raise ValueError(f"checkpoint_every must be positive, got: {checkpoint_every}")
+    read_csv(filepath) # validates the file
+    logs_dir = get_path(Config.logs_dir)
+    logs_dir.mkdir(exist_ok=True, parents=True) # raises OSError if directory cannot be created
+    output_path = logs_dir / file_output_name
+    partial_path = get_partial_path(output_path)
+    checkpoint_path = get_migration_checkpoint_path(output_path)
+
+    checkpoint = load_migration_checkpoint(checkpoint_path, partial_path, filepath, drop_rows)
+    if checkpoint is None:
+        stat = filepath.stat()
+        checkpoint = MigrationCheckpoint(str(filepath.resolve()), stat.st_size, stat.st_mtime_ns, drop_rows)
+    with open(partial_path, "ab") as partial_file:
+        partial_file.truncate(checkpoint.output_bytes)
+
+    with open(filepath, "rb") as input_file, open(partial_path, "a", buffering=WRITE_BUFFER_SIZE) as output_file:
+        input_file.seek(checkpoint.input_offset)
+        reader = _OffsetLineReader(input_file, checkpoint.input_offset)
+        rows = _split_rows(reader, is_end_of_file=True)
+        if drop_rows and checkpoint.input_offset == 0:
+            rows = drop_invalid_id(drop_empty_rows(rows))
+        elif drop_rows:
+            # The header was skipped before the checkpoint, and running out of rows is no longer an error
+            rows = (row for row in rows if "" not in row and has_valid_id(row))
+
+        rows_since_checkpoint = 0
+        for row in rows:
+            output_file.write(",".join(row) + "\n")
+            checkpoint.rows_written += 1
+            rows_since_checkpoint += 1
+            # A checkpoint at the end of the file could resume past a last line without a newline
+            if rows_since_checkpoint >= checkpoint_every and reader.is_at_line_end and reader.offset < checkpoint.input_size:
+                output_file.flush()
+                os.fsync(output_file.fileno())
+                checkpoint.input_offset = reader.offset
+                checkpoint.output_bytes = os.fstat(output_file.fileno()).st_size
+                save_migration_checkpoint(checkpoint, checkpoint_path)
+                rows_since_checkpoint = 0
+
+    os.replace(partial_path, output_path)
+    checkpoint_path.unlink(missing_ok=True)
+    return {"rows": checkpoint.rows_written, "bytes": output_path.stat().st_size}
+
+
+def output_matches_summary(summary: dict[str, int], file_output_name: str) -> bool:
+    """Checks that the output file described by the summary of migrate_csv is still intact."""
+    output_path = get_path(Config.logs_dir) / file_output_name
+    if any(summary.get(reason) for reason in REASONS) and not get_quarantine_path(output_path).is_file():
+        return False
+    return output_path.is_file() and output_path.stat().st_size == summary["bytes"]
 
 
 def get_path(filepath: str) -> Path:
@@ -131,48 +578,115 @@ def setup_parser(config: Config) -> argparse.ArgumentParser:
     parser.add_argument("-o", "--output-file-name", type=str, default=config.output_file_name, help=f"(default: {config.output_file_name})")
     parser.add_argument("-d", "--drop-rows", action="store_true", help="drops rows containing invalid ids and rows containing empty values") 
     parser.add_argument("-v", "--verbose", action="store_true", help="prints contents of the csv to the terminal")
+    parser.add_argument("-w", "--workers", type=int, default=config.workers, help=f"number of processes cleaning the csv file in parallel (default: {config.workers})")
+    # The alternative ways of migrating, each replaces the default migration
+    modes = parser.add_mutually_exclusive_group()
+    modes.add_argument("-c", "--columnar", action="store_true",
+                        help="cleans the rows as typed NumPy columns with stricter validation than --drop-rows, also dropping rows without four columns, "
+                             "with an amount that isn't a number or an id that doesn't fit in an int64, the input may also be a .npz file")
+    parser.add_argument("--npz", action="store_true", help="with --columnar, also saves the columns as a .npz file next to the output")
+    parser.add_argument("--memory-report", action="store_true", help="with --columnar, compares the memory of the columns with a list of lists")
+    modes.add_argument("--integrity", action="store_true",
+                        help="also quarantines rows with the wrong number of columns, invalid amounts and duplicate ids or emails")
+    parser.add_argument("--spill", action="store_true", help="with --integrity, keeps the ids and emails seen on disk behind a Bloom filter")
+    parser.add_argument("--bloom-size", type=int, default=config.bloom_size_mb, help=f"size of the Bloom filter in MB with --spill (default: {config.bloom_size_mb})")
+    modes.add_argument("--resume", action="store_true",
+                        help="saves checkpoints while migrating and continues from the last one if an earlier run was interrupted")
+    parser.add_argument("--checkpoint-every", type=int, default=config.checkpoint_every, help=f"number of rows between checkpoints with --resume (default: {config.checkpoint_every})")
+    add_cache_arguments(parser)
+    add_profile_arguments(parser)
     return parser
 
 
+def check_arguments(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    """Exits through parser.error if the arguments combine options that can't be used together.
+
+    Args:
+        parser: The parser the arguments were parsed with.
+        args: The parsed arguments.
+    """
+    mode = "--columnar" if args.columnar else "--integrity" if args.integrity else "--resume" if args.resume else None
+    if mode is not None and args.verbose:
+        parser.error(f"--verbose only applies to the default migration and can't be combined with {mode}")
+    for flag, is_set, needed_mode in (("--npz", args.npz, "--columnar"), ("--memory-report", args.memory_report, "--columnar"),
+                                      ("--spill", args.spill, "--integrity")):
+        if is_set and mode != needed_mode:
+            parser.error(f"{flag} can only be used with {needed_mode}")
+    if args.workers > 1:
+        conflicting = [flag for flag, is_set in (("--verbose", args.verbose), ("--columnar", args.columnar),
+                                                 ("--integrity", args.integrity), ("--resume", args.resume)) if is_set]
+        if conflicting:
+            parser.error(f"--workers only applies to the default migration and can't be combined with {', '.join(conflicting)}")
+
+
 def main():
     default_config = Config()
     parser = setup_parser(default_config)
 
     # Extract command line arguments
     args = parser.parse_args()
+    check_arguments(parser, args)
     config = Config(
         input_file=args.input_file,
         logs_dir = Config.logs_dir,
         output_file_name=args.output_file_name,
         drop_rows=args.drop_rows,
-        verbose=args.verbose
+        verbose=args.verbose,
+        workers=args.workers,
+        columnar=args.columnar,
+        save_npz=args.npz,
+        memory_report=args.memory_report,
+        integrity=args.integrity,
+        spill=args.spill,
+        bloom_size_mb=args.bloom_size,
+        resume=args.resume,
+        checkpoint_every=args.checkpoint_every
     )
     
     try:
         file_path = get_path(args.input_file)
-        file_content = read_csv(file_path)
-
-        if args.drop_rows:
-            file_content = drop_empty_rows(file_content)
-            file_content = drop_invalid_id(file_content)
-        
-        if args.verbose:
-            print(file_content)
-    
-        write_csv(file_content, args.output_file_name)
+        profiler = start_profiler(args, "error_handling")
+        cache = ResultCache.from_args(args)
+        # The rows are only printed while they are migrated, so a cached run would print nothing
+        cache.enabled = cache.enabled and not args.verbose and not args.memory_report
+        if config.integrity:
+            migrate = lambda: migrate_csv_checked(file_path, config.output_file_name, config.spill, config.bloom_size_mb * 1024**2)
+        elif config.columnar:
+            migrate = lambda: migrate_csv_columnar(file_path, config.output_file_name, config.save_npz, config.memory_report)
+        elif config.resume:
+            migrate = lambda: migrate_csv_resumable(file_path, config.drop_rows, config.output_file_name, config.checkpoint_every)
+        elif config.workers > 1:
+            migrate = lambda: migrate_csv_parallel(file_path, config.drop_rows, config.output_file_name, config.workers)
+        else:
+            migrate = lambda: migrate_csv(file_path, config.drop_rows, config.output_file_name, config.verbose)
+        # A cached summary means the output file is already up to date with the input file
+        with profiler.stage("migrate") as stage:
+            summary = cache.get_or_compute(file_path, {"stage": "migrate_csv", "drop_rows": args.drop_rows, "output": args.output_file_name,
+                                             "columnar": args.columnar, "npz": args.npz, "integrity": args.integrity},
+                                             migrate, is_valid=lambda summary: output_matches_summary(summary, args.output_file_name))
+            stage.add(rows=summary["rows"], nbytes=file_path.stat().st_size)
+        if config.integrity:
+            quarantined = {reason: summary[reason] for reason in REASONS if summary[reason]}
+            print(f"Kept {summary['rows']} rows, quarantined {sum(quarantined.values())}: {quarantined}")
         print(f"Successfully read and wrote csv file to directory: {get_path(config.logs_dir)}")
 
     except ValueError as ve:
         print(f"ValueError: {ve}")
+        sys.exit(1)
 
     except FileNotFoundError as fnfe:
         print(f"FileNotFoundError: {fnfe}")
+        sys.exit(1)
                
     except OSError as ose:
         print(f"OSError: {ose}")
         print(f"File permissions of input file: {file_path}")
         print(f"Read: {os.access(file_path, os.R_OK)}, Write: {os.access(file_path, os.W_OK)}")
         print(f"Output permissions {os.access(config.logs_dir, os.W_OK)}")
+        sys.exit(1)
+
+    finally:
+        stop_profiler()
 
 
 if __name__ == "__main__":
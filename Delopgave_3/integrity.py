@@ -0,0 +1,261 @@
+import csv
+import hashlib
+import heapq
+import math
+import tempfile
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator
+from pathlib import Path
+
+# The schema of the customer csv files
+COLUMNS = ("customer_id", "name", "email", "purchase_amount")
+# Reason codes written to the quarantine file, a row gets the first that applies
+COLUMN_COUNT = "column_count"
+EMPTY_FIELD = "empty_field"
+INVALID_ID = "invalid_id"
+INVALID_AMOUNT = "invalid_amount"
+DUPLICATE_ID = "duplicate_id"
+DUPLICATE_EMAIL = "duplicate_email"
+REASONS = (COLUMN_COUNT, EMPTY_FIELD, INVALID_ID, INVALID_AMOUNT, DUPLICATE_ID, DUPLICATE_EMAIL)
+QUARANTINE_HEADER = ("line", "reason", "row")
+# Default size of the Bloom filter in spill mode, about 1% false positives for 55 million keys
+DEFAULT_BLOOM_BYTES = 64 * 1024 * 1024
+# Number of files the keys are partitioned into in spill mode, each partition has to fit in memory
+SPILL_PARTITIONS = 64
+# Size of the buffer of the output files
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+Reject = Callable[[int, list[str], str], None]
+
+
+def get_quarantine_path(output_path: Path) -> Path:
+    """Returns the path of the quarantine file written next to the clean output file."""
+    return output_path.with_name(f"{output_path.stem}_quarantine{output_path.suffix}")
+
+
+def structural_reason(row: list[str]) -> str | None:
+    """Returns the reason code of a row that is invalid on its own, or None if it is valid.
+
+    Args:
+        row: A row of the csv file as a list of strings.
+
+    Returns:
+        One of COLUMN_COUNT, EMPTY_FIELD, INVALID_ID and INVALID_AMOUNT, or None.
+    """
+    if len(row) != len(COLUMNS):
+        return COLUMN_COUNT
+    if "" in row:
+        return EMPTY_FIELD
+    # isdigit alone also accepts digits like "²" and "٣", which int rejects or reads as another number
+    if not (row[0].isascii() and row[0].isdigit()):
+        return INVALID_ID
+    try:
+        amount = float(row[3])
+    except ValueError:
+        return INVALID_AMOUNT
+    if not math.isfinite(amount):
+        return INVALID_AMOUNT
+    return None
+
+
+def row_keys(row: list[str]) -> tuple[str, str]:
+    """Returns the id and email keys of a valid row, normalised so "007" equals "7" and emails ignore case."""
+    return f"id:{int(row[0])}", f"email:{row[2].lower()}"
+
+
+class BloomFilter:
+    """A fixed size set of keys which may report a key that was never added, but never misses one that was.
+
+    Args:
+        size_bytes: The memory used by the filter.
+        hash_count: The number of bits set per key.
+    """
+
+    def __init__(self, size_bytes: int = DEFAULT_BLOOM_BYTES, hash_count: int = 7):
+        if size_bytes < 1:
+            raise ValueError(f"The Bloom filter size must be positive, got: {size_bytes}")
+        self.bits = bytearray(size_bytes)
+        self.bit_count = size_bytes * 8
+        self.hash_count = hash_count
+
+    def _positions(self, key: str) -> Iterator[int]:
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        # Double hashing derives all positions from two independent 64 bit hashes
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        for index in range(self.hash_count):
+            yield (first + index * second) % self.bit_count
+
+    def add(self, key: str) -> bool:
+        """Adds a key to the filter.
+
+        Returns:
+            True if the key may have been added before, False if it definitely wasn't.
+        """
+        was_present = True
+        for position in self._positions(key):
+            byte, bit = divmod(position, 8)
+            if not self.bits[byte] & (1 << bit):
+                was_present = False
+                self.bits[byte] |= 1 << bit
+        return was_present
+
+
+def check_integrity(rows: Iterable[list[str]], output_path: Path, spill: bool = False,
+                    bloom_bytes: int = DEFAULT_BLOOM_BYTES) -> dict[str, int]:
+    """Checks the rows of a csv file in a single pass, writing the clean rows and a quarantine file.
+
+    The first row is skipped as the header and blank lines are ignored. Every other row either goes to the
+    output file or, with the reason code of the first check it fails, to the quarantine file next to it.
+    A row is a duplicate if an earlier row passing the structural checks has the same id or email.
+
+    By default the ids and emails seen are kept in hash sets. With spill, a Bloom filter of bloom_bytes
+    decides which rows may be duplicates and the keys are written to partition files on disk, which are
+    checked one at a time after the pass. Both modes keep and quarantine the same rows.
+
+    Args:
+        rows: An iterable of rows as lists of strings, e.g. from read_csv.
+        output_path: The path of the clean output file.
+        spill: If True the keys are kept on disk instead of in memory, for inputs with more keys than fit in RAM.
+        bloom_bytes: The size of the Bloom filter in spill mode.
+
+    Returns:
+        The number of rows and bytes written to the output file and the number of quarantined rows per reason.
+
+    Raises:
+        ValueError: If the data is empty.
+        OSError: If the files cannot be written.
+    """
+    rows = iter(rows)
+    # Skips the header row
+    if next(rows, None) is None:
+        raise ValueError(f"Data can't be empty")
+
+    quarantine_path = get_quarantine_path(output_path)
+    reasons = Counter()
+    with open(quarantine_path, "w", newline="", buffering=WRITE_BUFFER_SIZE) as quarantine_file:
+        quarantine = csv.writer(quarantine_file)
+        quarantine.writerow(QUARANTINE_HEADER)
+
+        def reject(line_number: int, row: list[str], reason: str) -> None:
+            quarantine.writerow((line_number, reason, ",".join(row)))
+            reasons[reason] += 1
+
+        # Line 1 is the header
+        numbered_rows = ((line_number, row) for line_number, row in enumerate(rows, start=2) if row != [""])
+        if spill:
+            rows_written = _check_with_spill(numbered_rows, output_path, reject, bloom_bytes)
+        else:
+            rows_written = _check_in_memory(numbered_rows, output_path, reject)
+
+    summary = {"rows": rows_written, "bytes": output_path.stat().st_size}
+    summary.update({reason: reasons[reason] for reason in REASONS})
+    return summary
+
+
+def _check_in_memory(numbered_rows: Iterable[tuple[int, list[str]]], output_path: Path, reject: Reject) -> int:
+    """Writes the clean rows to the output file, keeping the keys seen in hash sets."""
+    seen_ids, seen_emails = set(), set()
+    rows_written = 0
+    with open(output_path, "w", buffering=WRITE_BUFFER_SIZE) as output_file:
+        for line_number, row in numbered_rows:
+            reason = structural_reason(row)
+            if reason is None:
+                id_key, email_key = row_keys(row)
+                if id_key in seen_ids:
+                    reason = DUPLICATE_ID
+                elif email_key in seen_emails:
+                    reason = DUPLICATE_EMAIL
+                seen_ids.add(id_key)
+                seen_emails.add(email_key)
+            if reason is not None:
+                reject(line_number, row, reason)
+                continue
+            output_file.write(",".join(row) + "\n")
+            rows_written += 1
+    return rows_written
+
+
+def _check_with_spill(numbered_rows: Iterable[tuple[int, list[str]]], output_path: Path, reject: Reject,
+                      bloom_bytes: int) -> int:
+    """Writes the clean rows to the output file, keeping the keys seen on disk.
+
+    Rows whose keys are all new according to the Bloom filter are staged right away. The other rows are
+    candidates, they are held back until the partition files of their keys have been checked, which tells
+    whether the Bloom filter was right or gave a false positive. The staged rows, the candidates and the
+    rows failing the structural checks are then merged in their original order, so the output and the
+    quarantine file are written in the same order as by _check_in_memory.
+    """
+    bloom = BloomFilter(bloom_bytes)
+    with tempfile.TemporaryDirectory(dir=output_path.parent, prefix=".spill_") as temp_dir:
+        temp_dir = Path(temp_dir)
+        partition_files = [open(temp_dir / f"keys_{index}.txt", "w") for index in range(SPILL_PARTITIONS)]
+        try:
+            with open(temp_dir / "staged.txt", "w", buffering=WRITE_BUFFER_SIZE) as staged_file, \
+                    open(temp_dir / "candidates.txt", "w") as candidates_file, \
+                    open(temp_dir / "rejects.csv", "w", newline="") as rejects_file:
+                rejects = csv.writer(rejects_file)
+                for line_number, row in numbered_rows:
+                    reason = structural_reason(row)
+                    if reason is not None:
+                        # Rejected rows may contain newlines, so they are written as csv to be read back intact
+                        rejects.writerow((line_number, reason, ",".join(row)))
+                        continue
+                    keys = row_keys(row)
+                    # Both keys are always added, a candidate is any row the filter may have seen a key of
+                    is_candidate = [bloom.add(key) for key in keys]
+                    for key in keys:
+                        partition = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=4).digest(), "little") % SPILL_PARTITIONS
+                        partition_files[partition].write(f"{line_number}\t{int(any(is_candidate))}\t{key}\n")
+                    target_file = candidates_file if any(is_candidate) else staged_file
+                    target_file.write(f"{line_number}\t{','.join(row)}\n")
+        finally:
+            for partition_file in partition_files:
+                partition_file.close()
+
+        duplicates = {}
+        for index in range(SPILL_PARTITIONS):
+            for line_number, reason in _find_duplicates(temp_dir / f"keys_{index}.txt"):
+                # A duplicate id takes priority over a duplicate email, like in _check_in_memory
+                if duplicates.get(line_number) != DUPLICATE_ID:
+                    duplicates[line_number] = reason
+
+        rows_written = 0
+        with open(output_path, "w", buffering=WRITE_BUFFER_SIZE) as output_file, \
+                open(temp_dir / "staged.txt") as staged_file, open(temp_dir / "candidates.txt") as candidates_file, \
+                open(temp_dir / "rejects.csv", newline="") as rejects_file:
+            for line_number, row, reason in heapq.merge(_read_numbered(staged_file), _read_numbered(candidates_file),
+                                                        _read_rejects(rejects_file)):
+                reason = reason or duplicates.get(line_number)
+                if reason is not None:
+                    reject(line_number, row.split(","), reason)
+                    continue
+                output_file.write(row + "\n")
+                rows_written += 1
+    return rows_written
+
+
+def _find_duplicates(partition_path: Path) -> Iterator[tuple[int, str]]:
+    """Yields the line numbers and reason codes of the candidate rows whose key appeared on an earlier line."""
+    seen_keys = set()
+    with open(partition_path) as partition_file:
+        # The keys were written in the order of the input, so the first occurrence comes first
+        for line in partition_file:
+            line_number, is_candidate, key = line.rstrip("\n").split("\t", 2)
+            if key in seen_keys:
+                if is_candidate == "1":
+                    yield int(line_number), DUPLICATE_ID if key.startswith("id:") else DUPLICATE_EMAIL
+            else:
+                seen_keys.add(key)
+
+
+def _read_numbered(file) -> Iterator[tuple[int, str, None]]:
+    """Yields the line numbers and rows of a staged or candidates file, with no reason code."""
+    for line in file:
+        line_number, _, row = line.rstrip("\n").partition("\t")
+        yield int(line_number), row, None
+
+
+def _read_rejects(file) -> Iterator[tuple[int, str, str]]:
+    """Yields the line numbers, rows and reason codes of the rows that failed the structural checks."""
+    for line_number, reason, row in csv.reader(file):
+        yield int(line_number), row, reason
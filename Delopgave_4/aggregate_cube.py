@@ -0,0 +1,358 @@
+from __future__ import annotations
+
+import csv
+import hashlib
+import json
+import os
+import sys
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from pathlib import Path
+
+# Makes the shared modules in the project root importable when the script is run directly
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common.chunking import open_byte_range
+from common.imports import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# The dimensions of the cube, in the order of the axes of its arrays
+DIMENSIONS = ("region", "house_type", "period")
+# How the period of a sale is derived from its date, or read from the quarter column
+PERIODS = ("quarter", "year", "month")
+STATISTICS = ("count", "sum", "mean", "var", "std", "min", "max")
+VALUE_COLUMN = "purchase_price"
+# The label of a sale with a missing region, house type or period, read_csv never gives an empty string
+MISSING_LABEL = ""
+# The cube of a csv file is stored next to it as <csv file><CUBE_SUFFIX>
+CUBE_SUFFIX = ".cube.npz"
+# Number of rows read at a time when rows are added from the csv file
+CHUNK_SIZE = 1_000_000
+# Number of bytes read at a time when searching backwards for the start of a line
+SEARCH_BLOCK_SIZE = 64 * 1024
+
+
+@dataclass
+class AggregateCube:
+    """Statistics of the purchase prices of each combination of region, house type and period.
+
+    Each statistic is an array with one axis per dimension, so rolling the cube up to fewer dimensions is
+    a sum, min or max over the other axes. The statistics are mergeable, so new sales are added without
+    looking at the sales already in the cube. The variances are merged with the algorithm of Chan et al.,
+    like merge_aggregates in intro_pandas, so they match the statistics of --chunk-size.
+
+    Like in pandas, each statistic only skips the values it can't use: a sale without a price is counted
+    but left out of the price statistics, and a sale with a missing region, house type or period is kept
+    under MISSING_LABEL, which is included when that dimension is rolled up but never shown as a group.
+
+    Attributes:
+        period: How the sales are grouped in time, one of PERIODS.
+        labels: The labels of each dimension, in the order of the axes of the arrays.
+        count: The number of sales of each cell.
+        price_count: The number of sales with a price of each cell.
+        sum: The sum of the prices of each cell.
+        m2: The sum of the squared deviations of the prices of each cell from the mean of the cell.
+        min: The lowest price of each cell, inf for empty cells.
+        max: The highest price of each cell, -inf for empty cells.
+        source: Where the cube is in its csv file: path, columns, offset, last_line_hash and last_line_length.
+    """
+    period: str = "quarter"
+    labels: dict[str, list[str]] = field(default_factory=lambda: {dimension: [] for dimension in DIMENSIONS})
+    count: np.ndarray = field(default_factory=lambda: np.zeros((0, 0, 0), dtype=np.int64))
+    price_count: np.ndarray = field(default_factory=lambda: np.zeros((0, 0, 0), dtype=np.int64))
+    sum: np.ndarray = field(default_factory=lambda: np.zeros((0, 0, 0)))
+    m2: np.ndarray = field(default_factory=lambda: np.zeros((0, 0, 0)))
+    min: np.ndarray = field(default_factory=lambda: np.zeros((0, 0, 0)))
+    max: np.ndarray = field(default_factory=lambda: np.zeros((0, 0, 0)))
+    source: dict = field(default_factory=dict)
+
+    def _positions(self, dimension: str, values: pd.Series) -> np.ndarray:
+        """Returns the position of each value along the axis of a dimension, adding new labels to the cube.
+
+        The labels are kept sorted, so the results of query come out sorted without sorting them.
+        """
+        labels = self.labels[dimension]
+        new_labels = sorted(set(values.unique()) - set(labels))
+        if new_labels:
+            axis = DIMENSIONS.index(dimension)
+            labels.extend(new_labels)
+            order = np.argsort(labels, kind="stable")
+            labels[:] = [labels[position] for position in order]
+            for statistic, fill_value in (("count", 0), ("price_count", 0), ("sum", 0.0), ("m2", 0.0), ("min", np.inf), ("max", -np.inf)):
+                array = getattr(self, statistic)
+                shape = list(array.shape)
+                shape[axis] = len(new_labels)
+                array = np.concatenate([array, np.full(shape, fill_value, dtype=array.dtype)], axis=axis)
+                setattr(self, statistic, np.take(array, order, axis=axis))
+        return pd.Index(labels).get_indexer(values)
+
+    def add_rows(self, df: pd.DataFrame) -> int:
+        """Adds sales to the cube.
+
+        Args:
+            df: A DataFrame with the region, house_type and purchase_price columns and the date or quarter
+                column the period is derived from. Missing values are allowed, see AggregateCube.
+
+        Returns:
+            The number of sales added.
+        """
+        if df.empty:
+            return 0
+        period_column = "quarter" if self.period == "quarter" else "date"
+        periods = df[period_column].astype("str")
+        if self.period != "quarter":
+            periods = periods.str.slice(0, 4 if self.period == "year" else 7)
+
+        positions = (self._positions("region", self._labels_of(df["region"].astype("str"), df["region"])),
+                     self._positions("house_type", self._labels_of(df["house_type"].astype("str"), df["house_type"])),
+                     self._positions("period", self._labels_of(periods, df[period_column])))
+        cells = np.ravel_multi_index(positions, self.count.shape)
+        size = self.count.size
+        self.count += np.bincount(cells, minlength=size).reshape(self.count.shape)
+
+        prices = df[VALUE_COLUMN].to_numpy(dtype=np.float64)
+        has_price = ~np.isnan(prices)
+        cells, prices = cells[has_price], prices[has_price]
+        count = np.bincount(cells, minlength=size).reshape(self.price_count.shape)
+        total = np.bincount(cells, weights=prices, minlength=size).reshape(self.sum.shape)
+        mean = np.divide(total, count, out=np.zeros_like(total), where=count > 0)
+        m2 = np.bincount(cells, weights=(prices - mean.reshape(-1)[cells]) ** 2, minlength=size).reshape(self.m2.shape)
+
+        # Merges the new sales into each cell, delta is the difference of the means of the two parts
+        old_mean = np.divide(self.sum, self.price_count, out=np.zeros_like(self.sum), where=self.price_count > 0)
+        new_count = self.price_count + count
+        delta = np.where((self.price_count > 0) & (count > 0), mean - old_mean, 0.0)
+        self.m2 += m2 + delta ** 2 * self.price_count * count / np.maximum(new_count, 1)
+        self.price_count = new_count
+        self.sum += total
+        np.minimum.at(self.min.reshape(-1), cells, prices)
+        np.maximum.at(self.max.reshape(-1), cells, prices)
+        return len(df)
+
+    @staticmethod
+    def _labels_of(labels: pd.Series, values: pd.Series) -> pd.Series:
+        """Returns the labels of the values, with MISSING_LABEL for the missing values."""
+        return labels.where(values.notna(), MISSING_LABEL)
+
+    def query(self, by: str | Sequence[str], where: dict[str, str | Sequence[str]] | None = None,
+              statistic: str = "mean") -> pd.Series:
+        """Rolls the cube up to some of its dimensions and returns one statistic of each group.
+
+        Args:
+            by: The dimension or dimensions to group by, e.g. "region" or ("region", "period").
+            where: Only cells with these labels are used, e.g. {"house_type": "Villa"} or
+                {"period": ["2020Q1", "2020Q2"]}.
+            statistic: One of STATISTICS, var and std are the sample variance and standard deviation.
+
+        Returns:
+            A series indexed by the groups that have sales, sorted by the index. It is named "count" for
+            the count and purchase_price otherwise, like the series of compute_aggregates. The price
+            statistics of a group without prices are NaN, except the sum which is 0.
+
+        Raises:
+            ValueError: If a dimension or the statistic is unknown.
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        where = where or {}
+        unknown_dimensions = set(by) - set(DIMENSIONS) | set(where) - set(DIMENSIONS)
+        if not by or unknown_dimensions:
+            raise ValueError(f"Dimensions must be some of {DIMENSIONS}, got: {sorted(unknown_dimensions) or by}")
+        if statistic not in STATISTICS:
+            raise ValueError(f"Invalid statistic {statistic!r}, expected one of {STATISTICS}")
+
+        # Only the arrays the statistic is computed from are rolled up
+        needed = ["count"] if statistic == "count" else ["count", "price_count", *{
+            "sum": ["sum"], "mean": ["sum"], "var": ["sum", "m2"], "std": ["sum", "m2"], "min": ["min"], "max": ["max"]}[statistic]]
+        arrays = {name: getattr(self, name) for name in needed}
+        labels = dict(self.labels)
+        for dimension, values in where.items():
+            values = [values] if isinstance(values, str) else list(values)
+            axis = DIMENSIONS.index(dimension)
+            positions = sorted({position for position in pd.Index(labels[dimension]).get_indexer(values) if position != -1})
+            arrays = {name: np.take(array, positions, axis=axis) for name, array in arrays.items()}
+            labels[dimension] = [labels[dimension][position] for position in positions]
+
+        # Moves the grouped axes to the front in the order of by and flattens the rest, one row per group
+        source_axes = [DIMENSIONS.index(dimension) for dimension in by]
+        cells = {}
+        for name, array in arrays.items():
+            array = np.moveaxis(array, source_axes, range(len(by)))
+            group_count = int(np.prod(array.shape[:len(by)]))
+            cells[name] = array.reshape(group_count, array.size // group_count if group_count else 0)
+        reduced = {}
+        for name, array in cells.items():
+            if name == "min":
+                reduced[name] = array.min(axis=1, initial=np.inf)
+            elif name == "max":
+                reduced[name] = array.max(axis=1, initial=-np.inf)
+            elif name != "m2":
+                reduced[name] = array.sum(axis=1)
+
+        count = reduced["count"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if statistic in ("mean", "var", "std"):
+                values = reduced["sum"] / reduced["price_count"]
+            if statistic in ("var", "std"):
+                # Merging the cells of a group adds the deviations of the cell means from the group mean
+                price_count = cells["price_count"]
+                cell_mean = np.divide(cells["sum"], price_count, out=np.zeros_like(cells["sum"]), where=price_count > 0)
+                m2 = cells["m2"].sum(axis=1) + (price_count * (cell_mean - values[:, np.newaxis]) ** 2).sum(axis=1)
+                values = m2 / (reduced["price_count"] - 1)
+            if statistic == "std":
+                values = np.sqrt(values)
+        if statistic in ("count", "sum", "min", "max"):
+            values = reduced[statistic]
+        if statistic in ("min", "max"):
+            values = np.where(reduced["price_count"] > 0, values, np.nan)
+
+        if len(by) == 1:
+            index = pd.Index(labels[by[0]], name=by[0], dtype="str")
+        else:
+            index = pd.MultiIndex.from_product([labels[dimension] for dimension in by], names=by)
+        result = pd.Series(values, index=index, name="count" if statistic == "count" else VALUE_COLUMN)
+        # Like groupby and value_counts, the groups of missing labels are left out
+        keep = count > 0
+        for level, dimension in enumerate(by):
+            if MISSING_LABEL in labels[dimension]:
+                keep &= index.get_level_values(level) != MISSING_LABEL
+        return result if keep.all() else result[keep]
+
+    def summary(self, by: str | Sequence[str], where: dict[str, str | Sequence[str]] | None = None) -> pd.DataFrame:
+        """Returns the count, mean, standard deviation, min and max of each group, see query."""
+        return pd.DataFrame({statistic: self.query(by, where, statistic) for statistic in ("count", "mean", "std", "min", "max")})
+
+
+def get_cube_path(csv_path: Path) -> Path:
+    """Returns the path the cube of a csv file is stored at."""
+    return csv_path.with_name(f"{csv_path.name}{CUBE_SUFFIX}")
+
+
+def save_cube(cube: AggregateCube, cube_path: Path) -> None:
+    """Saves the cube to a .npz file, replacing the old one atomically so it is never left half-written.
+
+    Raises:
+        OSError: If the cube cannot be written.
+    """
+    metadata = {"period": cube.period, "labels": cube.labels, "source": cube.source}
+    temporary_path = cube_path.with_name(f"{cube_path.name}.tmp")
+    with open(temporary_path, "wb") as file:
+        np.savez(file, metadata=np.array(json.dumps(metadata)), count=cube.count, price_count=cube.price_count, sum=cube.sum,
+                 m2=cube.m2, min=cube.min, max=cube.max)
+    os.replace(temporary_path, cube_path)
+
+
+def load_cube(cube_path: Path) -> AggregateCube | None:
+    """Loads a cube saved by save_cube.
+
+    Returns:
+        The cube, or None if there is no readable cube at the path, e.g. one of an older format which is rebuilt.
+    """
+    try:
+        with np.load(cube_path) as arrays:
+            metadata = json.loads(str(arrays["metadata"]))
+            return AggregateCube(period=metadata["period"], labels=metadata["labels"], source=metadata["source"],
+                                 count=arrays["count"], price_count=arrays["price_count"], sum=arrays["sum"], m2=arrays["m2"],
+                                 min=arrays["min"], max=arrays["max"])
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def hash_line(line: bytes) -> str:
+    """Returns a short hash of a line of the csv file."""
+    return hashlib.blake2b(line, digest_size=16).hexdigest()
+
+
+def _read_last_line(file, end: int) -> bytes:
+    """Returns the line of a binary file ending at the offset end, including its newline."""
+    start = end - 1
+    while start > 0:
+        block_start = max(start - SEARCH_BLOCK_SIZE, 0)
+        file.seek(block_start)
+        newline_index = file.read(start - block_start).rfind(b"\n")
+        if newline_index != -1:
+            start = block_start + newline_index + 1
+            break
+        start = block_start
+    file.seek(start)
+    return file.read(end - start)
+
+
+def _end_of_complete_lines(file, file_size: int) -> int:
+    """Returns the offset right after the last newline of a binary file, a last line without one may still be being written."""
+    if file_size == 0:
+        return 0
+    file.seek(file_size - 1)
+    if file.read(1) == b"\n":
+        return file_size
+    return file_size - len(_read_last_line(file, file_size))
+
+
+def _source_unchanged(cube: AggregateCube, csv_path: Path, columns: list[str]) -> bool:
+    """Returns True if the part of the csv file already in the cube is unchanged, so only new lines have to be added."""
+    source = cube.source
+    if source.get("path") != str(csv_path.resolve()) or source.get("columns") != columns:
+        return False
+    if csv_path.stat().st_size < source["offset"]:
+        return False
+    with open(csv_path, "rb") as file:
+        file.seek(source["offset"] - source["last_line_length"])
+        return hash_line(file.read(source["last_line_length"])) == source["last_line_hash"]
+
+
+def update_cube(csv_path: Path, cube_path: Path | None = None, period: str = "quarter",
+                chunk_size: int = CHUNK_SIZE) -> tuple[AggregateCube, int]:
+    """Adds the sales appended to the csv file since the last update to its cube and saves the cube.
+
+    The cube remembers the offset in the csv file it has reached and a hash of the line before it. If that
+    line is unchanged only the lines after it are read, otherwise the file has been rewritten and the cube
+    is rebuilt from the start. Like the incremental mode of logfile_analysis, a last line without a newline
+    is left for the next update.
+
+    Args:
+        csv_path: The Path object pointing to the housing csv file.
+        cube_path: Where the cube is stored, by default next to the csv file.
+        period: How the sales are grouped in time, one of PERIODS.
+        chunk_size: The number of rows read at a time.
+
+    Returns:
+        The updated cube and the number of sales added to it.
+
+    Raises:
+        FileNotFoundError: If the csv file does not exist.
+        ValueError: If the period is invalid or the csv file lacks one of the needed columns.
+        OSError: If the cube cannot be written.
+    """
+    if period not in PERIODS:
+        raise ValueError(f"Invalid period {period!r}, expected one of {PERIODS}")
+    if not csv_path.exists():
+        raise FileNotFoundError(f"File not found at: {csv_path}")
+    cube_path = cube_path or get_cube_path(csv_path)
+
+    with open(csv_path, "rb") as file:
+        header = file.readline()
+        columns = next(csv.reader([header.decode().strip()]), [])
+        needed_columns = ["region", "house_type", VALUE_COLUMN, "quarter" if period == "quarter" else "date"]
+        missing_columns = set(needed_columns) - set(columns)
+        if missing_columns:
+            raise ValueError(f"The csv file lacks the columns: {sorted(missing_columns)}")
+        end = _end_of_complete_lines(file, csv_path.stat().st_size)
+
+    cube = load_cube(cube_path)
+    if cube is None or cube.period != period or not _source_unchanged(cube, csv_path, columns):
+        cube = AggregateCube(period=period, source={"path": str(csv_path.resolve()), "columns": columns, "offset": len(header)})
+
+    rows_added = 0
+    start = max(cube.source["offset"], len(header))
+    if start < end:
+        dtypes = {column: "str" for column in needed_columns}
+        dtypes[VALUE_COLUMN] = "float64"
+        with open_byte_range(csv_path, start, end) as file:
+            with pd.read_csv(file, header=None, names=columns, usecols=needed_columns, dtype=dtypes, chunksize=chunk_size) as chunks:
+                for chunk in chunks:
+                    rows_added += cube.add_rows(chunk)
+        with open(csv_path, "rb") as file:
+            last_line = _read_last_line(file, end)
+        cube.source.update(offset=end, last_line_hash=hash_line(last_line), last_line_length=len(last_line))
+        save_cube(cube, cube_path)
+    return cube, rows_added
@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import json
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from itertools import repeat
+from pathlib import Path
+
+# Makes the shared modules in the project root importable when the script is run directly
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common.imports import lazy_import
+
+pd = lazy_import("pandas")
+
+PLOT_KINDS = ("bar", "pie")
+STATISTICS = ("mean", "count")
+FILE_FORMATS = ("png", "svg")
+
+
+@dataclass
+class PlotSpec:
+    """A description of one plot of the housing dataset.
+
+    Attributes:
+        name: The file name of the plot without extension.
+        title: The title of the plot.
+        group_by: The column the bars or slices are grouped by.
+        statistic: "mean" plots the mean of value_column per group, "count" the number of sales per group.
+        value_column: The column averaged by the "mean" statistic.
+        where: Only rows where each column has the given value are used, e.g. {"region": "Bornholm"}.
+        kind: "bar" or "pie".
+        xlabel: The label of the x axis of bar plots.
+        ylabel: The label of the y axis.
+    """
+    name: str
+    title: str
+    group_by: str
+    statistic: str = "count"
+    value_column: str = "purchase_price"
+    where: dict[str, str] = field(default_factory=dict)
+    kind: str = "bar"
+    xlabel: str = ""
+    ylabel: str = ""
+
+
+def default_plot_specs(df: pd.DataFrame) -> list[PlotSpec]:
+    """Returns the specs of the two standard plots and a breakdown of each region and each house type.
+
+    Args:
+        df: The housing dataset.
+
+    Returns:
+        A list of plot specs.
+    """
+    specs = [
+        PlotSpec("average_price_by_region", "Average Housing Price by Region", "region", "mean",
+                 xlabel="Region", ylabel="Average Price [DKK]"),
+        PlotSpec("house_type_distribution", "Distribution of House Types", "house_type"),
+    ]
+    for region in sorted(df["region"].dropna().unique()):
+        specs.append(PlotSpec(f"house_types_in_{slugify(region)}", f"House Types in {region}", "house_type",
+                              where={"region": region}, kind="pie"))
+    for house_type in sorted(df["house_type"].dropna().unique()):
+        specs.append(PlotSpec(f"average_{slugify(house_type)}_price_by_region", f"Average {house_type} Price by Region",
+                              "region", "mean", where={"house_type": house_type}, xlabel="Region", ylabel="Average Price [DKK]"))
+    return specs
+
+
+def load_plot_specs(filepath: Path) -> list[PlotSpec]:
+    """Loads plot specs from a JSON file containing a list of objects with the fields of PlotSpec.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+        ValueError: If the file isn't a list of valid plot specs.
+    """
+    if not filepath.exists():
+        raise FileNotFoundError(f"File not found at: {filepath}")
+    with open(filepath, "r") as file:
+        try:
+            specs = [PlotSpec(**spec) for spec in json.load(file)]
+        except (TypeError, json.JSONDecodeError) as error:
+            raise ValueError(f"Invalid plot specs in {filepath}: {error}") from error
+    for spec in specs:
+        if spec.kind not in PLOT_KINDS:
+            raise ValueError(f"Invalid plot kind {spec.kind!r} in {spec.name}, expected one of {PLOT_KINDS}")
+        if spec.statistic not in STATISTICS:
+            raise ValueError(f"Invalid statistic {spec.statistic!r} in {spec.name}, expected one of {STATISTICS}")
+    return specs
+
+
+def slugify(text: str) -> str:
+    """Returns text as a lowercase file name, e.g. "Capital, Copenhagen" becomes "capital_copenhagen"."""
+    return re.sub(r"[^a-z0-9]+", "_", text.lower()).strip("_")
+
+
+def _check_columns(df: pd.DataFrame, spec: PlotSpec) -> None:
+    """Raises a ValueError if the spec refers to a column that isn't in the dataset."""
+    missing_columns = {spec.group_by, spec.value_column, *spec.where} - set(df.columns)
+    if missing_columns:
+        raise ValueError(f"Unknown columns in {spec.name}: {sorted(missing_columns)}")
+
+
+def compute_plot_data(df: pd.DataFrame, spec: PlotSpec) -> pd.Series:
+    """Computes the series plotted by a spec, like compute_aggregates does for the standard plots.
+
+    Raises:
+        ValueError: If the spec refers to a column that isn't in the dataset.
+    """
+    _check_columns(df, spec)
+    for column, value in spec.where.items():
+        df = df[df[column] == value]
+    if spec.statistic == "mean":
+        return df.groupby(spec.group_by)[spec.value_column].mean()
+    return df[spec.group_by].value_counts()
+
+
+def compute_plots_data(df: pd.DataFrame, specs: list[PlotSpec]) -> list[pd.Series]:
+    """Computes the series of a batch of specs, the same series compute_plot_data returns for each spec.
+
+    Instead of filtering the dataset once per spec, the specs filtering on the same columns share one
+    groupby over those columns and the grouped column, and each spec takes its slice of the result. The
+    default specs of every region and every house type thereby cost two groupbys in total.
+
+    Args:
+        df: The housing dataset.
+        specs: The specs of the plots.
+
+    Returns:
+        The series of each spec, in the order of the specs.
+
+    Raises:
+        ValueError: If a spec refers to a column that isn't in the dataset.
+    """
+    grouped = {}
+    plots_data = []
+    for spec in specs:
+        _check_columns(df, spec)
+        if spec.group_by in spec.where:
+            plots_data.append(compute_plot_data(df, spec))
+            continue
+        where_columns = sorted(spec.where)
+        key = (tuple(where_columns), spec.group_by, spec.statistic, spec.value_column if spec.statistic == "mean" else None)
+        if key not in grouped:
+            by = [*where_columns, spec.group_by]
+            if spec.statistic == "mean":
+                data = df.groupby(by)[spec.value_column].mean()
+            else:
+                # Keeps the groups in the order of first appearance, which value_counts uses for ties
+                data = df.groupby(by, sort=False).size().rename("count")
+            if where_columns:
+                # Splits the result by the values of the filtered columns, the empty series is for values without rows
+                data = ({values: group.droplevel(where_columns) for values, group in data.groupby(level=where_columns, sort=False)},
+                        data.iloc[:0].droplevel(where_columns))
+            grouped[key] = data
+        data = grouped[key]
+        if where_columns:
+            slices, empty = data
+            data = slices.get(tuple(spec.where[column] for column in where_columns), empty)
+        if spec.statistic == "count":
+            data = data.sort_values(ascending=False, kind="stable")
+        plots_data.append(data)
+    return plots_data
+
+
+def render_plot(spec: PlotSpec, data: pd.Series, output_dir: Path, file_format: str = "png") -> Path:
+    """Renders one plot to a file with the object oriented Figure API.
+
+    The figure is drawn by the Agg canvas directly, so the pyplot state machine and its global figures are
+    never touched and plots can be rendered in any process or thread without a display.
+
+    Args:
+        spec: The spec of the plot.
+        data: The series computed by compute_plot_data.
+        output_dir: The directory the plot is saved in.
+        file_format: "png" or "svg".
+
+    Returns:
+        The path of the saved plot.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figure = Figure()
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+    if spec.kind == "pie":
+        axes.pie(data.values, labels=data.index, autopct="%1.1f%%")
+    else:
+        axes.bar(data.index, data.values)
+        axes.set_xlabel(spec.xlabel)
+        axes.tick_params(axis="x", labelrotation=30)
+    axes.set_title(spec.title)
+    axes.set_ylabel(spec.ylabel)
+    figure.tight_layout()
+
+    plot_path = output_dir / f"{spec.name}.{file_format}"
+    figure.savefig(plot_path, format=file_format)
+    return plot_path
+
+
+def render_plots(df: pd.DataFrame, specs: list[PlotSpec], output_dir: Path, file_format: str = "png",
+                 workers: int = 1) -> list[Path]:
+    """Renders a batch of plots, spread over a pool of processes.
+
+    The series of the plots are computed in this process by compute_plots_data, so only the small series
+    and not the dataset are sent to the worker processes.
+
+    Args:
+        df: The housing dataset.
+        specs: The specs of the plots.
+        output_dir: The directory the plots are saved in.
+        file_format: "png" or "svg".
+        workers: The number of processes rendering plots.
+
+    Returns:
+        The paths of the saved plots, in the order of the specs.
+
+    Raises:
+        ValueError: If the file format or the number of workers is invalid.
+        OSError: If the output directory cannot be created.
+    """
+    if file_format not in FILE_FORMATS:
+        raise ValueError(f"Invalid file format {file_format!r}, expected one of {FILE_FORMATS}")
+    if workers < 1:
+        raise ValueError(f"workers must be positive, got: {workers}")
+    output_dir.mkdir(exist_ok=True, parents=True) # raises OSError if directory cannot be created
+
+    plots_data = compute_plots_data(df, specs)
+    if workers == 1:
+        return [render_plot(spec, data, output_dir, file_format) for spec, data in zip(specs, plots_data)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(render_plot, specs, plots_data, repeat(output_dir), repeat(file_format)))
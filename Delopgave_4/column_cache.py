@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Makes the shared modules in the project root importable when the script is run directly
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common.imports import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# The cache of a csv file is a directory next to it named <csv file><CACHE_SUFFIX>
+CACHE_SUFFIX = ".npycache"
+METADATA_FILE_NAME = "metadata.json"
+# Bumped whenever the layout of the cache changes, so old caches are rebuilt
+FORMAT_VERSION = 2
+
+
+def get_cache_dir(csv_path: Path) -> Path:
+    """Returns the directory the column cache of a csv file is stored in."""
+    return csv_path.with_name(f"{csv_path.name}{CACHE_SUFFIX}")
+
+
+def source_fingerprint(csv_path: Path) -> dict[str, int]:
+    """Returns the size and modification time of the csv file, the cache is rebuilt when either changes."""
+    stat = csv_path.stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def write_column_cache(df: pd.DataFrame, csv_path: Path) -> None:
+    """Writes the columns of a DataFrame read from a csv file as .npy files next to the csv file.
+
+    Numeric and boolean columns are saved as they are, datetime columns as int64 and text columns are
+    dictionary encoded as integer codes and an array of the distinct strings. Any other column, e.g. one
+    mixing strings and numbers, is pickled as an array of objects, so its values come back unchanged
+    instead of being turned into strings. The cache is written to a
+    temporary directory first and then moved into place, so a half-written cache is never read.
+
+    Args:
+        df: The DataFrame read from the csv file.
+        csv_path: The Path object pointing to the csv file.
+
+    Raises:
+        OSError: If the cache cannot be written.
+    """
+    cache_dir = get_cache_dir(csv_path)
+    temp_dir = Path(tempfile.mkdtemp(dir=cache_dir.parent, prefix=f".{cache_dir.name}_"))
+    try:
+        columns = []
+        for index, (name, column) in enumerate(df.items()):
+            file_name = f"column_{index}.npy"
+            if column.dtype.kind in "biuf":
+                np.save(temp_dir / file_name, column.to_numpy())
+                columns.append({"name": name, "kind": "numeric", "file": file_name})
+            elif column.dtype.kind == "M":
+                np.save(temp_dir / file_name, column.to_numpy().view(np.int64))
+                columns.append({"name": name, "kind": "datetime", "dtype": str(column.dtype), "file": file_name})
+            else:
+                codes, uniques = pd.factorize(column, sort=True)
+                if all(isinstance(value, str) for value in uniques):
+                    values_file_name = f"column_{index}_values.npy"
+                    np.save(temp_dir / file_name, codes.astype(np.int32))
+                    np.save(temp_dir / values_file_name, np.asarray(uniques, dtype=str))
+                    columns.append({"name": name, "kind": "encoded", "dtype": str(column.dtype), "file": file_name,
+                                    "values_file": values_file_name})
+                else:
+                    np.save(temp_dir / file_name, column.to_numpy(dtype=object), allow_pickle=True)
+                    columns.append({"name": name, "kind": "object", "dtype": str(column.dtype), "file": file_name})
+
+        metadata = {"version": FORMAT_VERSION, "source": source_fingerprint(csv_path), "rows": len(df), "columns": columns}
+        with open(temp_dir / METADATA_FILE_NAME, "w") as file:
+            json.dump(metadata, file, indent=2)
+
+        if cache_dir.exists():
+            shutil.rmtree(cache_dir)
+        os.replace(temp_dir, cache_dir)
+    except BaseException:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+
+
+def load_column_cache(csv_path: Path) -> pd.DataFrame | None:
+    """Loads the DataFrame of a csv file from its column cache.
+
+    The numeric columns are memory-mapped, so they aren't read until they are used, and the encoded
+    and object columns are converted back to their original dtype.
+
+    Args:
+        csv_path: The Path object pointing to the csv file.
+
+    Returns:
+        The DataFrame, or None if there is no cache or the csv file has changed since it was written.
+    """
+    cache_dir = get_cache_dir(csv_path)
+    try:
+        with open(cache_dir / METADATA_FILE_NAME, "r") as file:
+            metadata = json.load(file)
+        if metadata.get("version") != FORMAT_VERSION or metadata.get("source") != source_fingerprint(csv_path):
+            return None
+
+        columns = {}
+        for column in metadata["columns"]:
+            if column["kind"] == "object":
+                # Arrays of objects can't be memory-mapped, the pickle was written by write_column_cache
+                values = np.load(cache_dir / column["file"], allow_pickle=True)
+                columns[column["name"]] = pd.Series(values, dtype=object).astype(column["dtype"])
+                continue
+            values = np.load(cache_dir / column["file"], mmap_mode="r")
+            if column["kind"] == "numeric":
+                columns[column["name"]] = values
+            elif column["kind"] == "datetime":
+                columns[column["name"]] = values.view(column["dtype"])
+            else:
+                uniques = np.load(cache_dir / column["values_file"], mmap_mode="r")
+                categorical = pd.Categorical.from_codes(values, pd.Index(uniques, dtype=column["dtype"]))
+                columns[column["name"]] = pd.Series(categorical).astype(column["dtype"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    # copy=False keeps the memory-mapped arrays instead of copying them into one block
+    return pd.DataFrame(columns, copy=False)
+
+
+def load_housing_data(csv_path: Path, use_cache: bool = True, verbose: bool = False) -> pd.DataFrame:
+    """Reads a csv file, using its column cache when the file hasn't changed since the cache was written.
+
+    The first load parses the csv file and writes the cache, later loads memory-map the cache instead of
+    parsing the file again. The cache never makes a load fail, if it can't be written the csv file is
+    simply parsed again on the next load.
+
+    Args:
+        csv_path: The Path object pointing to the csv file.
+        use_cache: If False the csv file is always parsed and no cache is written.
+        verbose: If True the time taken by the load is printed.
+
+    Returns:
+        The same DataFrame as pd.read_csv returns.
+
+    Raises:
+        OSError: If the csv file cannot be read.
+    """
+    start = time.perf_counter()
+    df = load_column_cache(csv_path) if use_cache else None
+    if df is not None:
+        if verbose:
+            print(f"Loaded {len(df)} rows from the column cache in {time.perf_counter() - start:.3f} s (warm)")
+        return df
+
+    df = pd.read_csv(csv_path)
+    parse_time = time.perf_counter() - start
+    if not use_cache:
+        if verbose:
+            print(f"Parsed {len(df)} rows from the csv file in {parse_time:.3f} s")
+        return df
+
+    start = time.perf_counter()
+    try:
+        write_column_cache(df, csv_path)
+    except OSError as e:
+        if verbose:
+            print(f"Could not write the column cache: {e}")
+    if verbose:
+        print(f"Parsed {len(df)} rows from the csv file in {parse_time:.3f} s and wrote the column cache "
+              f"in {time.perf_counter() - start:.3f} s (cold)")
+    return df
@@ -1,9 +1,25 @@
-import pandas as pd
+from __future__ import annotations
+
 import argparse
+import sys
 from pathlib import Path
-import matplotlib.pyplot as plt
 from dataclasses import dataclass
 
+# Makes the shared modules in the project root importable when the script is run directly
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common.cache import ResultCache, add_cache_arguments
+from common.imports import lazy_import
+from common.profiling import add_profile_arguments, get_profiler, profiled, start_profiler, stop_profiler
+from column_cache import load_housing_data
+from batch_plots import FILE_FORMATS, default_plot_specs, load_plot_specs, render_plots
+from aggregate_cube import DIMENSIONS, PERIODS, update_cube
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# The columns and dtypes read by the chunked aggregation, the rest of the dataset is never parsed
+AGGREGATE_DTYPES = {"region": "category", "house_type": "category", "purchase_price": "float64"}
+
 @dataclass
 class Config:
     input_file: str = "../Data/DKHousingPricesSample100k.csv"
@@ -11,6 +27,28 @@ class Config:
     show_plots: bool = True
     save_plots: bool = False
     verbose: bool = False
+    chunk_size: int = 0
+    price_stats: bool = False
+    batch: bool = False
+    plot_specs: str | None = None
+    plot_format: str = "png"
+    workers: int = 1
+    cube: bool = False
+    period: str = "quarter"
+    rollup: list[str] | None = None
+    where: list[str] | None = None
+
+@dataclass
+class PartialAggregates:
+    """Aggregates of part of the housing dataset which can be merged with the aggregates of other parts.
+
+    Attributes:
+        region_prices: The count, sum, sum of squared deviations from the mean (m2), min and max of the
+            purchase prices of each region.
+        house_type_counts: The number of sales of each house type, in the order the house types first appear.
+    """
+    region_prices: pd.DataFrame
+    house_type_counts: dict[str, int]
 
 def setup_parser(config: Config) -> argparse.ArgumentParser:
     """Sets up the argument parser with the given configuration.
@@ -27,6 +65,21 @@ def setup_parser(config: Config) -> argparse.ArgumentParser:
     parser.add_argument("-s", "--show-plots", action="store_true", help="shows the plots in a window")
     parser.add_argument("--save-plots", action="store_true", help="saves the plots as PNG files in the output directory")
     parser.add_argument("-v", "--verbose", action="store_true", help="prints contents of the dataseries to the terminal")
+    parser.add_argument("-c", "--chunk-size", type=int, default=config.chunk_size,
+                        help=f"reads the csv in chunks of this many rows so memory stays bounded, 0 reads it at once (default: {config.chunk_size})")
+    parser.add_argument("--price-stats", action="store_true", help="with --chunk-size, prints the count, min, max and variance of the prices of each region")
+    parser.add_argument("-b", "--batch", action="store_true",
+                        help="renders the standard plots and a breakdown per region and house type to the output directory without a display")
+    parser.add_argument("--plot-specs", type=str, default=config.plot_specs, help="with --batch, a JSON file with the plot specs to render instead")
+    parser.add_argument("--format", type=str, choices=FILE_FORMATS, default=config.plot_format, help=f"file format of the plots rendered with --batch (default: {config.plot_format})")
+    parser.add_argument("-w", "--workers", type=int, default=config.workers, help=f"number of processes rendering plots with --batch (default: {config.workers})")
+    parser.add_argument("--cube", action="store_true",
+                        help="keeps a region x house type x period cube of price statistics next to the csv file, updated with new rows, and plots from it")
+    parser.add_argument("--period", type=str, choices=PERIODS, default=config.period, help=f"period of the cube (default: {config.period})")
+    parser.add_argument("--rollup", type=str, nargs="+", choices=DIMENSIONS, help="with --cube, prints the count, mean, std, min and max of the prices grouped by these dimensions")
+    parser.add_argument("--where", type=str, action="append", metavar="DIMENSION=VALUE", help="with --rollup, only uses the cells with this label, can be repeated")
+    add_cache_arguments(parser)
+    add_profile_arguments(parser)
     return parser
 
 
@@ -43,6 +96,144 @@ def get_path(filepath: str) -> Path:
     normalised_path = (script_dir / filepath).resolve() # resolve to get absolute path and remove any ../ or ./ parts
     return normalised_path
 
+@profiled("compute_aggregates")
+def compute_aggregates(file_path: Path, use_column_cache: bool = True, verbose: bool = False) -> tuple[pd.Series, pd.Series]:
+    """Reads the housing dataset and computes the series used by the plots.
+
+    Args:
+        file_path: The Path object pointing to the housing csv file.
+        use_column_cache: If True the dataset is loaded from its column cache, see load_housing_data.
+        verbose: If True the time taken to load the dataset is printed.
+
+    Returns:
+        The average purchase price of each region and the number of sales of each house type.
+    """
+    profiler = get_profiler()
+    with profiler.stage("load_housing_data") as stage:
+        df = load_housing_data(file_path, use_column_cache, verbose)
+        stage.add(rows=len(df))
+    with profiler.stage("groupby", rows=len(df)):
+        regional_prices = df.groupby("region")["purchase_price"].mean()
+        home_types = df["house_type"].value_counts()
+    return regional_prices, home_types
+
+def aggregate_chunk(chunk: pd.DataFrame) -> PartialAggregates:
+    """Computes the partial aggregates of one chunk of the housing dataset.
+
+    Args:
+        chunk: A DataFrame with the region, house_type and purchase_price columns.
+
+    Returns:
+        The partial aggregates of the chunk.
+    """
+    region_prices = chunk.groupby("region", observed=True, sort=False)["purchase_price"].agg(
+        ["count", "sum", "min", "max", lambda prices: ((prices - prices.mean()) ** 2).sum()])
+    region_prices.columns = ["count", "sum", "min", "max", "m2"]
+    # The categories differ between chunks, so the index is converted back to plain strings
+    region_prices.index = region_prices.index.astype("str")
+
+    house_types = chunk["house_type"].dropna()
+    # Counts in the order of first appearance, which decides the order of ties like value_counts does
+    codes, uniques = pd.factorize(house_types, sort=False)
+    counts = np.bincount(codes, minlength=len(uniques))
+    house_type_counts = dict(zip(uniques.astype("str"), counts.tolist()))
+    return PartialAggregates(region_prices, house_type_counts)
+
+def merge_aggregates(first: PartialAggregates, second: PartialAggregates) -> PartialAggregates:
+    """Merges the partial aggregates of two parts of the housing dataset, the first part coming before the second.
+
+    The variances are merged with the parallel algorithm of Chan et al., which doesn't lose precision
+    like subtracting sums of squares does.
+    """
+    index = first.region_prices.index.union(second.region_prices.index, sort=False)
+    fill_values = {"count": 0, "sum": 0.0, "min": np.inf, "max": -np.inf, "m2": 0.0}
+    a = first.region_prices.reindex(index).fillna(fill_values)
+    b = second.region_prices.reindex(index).fillna(fill_values)
+
+    count = a["count"] + b["count"]
+    delta = (b["sum"] / b["count"] - a["sum"] / a["count"]).where((a["count"] > 0) & (b["count"] > 0), 0.0)
+    region_prices = pd.DataFrame({
+        "count": count,
+        "sum": a["sum"] + b["sum"],
+        "min": np.minimum(a["min"], b["min"]),
+        "max": np.maximum(a["max"], b["max"]),
+        "m2": a["m2"] + b["m2"] + delta ** 2 * a["count"] * b["count"] / count.where(count > 0, 1),
+    })
+
+    house_type_counts = dict(first.house_type_counts)
+    for house_type, house_type_count in second.house_type_counts.items():
+        house_type_counts[house_type] = house_type_counts.get(house_type, 0) + house_type_count
+    return PartialAggregates(region_prices, house_type_counts)
+
+def finalise_aggregates(aggregates: PartialAggregates) -> tuple[pd.Series, pd.Series]:
+    """Turns the merged aggregates into the same series compute_aggregates returns.
+
+    Returns:
+        The average purchase price of each region and the number of sales of each house type.
+    """
+    region_prices = aggregates.region_prices.sort_index()
+    regional_prices = (region_prices["sum"] / region_prices["count"]).rename("purchase_price").rename_axis("region")
+
+    home_types = pd.Series(aggregates.house_type_counts, name="count", dtype="int64").rename_axis("house_type")
+    home_types.index = home_types.index.astype("str")
+    return regional_prices, home_types.sort_values(ascending=False)
+
+def regional_price_statistics(aggregates: PartialAggregates) -> pd.DataFrame:
+    """Returns the count, mean, min, max and sample variance of the purchase prices of each region."""
+    region_prices = aggregates.region_prices.sort_index()
+    return pd.DataFrame({
+        "count": region_prices["count"].astype("int64"),
+        "mean": region_prices["sum"] / region_prices["count"],
+        "min": region_prices["min"],
+        "max": region_prices["max"],
+        "var": region_prices["m2"] / (region_prices["count"] - 1),
+    }).rename_axis("region")
+
+@profiled("aggregate_in_chunks")
+def aggregate_in_chunks(file_path: Path, chunk_size: int) -> PartialAggregates:
+    """Reads the housing dataset in chunks and merges the aggregates of each chunk.
+
+    Only the region, house_type and purchase_price columns are parsed, with categorical dtypes for the
+    text columns, so memory is bounded by the chunk size instead of the size of the dataset.
+
+    Args:
+        file_path: The Path object pointing to the housing csv file.
+        chunk_size: The number of rows read at a time.
+
+    Returns:
+        The aggregates of the whole dataset.
+
+    Raises:
+        ValueError: If chunk_size isn't positive.
+    """
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be positive, got: {chunk_size}")
+    profiler = get_profiler()
+    aggregates = PartialAggregates(pd.DataFrame(columns=["count", "sum", "min", "max", "m2"], dtype="float64"), {})
+    with pd.read_csv(file_path, usecols=list(AGGREGATE_DTYPES), dtype=AGGREGATE_DTYPES, chunksize=chunk_size) as chunks:
+        for chunk in chunks:
+            aggregates = merge_aggregates(aggregates, aggregate_chunk(chunk))
+            profiler.add(rows=len(chunk))
+    return aggregates
+
+def compute_aggregates_chunked(file_path: Path, chunk_size: int) -> tuple[pd.Series, pd.Series]:
+    """Computes the same series as compute_aggregates while reading the dataset in chunks, see aggregate_in_chunks."""
+    return finalise_aggregates(aggregate_in_chunks(file_path, chunk_size))
+
+def parse_where(conditions: list[str]) -> dict[str, list[str]]:
+    """Parses the DIMENSION=VALUE conditions of --where, repeated dimensions match any of their values.
+
+    Raises:
+        ValueError: If a condition isn't of the form DIMENSION=VALUE.
+    """
+    where = {}
+    for condition in conditions:
+        dimension, separator, value = condition.partition("=")
+        if not separator:
+            raise ValueError(f"Invalid condition {condition!r}, expected DIMENSION=VALUE")
+        where.setdefault(dimension, []).append(value)
+    return where
+
 def save_plot(plot_name: str, config: Config) -> None:
     """Saves the current plot to the plots directory with the given name.
 
@@ -53,12 +244,15 @@ def save_plot(plot_name: str, config: Config) -> None:
     Raises:
         OSError: If directory cannot be created.
     """
+    import matplotlib.pyplot as plt
+
     plots_path = get_path(config.plots_dir)
     plots_path.mkdir(exist_ok=True, parents=True) # raises OSError if directory cannot be created
     
     print(f"Saving plot as {plot_name} in {plots_path}")
     plt.savefig(plots_path / plot_name)
 
+@profiled("plot_regional_prices")
 def plot_regional_prices(regional_prices: pd.Series, config: Config) -> None:
     """Plots the average housing prices by region and saves the plot as a PNG file.
 
@@ -66,13 +260,15 @@ def plot_regional_prices(regional_prices: pd.Series, config: Config) -> None:
          data: A pandas Series with regions as index and average prices as values.
          config: A Config dataclass instance containing boolean flags for showing and saving plots.
     """
+    # pyplot is imported when it is first needed, as it takes longer to import than pandas
+    import matplotlib.pyplot as plt
+
     plt.figure()
     plt.bar(regional_prices.index, regional_prices.values)
     plt.title("Average Housing Price by Region")
     plt.xlabel("Region")
     plt.ylabel("Average Price [DKK]")
     plt.tight_layout()
-    plt.show()
 
     if config.save_plots:
         file_name = "average_price_by_region.png"
@@ -81,6 +277,7 @@ def plot_regional_prices(regional_prices: pd.Series, config: Config) -> None:
         plt.show()
 
 
+@profiled("plot_home_types")
 def plot_home_types(home_types: pd.Series, config: Config) -> None:
     """Plots the distribution of house types and saves the plot as a PNG file.
 
@@ -88,6 +285,8 @@ def plot_home_types(home_types: pd.Series, config: Config) -> None:
          home_types: A pandas Series with house types as index and their counts as values.
          config: A Config dataclass instance containing boolean flags for showing and saving plots.
     """
+    import matplotlib.pyplot as plt
+
     plt.figure()
     plt.bar(home_types.index, home_types.values)
     plt.title("Distribution of House Types")
@@ -108,28 +307,76 @@ def main() -> None:
         plots_dir=args.output_directory,
         show_plots=args.show_plots,
         save_plots=args.save_plots,
-        verbose=args.verbose
+        verbose=args.verbose,
+        chunk_size=args.chunk_size,
+        price_stats=args.price_stats,
+        batch=args.batch,
+        plot_specs=args.plot_specs,
+        plot_format=args.format,
+        workers=args.workers,
+        cube=args.cube,
+        period=args.period,
+        rollup=args.rollup,
+        where=args.where
     )
     
     try:
         file_path = get_path(config.input_file)
-        df = pd.read_csv(file_path)
+        profiler = start_profiler(args, "intro_pandas")
+        if config.batch:
+            with profiler.stage("load_housing_data") as stage:
+                df = load_housing_data(file_path, not args.no_cache, config.verbose)
+                stage.add(rows=len(df), nbytes=file_path.stat().st_size)
+            specs = load_plot_specs(get_path(config.plot_specs)) if config.plot_specs else default_plot_specs(df)
+            with profiler.stage("render_plots", rows=len(specs)):
+                plot_paths = render_plots(df, specs, get_path(config.plots_dir), config.plot_format, config.workers)
+            print(f"Rendered {len(plot_paths)} plots to {get_path(config.plots_dir)}")
+            return
+
+        cache = ResultCache.from_args(args)
+        with profiler.stage("aggregate") as stage:
+            if config.cube:
+                with profiler.stage("update_cube") as cube_stage:
+                    cube, rows_added = update_cube(file_path, period=config.period)
+                    cube_stage.add(rows=rows_added)
+                if config.verbose:
+                    print(f"Added {rows_added} rows to the cube, it now holds {cube.count.sum()} sales")
+                regional_prices = cube.query("region", statistic="mean")
+                home_types = cube.query("house_type", statistic="count").sort_values(ascending=False)
+                if config.rollup:
+                    print(cube.summary(config.rollup, parse_where(config.where or [])))
+            elif config.chunk_size:
+                aggregates = cache.get_or_compute(file_path, {"stage": "aggregate_in_chunks"},
+                                                  lambda: aggregate_in_chunks(file_path, config.chunk_size))
+                regional_prices, home_types = finalise_aggregates(aggregates)
+                if config.price_stats:
+                    print(regional_price_statistics(aggregates))
+            else:
+                regional_prices, home_types = cache.get_or_compute(file_path, {"stage": "compute_aggregates"},
+                                                                   lambda: compute_aggregates(file_path, not args.no_cache, config.verbose))
+            stage.add(nbytes=file_path.stat().st_size)
 
-        regional_prices = df.groupby("region")["purchase_price"].mean()
         plot_regional_prices(regional_prices, config)
         if config.verbose:
             print(regional_prices)
 
-        home_types = df["house_type"].value_counts()
         plot_home_types(home_types, config)
         if config.verbose:
             print(home_types)
         
         print(f"Successfully read and processed csv file: {file_path}")
 
+    except ValueError as ve:
+        print(f"ValueError: {ve}")
+        sys.exit(1)
+
     except OSError as e:
         print(f"Error reading file: {e}")
         print("Check write permissions")
+        sys.exit(1)
+
+    finally:
+        stop_profiler()
     
 if __name__ == "__main__":
     main()
\ No newline at end of file
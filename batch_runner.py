@@ -0,0 +1,201 @@
+import argparse
+import importlib
+import io
+import json
+import sys
+import time
+import traceback
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stderr, redirect_stdout
+from dataclasses import dataclass
+from itertools import product
+from pathlib import Path
+from types import ModuleType
+
+PROJECT_ROOT = Path(__file__).resolve().parent
+# The folder of each script and the argument its input file is passed with
+SCRIPTS = {
+    "intro_to_python": ("Delopgave_1", "--input"),
+    "logfile_analysis": ("Delopgave_2", "--file"),
+    "error_handling": ("Delopgave_3", "--input-file"),
+    "intro_pandas": ("Delopgave_4", "--input-file"),
+}
+
+
+@dataclass
+class Job:
+    """One run of a script with its command line arguments."""
+    script: str
+    args: list[str]
+
+
+@dataclass
+class JobResult:
+    """The outcome of a job.
+
+    Attributes:
+        job: The job that was run.
+        output: Everything the script printed to stdout and stderr.
+        seconds: The wall time of the job.
+        exit_code: The exit code of the script, 0 unless it exited with another status, e.g. 1 after printing
+            an error or 2 for invalid arguments, or raised an exception.
+    """
+    job: Job
+    output: str
+    seconds: float
+    exit_code: int
+
+
+def load_manifest(filepath: Path) -> list[Job]:
+    """Loads the jobs of a manifest file.
+
+    The manifest is a JSON list of entries, each naming a script and optionally the input files, a list
+    of alternative option lists and arguments shared by every job of the entry. An entry expands to one
+    job for every combination of file and options, e.g.
+    {"script": "error_handling", "files": ["a.csv", "b.csv"], "options": [["-d"], ["--integrity"]]} gives
+    four jobs. Files are relative to the directory of the manifest.
+
+    Args:
+        filepath: The Path object pointing to the manifest.
+
+    Returns:
+        The jobs in the order of the manifest.
+
+    Raises:
+        FileNotFoundError: If the manifest does not exist.
+        ValueError: If the manifest isn't a list of valid entries.
+    """
+    if not filepath.exists():
+        raise FileNotFoundError(f"File not found at: {filepath}")
+    with open(filepath, "r") as file:
+        try:
+            entries = json.load(file)
+        except json.JSONDecodeError as error:
+            raise ValueError(f"Invalid manifest {filepath}: {error}") from error
+    if not isinstance(entries, list):
+        raise ValueError(f"Invalid manifest {filepath}: expected a list of entries")
+
+    jobs = []
+    for entry in entries:
+        script = entry.get("script") if isinstance(entry, dict) else None
+        if script not in SCRIPTS:
+            raise ValueError(f"Invalid entry {entry!r} in {filepath}: script must be one of {list(SCRIPTS)}")
+        _, input_argument = SCRIPTS[script]
+        files = [[input_argument, str(filepath.parent / file)] for file in entry.get("files", [])] or [[]]
+        options = entry.get("options", [[]]) or [[]]
+        shared_args = entry.get("args", [])
+        for file_args, option_args in product(files, options):
+            jobs.append(Job(script, [*file_args, *option_args, *shared_args]))
+    return jobs
+
+
+def import_script(script: str) -> ModuleType:
+    """Imports a script once, so every later job of the script skips the import."""
+    folder, _ = SCRIPTS[script]
+    folder_path = str(PROJECT_ROOT / folder)
+    if folder_path not in sys.path:
+        sys.path.insert(0, folder_path)
+    return importlib.import_module(script)
+
+
+def run_job(job: Job) -> JobResult:
+    """Runs the main function of a script with the arguments of a job and captures what it prints.
+
+    The job runs in this interpreter, so sys.argv is only replaced while it runs, but everything else a
+    script changes at module level, e.g. globals, caches and the state of imported libraries, carries over
+    to the later jobs of the same process.
+    """
+    output = io.StringIO()
+    exit_code = 0
+    start = time.perf_counter()
+    saved_argv = sys.argv
+    with redirect_stdout(output), redirect_stderr(output):
+        try:
+            module = import_script(job.script)
+            sys.argv = [module.__file__, *job.args]
+            module.main()
+        except SystemExit as error:  # raised by argparse on invalid arguments and --help
+            exit_code = error.code if isinstance(error.code, int) else 1
+        except Exception:
+            traceback.print_exc()
+            exit_code = 1
+        finally:
+            sys.argv = saved_argv
+    # The figures of pyplot stay open until closed, so they would pile up over many jobs
+    if "matplotlib.pyplot" in sys.modules:
+        sys.modules["matplotlib.pyplot"].close("all")
+    return JobResult(job, output.getvalue(), time.perf_counter() - start, exit_code)
+
+
+def _import_scripts(scripts: list[str]) -> None:
+    """Imports the scripts of the jobs when a worker process starts."""
+    for script in scripts:
+        import_script(script)
+
+
+def run_jobs(jobs: list[Job], workers: int = 1) -> Iterator[JobResult]:
+    """Runs jobs in this process or spread over a pool of processes and yields their results in order.
+
+    Every process imports each script once, so the imports are paid once per process instead of once
+    per job. The jobs of a process share its interpreter state, see run_job, so a job that depends on
+    running in a fresh interpreter should be run on its own. Jobs running in parallel must not write the
+    same output files.
+
+    Args:
+        jobs: The jobs to run.
+        workers: The number of processes running jobs, 1 runs them in this process.
+
+    Returns:
+        An iterator of the results, in the order of the jobs.
+
+    Raises:
+        ValueError: If workers isn't positive.
+    """
+    if workers < 1:
+        raise ValueError(f"workers must be positive, got: {workers}")
+    if workers == 1:
+        for job in jobs:
+            yield run_job(job)
+        return
+    scripts = sorted({job.script for job in jobs})
+    with ProcessPoolExecutor(max_workers=workers, initializer=_import_scripts, initargs=(scripts,)) as executor:
+        yield from executor.map(run_job, jobs)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Runs a manifest of jobs of the scripts in a single process")
+    parser.add_argument("manifest", type=str, help="JSON file listing the jobs, see load_manifest")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="number of processes running jobs (default: 1)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only print the output of jobs that failed")
+    args = parser.parse_args()
+
+    try:
+        jobs = load_manifest(Path(args.manifest).resolve())
+        start = time.perf_counter()
+        failed_jobs = 0
+        for number, result in enumerate(run_jobs(jobs, args.workers), start=1):
+            failed_jobs += result.exit_code != 0
+            status = "ok" if result.exit_code == 0 else f"exit code {result.exit_code}"
+            print(f"[{number}/{len(jobs)}] {result.job.script} {' '.join(result.job.args)} ({result.seconds:.3f} s, {status})")
+            if result.output and (not args.quiet or result.exit_code != 0):
+                print(result.output, end="" if result.output.endswith("\n") else "\n")
+        print(f"Ran {len(jobs)} jobs in {time.perf_counter() - start:.2f} s, {failed_jobs} failed")
+        if failed_jobs:
+            sys.exit(1)
+
+    except ValueError as ve:
+        print(f"ValueError: {ve}")
+        sys.exit(1)
+
+    except FileNotFoundError as fnfe:
+        print(f"FileNotFoundError: {fnfe}")
+        sys.exit(1)
+
+    except OSError as ose:
+        print(f"OSError: {ose}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
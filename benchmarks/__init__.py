@@ -0,0 +1 @@
+"""Benchmarks of the scripts in Delopgave_1 to Delopgave_4 on synthetic data of increasing size."""
@@ -0,0 +1,97 @@
+import importlib.util
+import random
+import sys
+from collections.abc import Callable
+from datetime import date, timedelta
+from pathlib import Path
+from types import ModuleType
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+HOUSING_COLUMNS = [
+    "date", "quarter", "house_id", "house_type", "sales_type", "year_build", "purchase_price",
+    "%_change_between_offer_and_purchase", "no_rooms", "sqm", "sqm_price", "address", "zip_code", "city",
+    "area", "region", "nom_interest_rate%", "dk_ann_infl_rate%", "yield_on_mortgage_credit_bonds%",
+]
+HOUSE_TYPES = ["Villa", "Apartment", "Townhouse", "Farm", "Summerhouse"]
+SALES_TYPES = ["regular_sale", "family_sale", "auction", "other_sale"]
+REGIONS = ["Zealand", "Jutland", "Fyn & islands", "Capital, Copenhagen", "Bornholm"]
+CITIES = ["København", "Aarhus", "Odense", "Aalborg", "Esbjerg", "Rønne", "Roskilde", "Vejle"]
+
+
+def load_script_module(folder: str, module_name: str) -> ModuleType:
+    """Imports a module from one of the Delopgave folders.
+
+    The folders contain modules with the same names, e.g. benchmark_workers.py, so each module is loaded
+    from its file under a name prefixed with its folder. The folder is put on sys.path first, so the
+    imports of the module itself work like when it is run directly.
+
+    Args:
+        folder: The name of the folder, e.g. "Delopgave_2".
+        module_name: The name of the module in the folder, e.g. "benchmark_workers".
+
+    Returns:
+        The imported module.
+    """
+    qualified_name = f"{folder.lower()}_{module_name}"
+    if qualified_name in sys.modules:
+        return sys.modules[qualified_name]
+    folder_path = PROJECT_ROOT / folder
+    if str(folder_path) not in sys.path:
+        sys.path.insert(0, str(folder_path))
+    spec = importlib.util.spec_from_file_location(qualified_name, folder_path / f"{module_name}.py")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[qualified_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def generate_names_file(filepath: Path, number_of_names: int, seed: int = 0) -> None:
+    """Writes comma-separated names, see generate_names_file in Delopgave_1/benchmark_letter_count.py."""
+    load_script_module("Delopgave_1", "benchmark_letter_count").generate_names_file(filepath, number_of_names, seed)
+
+
+def generate_log_file(filepath: Path, number_of_lines: int, seed: int = 0) -> None:
+    """Writes a leveled app log, see generate_log_file in Delopgave_2/benchmark_workers.py."""
+    load_script_module("Delopgave_2", "benchmark_workers").generate_log_file(filepath, number_of_lines, seed)
+
+
+def generate_customer_file(filepath: Path, number_of_rows: int, seed: int = 0) -> None:
+    """Writes a dirty customer csv, see generate_customer_file in Delopgave_3/benchmark_workers.py."""
+    load_script_module("Delopgave_3", "benchmark_workers").generate_customer_file(filepath, number_of_rows, seed)
+
+
+def generate_housing_file(filepath: Path, number_of_rows: int, seed: int = 0) -> None:
+    """Writes a housing csv with the columns of the DKHousingPrices dataset and random sales from 1992 to 2024.
+
+    Args:
+        filepath: The path of the file to write.
+        number_of_rows: The number of sales in the file.
+        seed: The seed of the random number generator.
+    """
+    rng = random.Random(seed)
+    first_day = date(1992, 1, 1)
+    number_of_days = (date(2024, 12, 31) - first_day).days
+    with open(filepath, "w") as file:
+        file.write(",".join(HOUSING_COLUMNS) + "\n")
+        for house_id in range(number_of_rows):
+            sale_date = first_day + timedelta(days=rng.randrange(number_of_days))
+            sqm = rng.randint(40, 300)
+            purchase_price = rng.randint(200_000, 9_000_000)
+            region = rng.choice(REGIONS)
+            # Quotes the regions containing a comma, like "Capital, Copenhagen"
+            region_field = f'"{region}"' if "," in region else region
+            file.write(
+                f"{sale_date},{sale_date.year}Q{(sale_date.month - 1) // 3 + 1},{house_id},{rng.choice(HOUSE_TYPES)},"
+                f"{rng.choice(SALES_TYPES)},{rng.randint(1900, 2024)},{purchase_price},{rng.uniform(-10, 10):.1f},"
+                f"{rng.randint(1, 10)},{sqm},{purchase_price / sqm:.2f},Vej {house_id},{rng.randint(1000, 9990)},"
+                f"{rng.choice(CITIES)},Area,{region_field},1.5,2.0,3.1\n"
+            )
+
+
+# The generator of each input format, all take the path of the file, the number of records and a seed
+GENERATORS: dict[str, Callable[[Path, int, int], None]] = {
+    "names": generate_names_file,
+    "logs": generate_log_file,
+    "customers": generate_customer_file,
+    "housing": generate_housing_file,
+}
@@ -0,0 +1,288 @@
+import argparse
+import importlib
+import json
+import multiprocessing
+import platform
+import queue
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from datetime import datetime, timezone
+from pathlib import Path
+from types import ModuleType
+from typing import Any
+
+# Makes the shared modules in the project root importable when the script is run directly
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from benchmarks.generators import GENERATORS, PROJECT_ROOT
+from common.profiling import peak_rss
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+DEFAULT_OUTPUT = PROJECT_ROOT / "benchmarks" / "results" / "latest.json"
+# A benchmark is flagged when its median time or peak memory grows by more than this fraction
+DEFAULT_THRESHOLD = 0.10
+# Seconds between checks that the process measuring a benchmark is still alive
+POLL_INTERVAL = 1.0
+# Name of the output file written by the customers benchmark in the logs directory of Delopgave_3
+CUSTOMERS_OUTPUT_NAME = "benchmark_suite_output.csv"
+
+
+def import_script(folder: str, module_name: str) -> ModuleType:
+    """Imports one of the scripts, e.g. import_script("Delopgave_2", "logfile_analysis")."""
+    folder_path = str(PROJECT_ROOT / folder)
+    if folder_path not in sys.path:
+        sys.path.insert(0, folder_path)
+    return importlib.import_module(module_name)
+
+
+def run_names(filepath: Path) -> None:
+    """Counts the letters of a names file like intro_to_python.py --count."""
+    intro_to_python = import_script("Delopgave_1", "intro_to_python")
+    intro_to_python.count_letters_in_names(intro_to_python.read_names(filepath))
+
+
+def run_logs(filepath: Path) -> None:
+    """Reads a log file and separates it by level like logfile_analysis.py did before streaming."""
+    logfile_analysis = import_script("Delopgave_2", "logfile_analysis")
+    logfile_analysis.seperate_log_by_type(logfile_analysis.read_file(filepath))
+
+
+def run_customers(filepath: Path) -> None:
+    """Cleans a customer csv like error_handling.py --drop-rows."""
+    error_handling = import_script("Delopgave_3", "error_handling")
+    rows = error_handling.drop_invalid_id(error_handling.drop_empty_rows(error_handling.read_csv(filepath)))
+    error_handling.write_csv(rows, CUSTOMERS_OUTPUT_NAME)
+
+
+def run_housing(filepath: Path) -> None:
+    """Loads a housing csv with pandas and computes the grouped series of intro_pandas.py."""
+    intro_pandas = import_script("Delopgave_4", "intro_pandas")
+    intro_pandas.compute_aggregates(filepath, use_column_cache=False)
+
+
+# The function timed by each benchmark and the input format it is run on
+BENCHMARKS: dict[str, tuple[str, Callable[[Path], None]]] = {
+    "names": ("names", run_names),
+    "logs": ("logs", run_logs),
+    "customers": ("customers", run_customers),
+    "housing": ("housing", run_housing),
+}
+# The script each benchmark imports, as the folder and the module name
+BENCHMARK_SCRIPTS = {
+    "names": ("Delopgave_1", "intro_to_python"),
+    "logs": ("Delopgave_2", "logfile_analysis"),
+    "customers": ("Delopgave_3", "error_handling"),
+    "housing": ("Delopgave_4", "intro_pandas"),
+}
+
+
+def _measure(benchmark: str, filepath: Path, warmup: int, repeat: int, results: multiprocessing.Queue) -> None:
+    """Times a benchmark in a fresh process, so its peak RSS isn't affected by the other benchmarks."""
+    _, run = BENCHMARKS[benchmark]
+    import_script(*BENCHMARK_SCRIPTS[benchmark])
+    # NumPy and pandas are imported lazily, so they only count towards the peak RSS after the first run
+    import_rss = peak_rss()
+    for _ in range(warmup):
+        run(filepath)
+
+    wall_times, cpu_times = [], []
+    for _ in range(repeat):
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        run(filepath)
+        wall_times.append(time.perf_counter() - wall_start)
+        cpu_times.append(time.process_time() - cpu_start)
+
+    # tracemalloc slows down allocations, so the peak is measured in a separate, untimed run
+    tracemalloc.start()
+    run(filepath)
+    _, tracemalloc_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    results.put({
+        "wall_times": wall_times,
+        "cpu_times": cpu_times,
+        "tracemalloc_peak_bytes": tracemalloc_peak,
+        "import_rss_bytes": import_rss,
+        "peak_rss_bytes": peak_rss(),
+    })
+
+
+def run_benchmark(benchmark: str, size: int, data_dir: Path, warmup: int, repeat: int,
+                  timeout: float | None = None) -> dict[str, Any]:
+    """Generates the input of a benchmark if it doesn't exist yet and measures the benchmark on it.
+
+    Args:
+        benchmark: The name of the benchmark, one of BENCHMARKS.
+        size: The number of records in the input.
+        data_dir: The directory the generated inputs are kept in.
+        warmup: The number of untimed runs before the timed ones, at least 1.
+        repeat: The number of timed runs.
+        timeout: The number of seconds the measurement may take, or None for no limit.
+
+    Returns:
+        The result of the benchmark. If the measuring process failed or timed out the result has an error
+        instead of the measurements.
+    """
+    input_format, _ = BENCHMARKS[benchmark]
+    filepath = data_dir / f"{input_format}_{size}.csv"
+    if not filepath.exists():
+        # Generated under a temporary name first, so an interrupted run doesn't leave a truncated input behind
+        temporary_path = filepath.with_suffix(".tmp")
+        GENERATORS[input_format](temporary_path, size, 0)
+        temporary_path.replace(filepath)
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_measure, args=(benchmark, filepath, warmup, repeat, results))
+    process.start()
+    measurement = _wait_for_measurement(process, results, timeout)
+    process.join()
+
+    file_size = filepath.stat().st_size
+    if isinstance(measurement, str):
+        return {"benchmark": benchmark, "size": size, "input_bytes": file_size, "error": measurement}
+    median_time = statistics.median(measurement["wall_times"])
+    return {
+        "benchmark": benchmark,
+        "size": size,
+        "input_bytes": file_size,
+        **measurement,
+        "best_time": min(measurement["wall_times"]),
+        "median_time": median_time,
+        "records_per_second": size / median_time if median_time else None,
+        "megabytes_per_second": file_size / 1024**2 / median_time if median_time else None,
+    }
+
+
+def _wait_for_measurement(process: multiprocessing.Process, results: multiprocessing.Queue,
+                          timeout: float | None) -> dict[str, Any] | str:
+    """Returns the measurement sent by the process, or a description of the error if it died or timed out."""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        try:
+            return results.get(timeout=POLL_INTERVAL)
+        except queue.Empty:
+            pass
+        if not process.is_alive():
+            # The measurement may have been sent right before the process exited
+            try:
+                return results.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                return f"the benchmark process exited with code {process.exitcode}"
+        if deadline is not None and time.monotonic() > deadline:
+            process.terminate()
+            return f"timed out after {timeout} s"
+
+
+def compare_results(results: list[dict[str, Any]], baseline: list[dict[str, Any]],
+                    threshold: float = DEFAULT_THRESHOLD) -> list[str]:
+    """Compares results with a baseline and returns a description of each regression.
+
+    A benchmark regresses when its median time or its tracemalloc peak grows by more than threshold
+    compared with the result of the same benchmark and size in the baseline. Failed benchmarks are
+    skipped, they are reported when they run.
+
+    Args:
+        results: The results of this run.
+        baseline: The results of an earlier run.
+        threshold: The allowed relative growth, e.g. 0.1 for 10%.
+
+    Returns:
+        A list of descriptions of the regressions, empty if there are none.
+    """
+    baseline_results = {(result["benchmark"], result["size"]): result for result in baseline}
+    regressions = []
+    for result in results:
+        baseline_result = baseline_results.get((result["benchmark"], result["size"]))
+        if baseline_result is None or "error" in result or "error" in baseline_result:
+            continue
+        for metric in ("median_time", "tracemalloc_peak_bytes"):
+            if baseline_result[metric] and result[metric] > baseline_result[metric] * (1 + threshold):
+                regressions.append(f"{result['benchmark']} n={result['size']}: {metric} {baseline_result[metric]:.4g} -> "
+                                   f"{result[metric]:.4g} (+{result[metric] / baseline_result[metric] - 1:.0%})")
+    return regressions
+
+
+def parse_size(text: str) -> int:
+    """Parses a number of records written as 1000, 1e3 or 1_000."""
+    try:
+        size = int(float(text.replace("_", "")))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid size: {text}")
+    if size < 1:
+        raise argparse.ArgumentTypeError(f"size must be positive: {text}")
+    return size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks of the scripts on synthetic data of increasing size")
+    parser.add_argument("-b", "--benchmarks", type=str, nargs="+", choices=list(BENCHMARKS), default=list(BENCHMARKS),
+                        help="benchmarks to run (default: all)")
+    parser.add_argument("-n", "--sizes", type=parse_size, nargs="+", default=DEFAULT_SIZES,
+                        help="numbers of records, from 1e3 to 1e8 (default: 1e3 1e4 1e5)")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed runs before the timed ones, at least 1 (default: 1)")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="timed runs per benchmark and size (default: 3)")
+    parser.add_argument("--timeout", type=float, default=None, help="seconds each benchmark and size may take (default: no limit)")
+    parser.add_argument("-d", "--data-dir", type=str, default=None,
+                        help="keeps the generated inputs in this directory for later runs (default: a temporary directory)")
+    parser.add_argument("-o", "--output", type=str, default=str(DEFAULT_OUTPUT), help=f"JSON file the results are written to (default: {DEFAULT_OUTPUT})")
+    parser.add_argument("--baseline", type=str, default=None, help="JSON results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"relative growth of time or memory flagged as a regression (default: {DEFAULT_THRESHOLD})")
+    args = parser.parse_args()
+
+    if args.warmup < 1 or args.repeat < 1:
+        parser.error("--warmup and --repeat must be at least 1")
+
+    results = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_dir = Path(args.data_dir) if args.data_dir else Path(temp_dir)
+        data_dir.mkdir(exist_ok=True, parents=True)
+        try:
+            for benchmark in args.benchmarks:
+                for size in args.sizes:
+                    result = run_benchmark(benchmark, size, data_dir, args.warmup, args.repeat, args.timeout)
+                    results.append(result)
+                    if "error" in result:
+                        print(f"{benchmark:>10} n={size:<10} FAILED: {result['error']}")
+                        continue
+                    peak_rss_text = "n/a" if result["peak_rss_bytes"] is None else f"{result['peak_rss_bytes'] / 1024**2:8.1f} MB"
+                    print(f"{benchmark:>10} n={size:<10} {result['median_time']:9.4f} s  {result['records_per_second']:14,.0f} records/s  "
+                          f"tracemalloc {result['tracemalloc_peak_bytes'] / 1024**2:8.1f} MB  peak RSS {peak_rss_text}")
+        finally:
+            error_handling = import_script("Delopgave_3", "error_handling")
+            (error_handling.get_path(error_handling.Config.logs_dir) / CUSTOMERS_OUTPUT_NAME).unlink(missing_ok=True)
+
+    output_path = Path(args.output)
+    output_path.parent.mkdir(exist_ok=True, parents=True)
+    metadata = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": multiprocessing.cpu_count(),
+        "warmup": args.warmup,
+        "repeat": args.repeat,
+    }
+    with open(output_path, "w") as file:
+        json.dump({"metadata": metadata, "results": results}, file, indent=2)
+    print(f"Results written to {output_path}")
+
+    failed = [result for result in results if "error" in result]
+    if args.baseline:
+        with open(args.baseline, "r") as file:
+            regressions = compare_results(results, json.load(file)["results"], args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions compared with {args.baseline}")
+    if failed:
+        print(f"{len(failed)} benchmarks failed")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
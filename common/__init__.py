@@ -0,0 +1 @@
+"""Modules shared by the scripts in Delopgave_1 to Delopgave_4."""
@@ -0,0 +1,181 @@
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import zlib
+from collections.abc import Callable, Sequence
+from pathlib import Path
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+DEFAULT_CACHE_DIR = Path(__file__).parent.parent / ".cache"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+CACHE_SUFFIX = ".bin"
+
+
+def add_cache_arguments(parser: argparse.ArgumentParser) -> None:
+    """Adds the command line arguments shared by every script that uses the result cache.
+
+    Args:
+        parser: The argument parser of the script.
+    """
+    parser.add_argument("--no-cache", action="store_true", help="neither read nor write cached results")
+    parser.add_argument("--refresh", action="store_true", help="recompute results and overwrite the cached ones")
+    parser.add_argument("--hash-content", action="store_true",
+                        help="also hash the input file contents when checking the cache, not only its size and modification time")
+
+
+def file_fingerprint(filepath: Path, hash_content: bool = False) -> dict[str, Any]:
+    """Returns the properties of a file that change when the file changes.
+
+    Args:
+        filepath: The Path object pointing to the file.
+        hash_content: If True a hash of the file contents is included, which also catches changes
+            that keep the size and modification time.
+
+    Returns:
+        A dictionary with the path, size, modification time and optionally the content hash of the file.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+    """
+    stat = filepath.stat()
+    fingerprint = {"path": str(filepath.resolve()), "size": stat.st_size, "mtime": stat.st_mtime_ns}
+    if hash_content:
+        content_hash = hashlib.blake2b(digest_size=16)
+        with open(filepath, "rb") as file:
+            while block := file.read(1024 * 1024):
+                content_hash.update(block)
+        fingerprint["content_hash"] = content_hash.hexdigest()
+    return fingerprint
+
+
+class ResultCache:
+    """An on-disk cache of computed results keyed by the fingerprint of the input file.
+
+    Results are pickled, compressed and stored as one file per key in the cache directory. When the
+    cache grows beyond max_bytes the least recently used entries are deleted. The cache never makes
+    a run fail, entries that can't be read or written are simply recomputed.
+
+    Args:
+        cache_dir: The directory the cached results are stored in.
+        max_bytes: The maximum total size of the cached results.
+        enabled: If False results are always computed and never stored.
+        refresh: If True cached results are ignored but new results are still stored.
+        hash_content: If True the input file contents are hashed as part of the key.
+    """
+
+    def __init__(self, cache_dir: Path = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES,
+                 enabled: bool = True, refresh: bool = False, hash_content: bool = False):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.refresh = refresh
+        self.hash_content = hash_content
+
+    @classmethod
+    def from_args(cls, args: argparse.Namespace, **kwargs: Any) -> "ResultCache":
+        """Creates a cache from the command line arguments added by add_cache_arguments."""
+        return cls(enabled=not args.no_cache, refresh=args.refresh, hash_content=args.hash_content, **kwargs)
+
+    def key(self, filepath: Path | Sequence[Path], options: dict[str, Any]) -> str:
+        """Returns the cache key of a result computed from one or more files with the given options.
+
+        Args:
+            filepath: The Path object pointing to the input file, or a sequence of them.
+            options: The options the result depends on, must be JSON serialisable.
+
+        Returns:
+            A hexadecimal key which changes whenever any of the files or the options change.
+        """
+        filepaths = [filepath] if isinstance(filepath, Path) else list(filepath)
+        fingerprints = [file_fingerprint(path, self.hash_content) for path in filepaths]
+        key_source = json.dumps({"files": fingerprints, "options": options}, sort_keys=True, default=str)
+        return hashlib.sha256(key_source.encode()).hexdigest()
+
+    def get_or_compute(self, filepath: Path | Sequence[Path], options: dict[str, Any], compute: Callable[[], T],
+                       is_valid: Callable[[T], bool] | None = None) -> T:
+        """Returns the cached result for the file and options, computing and storing it on a miss.
+
+        Args:
+            filepath: The Path object pointing to the input file, or a sequence of them.
+            options: The options the result depends on, e.g. the name of the computation and its flags.
+            compute: A function without arguments that computes the result.
+            is_valid: An optional check of a cached result, e.g. that the output files it describes still
+                exist. Cached results failing the check are recomputed.
+
+        Returns:
+            The cached or freshly computed result.
+        """
+        if not self.enabled:
+            return compute()
+
+        try:
+            key = self.key(filepath, options)
+        except OSError:
+            # Lets compute raise its own, more descriptive error for missing or unreadable files
+            return compute()
+
+        if not self.refresh:
+            cached_result = self._load(key)
+            if cached_result is not None and (is_valid is None or is_valid(cached_result[0])):
+                return cached_result[0]
+
+        result = compute()
+        self._store(key, result)
+        return result
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}{CACHE_SUFFIX}"
+
+    def _load(self, key: str) -> tuple[Any] | None:
+        """Returns the cached result wrapped in a tuple, or None if there is no usable entry."""
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, "rb") as file:
+                result = pickle.loads(zlib.decompress(file.read()))
+            # Marks the entry as recently used for the eviction
+            os.utime(entry_path)
+        except (OSError, EOFError, zlib.error, pickle.UnpicklingError):
+            return None
+        return (result,)
+
+    def _store(self, key: str, result: Any) -> None:
+        """Writes the result to the cache directory and evicts old entries if the cache is too large."""
+        try:
+            self.cache_dir.mkdir(exist_ok=True, parents=True)
+            payload = zlib.compress(pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL), level=1)
+            if len(payload) > self.max_bytes:
+                return
+            # Writes to a temporary file first so a crash never leaves a half-written entry behind
+            with tempfile.NamedTemporaryFile(dir=self.cache_dir, suffix=".tmp", delete=False) as file:
+                file.write(payload)
+            os.replace(file.name, self._entry_path(key))
+            self._evict()
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        """Deletes the least recently used entries until the cache fits within max_bytes."""
+        entries = []
+        for entry_path in self.cache_dir.glob(f"*{CACHE_SUFFIX}"):
+            try:
+                stat = entry_path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, entry_path))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, entry_path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            entry_path.unlink(missing_ok=True)
+            total_bytes -= size
+
+    def clear(self) -> None:
+        """Deletes every cached result."""
+        for entry_path in self.cache_dir.glob(f"*{CACHE_SUFFIX}"):
+            entry_path.unlink(missing_ok=True)
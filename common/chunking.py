@@ -0,0 +1,83 @@
+import io
+import locale
+from pathlib import Path
+from typing import TextIO
+
+# Number of bytes read at a time while searching for the next delimiter
+SEARCH_BLOCK_SIZE = 4096
+
+
+def split_file(filepath: Path, number_of_parts: int, delimiter: bytes = b"\n") -> list[tuple[int, int]]:
+    """Splits a file into roughly equal byte ranges that start right after a delimiter.
+
+    Splitting after a single-byte ASCII delimiter such as a comma or a newline means no record, and
+    no multi-byte UTF-8 character, is cut in two, so every range can be processed on its own.
+
+    Args:
+        filepath: The Path object pointing to the file.
+        number_of_parts: The number of byte ranges to split the file into.
+        delimiter: The byte string records are separated by.
+
+    Returns:
+        A list of (start, end) byte offsets covering the whole file, empty ranges are left out.
+    """
+    file_size = filepath.stat().st_size
+    boundaries = [0]
+    with open(filepath, "rb") as file:
+        for part in range(1, number_of_parts):
+            position = max(part * file_size // number_of_parts, boundaries[-1])
+            file.seek(position)
+            # Reads forward in small blocks until the next delimiter
+            while block := file.read(SEARCH_BLOCK_SIZE):
+                delimiter_index = block.find(delimiter)
+                if delimiter_index != -1:
+                    position += delimiter_index + len(delimiter)
+                    break
+                # Steps back so a multi-byte delimiter split between two blocks is still found
+                position += max(len(block) - len(delimiter) + 1, 1)
+                file.seek(position)
+            boundaries.append(min(position, file_size))
+    boundaries.append(file_size)
+    return [(start, end) for start, end in zip(boundaries, boundaries[1:]) if start < end]
+
+
+class _ByteRangeReader(io.RawIOBase):
+    """A raw binary reader that only returns the bytes of a file between two offsets."""
+
+    def __init__(self, filepath: Path, start: int, end: int):
+        self._file = open(filepath, "rb")
+        self._file.seek(start)
+        self._remaining = end - start
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), self._remaining)
+        if size <= 0:
+            return 0
+        bytes_read = self._file.readinto(memoryview(buffer)[:size])
+        self._remaining -= bytes_read
+        return bytes_read
+
+    def close(self) -> None:
+        self._file.close()
+        super().close()
+
+
+def open_byte_range(filepath: Path, start: int, end: int) -> TextIO:
+    """Opens the bytes of a file between two offsets for reading as text.
+
+    The range is decoded and split into lines exactly like open(filepath, "r") would, so a range returned
+    by split_file can be processed like a small file of its own.
+
+    Args:
+        filepath: The Path object pointing to the file.
+        start: The offset of the first byte of the range.
+        end: The offset right after the last byte of the range.
+
+    Returns:
+        The byte range opened in text mode.
+    """
+    raw_reader = _ByteRangeReader(filepath, start, end)
+    return io.TextIOWrapper(io.BufferedReader(raw_reader), encoding=locale.getpreferredencoding(False))
@@ -0,0 +1,31 @@
+import importlib.util
+import sys
+from types import ModuleType
+
+
+def lazy_import(name: str) -> ModuleType:
+    """Returns a module that is only imported when one of its attributes is first used.
+
+    Heavy dependencies such as NumPy and pandas are imported this way at the top of a module, so code
+    paths that never use them, like --help, don't pay for importing them. Annotations using the module
+    must not be evaluated at import time, which from __future__ import annotations takes care of.
+
+    Args:
+        name: The name of a top-level module, e.g. "numpy".
+
+    Returns:
+        The module, or the already imported module if it was imported before.
+
+    Raises:
+        ModuleNotFoundError: If the module is not installed.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,343 @@
+import argparse
+import cProfile
+import inspect
+import json
+import os
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable, Iterable, Iterator
+from datetime import datetime, timezone
+from functools import wraps
+from pathlib import Path
+from typing import Any, TextIO, TypeVar
+
+try:
+    import resource
+except ImportError:  # not available on Windows, the RSS of each stage is then left out
+    resource = None
+
+T = TypeVar("T")
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser) -> None:
+    """Adds the command line arguments shared by every script that can be profiled.
+
+    Args:
+        parser: The argument parser of the script.
+    """
+    parser.add_argument("--profile", type=str, nargs="?", const="-", default=None, metavar="FILE",
+                        help="append the wall and CPU time, throughput and memory of each stage as JSON lines to FILE (default: stderr)")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="also trace the peak Python memory of each stage with tracemalloc, which slows the run down")
+    parser.add_argument("--profile-dump", type=str, default=None, metavar="FILE",
+                        help="write the cProfile stats of the slowest top-level stage to FILE, readable with pstats")
+
+
+def peak_rss() -> int | None:
+    """Returns the peak resident set size of the process in bytes, or None where it can't be measured."""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def children_cpu_time() -> float:
+    """Returns the CPU time used by the finished child processes, e.g. the workers of a process pool."""
+    times = os.times()
+    return times.children_user + times.children_system
+
+
+class Stage:
+    """The measurements of one stage of a pipeline, returned by Profiler.stage.
+
+    Attributes:
+        name: The name of the stage.
+        parent: The name of the stage this stage runs in, or None for a top-level stage.
+        rows: The number of rows, lines or names processed by the stage.
+        nbytes: The number of bytes processed by the stage.
+    """
+
+    def __init__(self, profiler: "Profiler", name: str, rows: int = 0, nbytes: int = 0):
+        self.profiler = profiler
+        self.name = name
+        self.parent = profiler.stack[-1].name if profiler.stack else None
+        self.rows = rows
+        self.nbytes = nbytes
+        self.tracemalloc_peak = 0
+
+    def add(self, rows: int = 0, nbytes: int = 0) -> None:
+        """Adds to the row and byte counts of the stage."""
+        self.rows += rows
+        self.nbytes += nbytes
+
+    def __enter__(self) -> "Stage":
+        self.profiler.enter(self)
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.profiler.exit(self)
+
+
+class NullStage:
+    """A stage that measures nothing, returned when profiling is off."""
+
+    def add(self, rows: int = 0, nbytes: int = 0) -> None:
+        pass
+
+    def __enter__(self) -> "NullStage":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        pass
+
+
+NULL_STAGE = NullStage()
+
+
+class NullProfiler:
+    """A profiler that measures nothing, so the stages of a run cost next to nothing when profiling is off."""
+
+    def stage(self, name: str, rows: int = 0, nbytes: int = 0) -> NullStage:
+        return NULL_STAGE
+
+    def iterate(self, name: str, items: Iterable[T], nbytes: Callable[[T], int] | None = None) -> Iterable[T]:
+        return items
+
+    def add(self, rows: int = 0, nbytes: int = 0) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class Profiler:
+    """Measures the stages of a run and writes one JSON line per stage.
+
+    A stage is either a block of code timed with the stage context manager or an iterator timed with
+    iterate, which only counts the time spent producing its items, so the steps of a streaming pipeline
+    can be told apart. Every stage records its wall and CPU time, its row and byte counts and their
+    throughput, and the peak RSS of the process when it ended. With trace_memory the peak Python memory
+    allocated during each block stage is traced as well, and with dump_path the slowest top-level stage
+    is run under cProfile and its stats are written when the profiler is closed.
+
+    Args:
+        script: The name of the script, included in every line.
+        output: The file the JSON lines are written to.
+        trace_memory: If True the peak memory of each stage is traced with tracemalloc.
+        dump_path: The file the cProfile stats of the slowest top-level stage are written to.
+    """
+
+    def __init__(self, script: str, output: TextIO = sys.stderr, trace_memory: bool = False, dump_path: Path | None = None):
+        self.script = script
+        self.output = output
+        self.trace_memory = trace_memory
+        self.dump_path = dump_path
+        self.pid = os.getpid()
+        self.run = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        self.stack: list[Stage] = []
+        self.slowest_profile: tuple[float, str, cProfile.Profile] | None = None
+        self.start_wall = time.perf_counter()
+        self.start_cpu = time.process_time()
+        self.start_children_cpu = children_cpu_time()
+        if trace_memory:
+            tracemalloc.start()
+
+    def stage(self, name: str, rows: int = 0, nbytes: int = 0) -> Stage:
+        """Returns a context manager measuring the block it wraps as a stage.
+
+        Args:
+            name: The name of the stage.
+            rows: The number of rows processed by the stage, if known beforehand.
+            nbytes: The number of bytes processed by the stage, if known beforehand.
+        """
+        return Stage(self, name, rows, nbytes)
+
+    def add(self, rows: int = 0, nbytes: int = 0) -> None:
+        """Adds to the row and byte counts of the innermost stage that is running."""
+        if self.stack:
+            self.stack[-1].add(rows, nbytes)
+
+    def enter(self, stage: Stage) -> None:
+        """Starts measuring a stage, called when a stage context manager is entered."""
+        if self.trace_memory:
+            # The peak so far belongs to the enclosing stage, the peak of this stage is counted from here
+            if self.stack:
+                self.stack[-1].tracemalloc_peak = max(self.stack[-1].tracemalloc_peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        stage.cprofile = cProfile.Profile() if self.dump_path and not self.stack else None
+        self.stack.append(stage)
+        stage.start_rss = peak_rss()
+        stage.start_children_cpu = children_cpu_time()
+        stage.start_cpu = time.process_time()
+        stage.start_wall = time.perf_counter()
+        if stage.cprofile:
+            stage.cprofile.enable()
+
+    def exit(self, stage: Stage) -> None:
+        """Stops measuring a stage and writes its line, called when a stage context manager exits."""
+        if stage.cprofile:
+            stage.cprofile.disable()
+        wall_time = time.perf_counter() - stage.start_wall
+        cpu_time = time.process_time() - stage.start_cpu
+        self.stack.pop()
+        record = {
+            "cpu_s": cpu_time,
+            "children_cpu_s": children_cpu_time() - stage.start_children_cpu,
+            "peak_rss_bytes": peak_rss(),
+            "rss_growth_bytes": peak_rss() - stage.start_rss if resource else None,
+        }
+        if self.trace_memory:
+            stage.tracemalloc_peak = max(stage.tracemalloc_peak, tracemalloc.get_traced_memory()[1])
+            record["tracemalloc_peak_bytes"] = stage.tracemalloc_peak
+            if self.stack:
+                self.stack[-1].tracemalloc_peak = max(self.stack[-1].tracemalloc_peak, stage.tracemalloc_peak)
+        if stage.cprofile and (self.slowest_profile is None or wall_time > self.slowest_profile[0]):
+            self.slowest_profile = (wall_time, stage.name, stage.cprofile)
+        self.write(stage.name, stage.parent, "block", wall_time, stage.rows, stage.nbytes, record)
+
+    def iterate(self, name: str, items: Iterable[T], nbytes: Callable[[T], int] | None = None) -> Iterator[T]:
+        """Measures an iterator as a stage, counting each item it yields as a row.
+
+        Only the time spent producing the items is counted, not the time the consumer spends on them, but it
+        includes the iterators the items are produced from, e.g. drop_empty_rows includes read_csv.
+        The stage is written when the iterator is exhausted or closed. Memory isn't traced for iterators,
+        as their items are produced interleaved with the other stages of the pipeline.
+
+        Args:
+            name: The name of the stage.
+            items: The iterable measured.
+            nbytes: Returns the size of an item in bytes, if the bytes should be counted.
+
+        Returns:
+            An iterator yielding the same items.
+        """
+        parent = self.stack[-1].name if self.stack else None
+        perf_counter = time.perf_counter
+        wall_time = 0.0
+        rows = 0
+        size = 0
+        try:
+            start = perf_counter()
+            for item in items:
+                wall_time += perf_counter() - start
+                rows += 1
+                if nbytes:
+                    size += nbytes(item)
+                yield item
+                start = perf_counter()
+            wall_time += perf_counter() - start
+        finally:
+            self.write(name, parent, "iterator", wall_time, rows, size, {"peak_rss_bytes": peak_rss()})
+
+    def write(self, name: str, parent: str | None, kind: str, wall_time: float, rows: int, nbytes: int,
+              measurements: dict[str, Any]) -> None:
+        """Writes the JSON line of a stage."""
+        record = {
+            "run": self.run,
+            "script": self.script,
+            "stage": name,
+            "parent": parent,
+            "kind": kind,
+            "wall_s": wall_time,
+            **measurements,
+            "rows": rows,
+            "bytes": nbytes,
+            "rows_per_s": rows / wall_time if rows and wall_time else None,
+            "mb_per_s": nbytes / 1024**2 / wall_time if nbytes and wall_time else None,
+        }
+        self.output.write(json.dumps(record) + "\n")
+
+    def close(self) -> None:
+        """Writes the line of the whole run and the cProfile stats of the slowest stage."""
+        measurements = {
+            "cpu_s": time.process_time() - self.start_cpu,
+            "children_cpu_s": children_cpu_time() - self.start_children_cpu,
+            "peak_rss_bytes": peak_rss(),
+        }
+        if self.trace_memory:
+            measurements["tracemalloc_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        if self.slowest_profile:
+            _, stage_name, profile = self.slowest_profile
+            profile.dump_stats(self.dump_path)
+            measurements["cprofile_stage"] = stage_name
+            measurements["cprofile_dump"] = str(self.dump_path)
+        self.write("total", None, "run", time.perf_counter() - self.start_wall, 0, 0, measurements)
+        if self.output not in (sys.stdout, sys.stderr):
+            self.output.close()
+
+
+_active_profiler: Profiler | NullProfiler = NULL_PROFILER
+
+
+def get_profiler() -> Profiler | NullProfiler:
+    """Returns the profiler of the run, or a NullProfiler if profiling is off.
+
+    Worker processes forked from a profiled run get a NullProfiler, so they don't write to the output of
+    the parent process.
+    """
+    if _active_profiler is not NULL_PROFILER and _active_profiler.pid != os.getpid():
+        return NULL_PROFILER
+    return _active_profiler
+
+
+def start_profiler(args: argparse.Namespace, script: str) -> Profiler | NullProfiler:
+    """Starts profiling the run if requested by the command line arguments added by add_profile_arguments.
+
+    Args:
+        args: The parsed command line arguments.
+        script: The name of the script.
+
+    Returns:
+        The profiler of the run, a NullProfiler if --profile wasn't given.
+
+    Raises:
+        OSError: If the profile file cannot be opened.
+    """
+    global _active_profiler
+    if args.profile is None:
+        _active_profiler = NULL_PROFILER
+    else:
+        output = sys.stderr if args.profile == "-" else open(args.profile, "a")
+        dump_path = Path(args.profile_dump) if args.profile_dump else None
+        _active_profiler = Profiler(script, output, args.profile_memory, dump_path)
+    return _active_profiler
+
+
+def stop_profiler() -> None:
+    """Closes the profiler of the run and turns profiling off."""
+    global _active_profiler
+    _active_profiler.close()
+    _active_profiler = NULL_PROFILER
+
+
+def profiled(name: str, nbytes: Callable[[Any], int] | None = None) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """Decorates a function to be measured as a stage by the profiler of the run.
+
+    Calls of generator functions are measured as iterator stages, every other function as a block stage.
+    When profiling is off the only cost is one call to get_profiler per call of the function.
+
+    Args:
+        name: The name of the stage.
+        nbytes: Returns the size in bytes of an item yielded by a generator function.
+
+    Returns:
+        The decorator.
+    """
+    def decorator(func: Callable[..., T]) -> Callable[..., T]:
+        if inspect.isgeneratorfunction(func):
+            @wraps(func)
+            def wrapper(*args: Any, **kwargs: Any) -> T:
+                return get_profiler().iterate(name, func(*args, **kwargs), nbytes)
+        else:
+            @wraps(func)
+            def wrapper(*args: Any, **kwargs: Any) -> T:
+                with get_profiler().stage(name):
+                    return func(*args, **kwargs)
+        return wrapper
+    return decorator
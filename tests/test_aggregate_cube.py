@@ -0,0 +1,74 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+sys.path.insert(0, str(PROJECT_ROOT / "Delopgave_4"))
+from aggregate_cube import AggregateCube, update_cube
+from benchmarks.generators import generate_housing_file
+from intro_pandas import aggregate_in_chunks, regional_price_statistics
+
+
+class TestAggregateCube(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.dir = Path(self.temp_dir.name)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_statistics_match_chunked_aggregates(self):
+        csv_path = self.dir / "housing.csv"
+        generate_housing_file(csv_path, 5_000)
+        cube, _ = update_cube(csv_path, chunk_size=700)
+        statistics = regional_price_statistics(aggregate_in_chunks(csv_path, chunk_size=300))
+
+        np.testing.assert_array_equal(cube.query("region", statistic="count").to_numpy(), statistics["count"].to_numpy())
+        np.testing.assert_allclose(cube.query("region", statistic="mean").to_numpy(), statistics["mean"].to_numpy(), rtol=1e-12)
+        np.testing.assert_allclose(cube.query("region", statistic="var").to_numpy(), statistics["var"].to_numpy(), rtol=1e-9)
+
+    def test_constant_prices_have_zero_variance(self):
+        cube = AggregateCube()
+        for _ in range(3):
+            cube.add_rows(pd.DataFrame({"region": ["Zealand"] * 7, "house_type": ["Villa"] * 7,
+                                        "purchase_price": [3123457.1] * 7, "quarter": ["2020Q1"] * 7}))
+        summary = cube.summary("region")
+        self.assertEqual(summary.loc["Zealand", "count"], 21)
+        self.assertGreaterEqual(cube.query("region", statistic="var").iloc[0], 0.0)
+        self.assertAlmostEqual(summary.loc["Zealand", "std"], 0.0, places=6)
+
+    def test_missing_values_match_pandas(self):
+        csv_path = self.dir / "housing.csv"
+        generate_housing_file(csv_path, 3_000)
+        df = pd.read_csv(csv_path)
+        rng = np.random.default_rng(0)
+        for column in ("region", "house_type", "purchase_price", "quarter"):
+            df.loc[rng.random(len(df)) < 0.05, column] = np.nan
+        # A region whose prices are all missing still has sales
+        df.loc[df["region"] == "Bornholm", "purchase_price"] = np.nan
+        df.to_csv(csv_path, index=False)
+        df = pd.read_csv(csv_path)
+        cube, rows_added = update_cube(csv_path)
+        self.assertEqual(rows_added, len(df))
+
+        pd.testing.assert_series_equal(cube.query("house_type", statistic="count").sort_values(ascending=False, kind="stable"),
+                                       df["house_type"].value_counts().sort_index().sort_values(ascending=False, kind="stable"),
+                                       check_index_type=False)
+        prices = df.groupby("region")["purchase_price"]
+        for statistic in ("mean", "std", "min", "max", "sum"):
+            with self.subTest(statistic=statistic):
+                np.testing.assert_allclose(cube.query("region", statistic=statistic).to_numpy(),
+                                           prices.agg(statistic).to_numpy(), rtol=1e-9)
+        self.assertTrue(np.isnan(cube.query("region", statistic="mean")["Bornholm"]))
+        by_quarter = df.groupby(["region", "quarter"]).size()
+        np.testing.assert_array_equal(cube.query(["region", "period"], statistic="count").to_numpy(), by_quarter.to_numpy())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+sys.path.insert(0, str(PROJECT_ROOT / "Delopgave_4"))
+from batch_plots import PlotSpec, compute_plot_data, compute_plots_data, default_plot_specs, render_plots
+from benchmarks.generators import generate_housing_file
+
+
+class TestBatchPlots(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.dir = Path(self.temp_dir.name)
+        csv_path = self.dir / "housing.csv"
+        generate_housing_file(csv_path, 2_000)
+        self.df = pd.read_csv(csv_path)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_batched_data_matches_each_spec(self):
+        specs = default_plot_specs(self.df) + [
+            PlotSpec("rooms_in_villas_on_bornholm", "", "no_rooms", where={"region": "Bornholm", "house_type": "Villa"}),
+            PlotSpec("sqm_of_farm_auctions", "", "city", "mean", "sqm", where={"house_type": "Farm", "sales_type": "auction"}),
+            PlotSpec("no_rows", "", "no_rooms", where={"region": "Atlantis"}),
+            PlotSpec("filtered_on_grouped_column", "", "region", where={"region": "Bornholm"}),
+        ]
+        # The small frame has many ties, whose order has to match value_counts
+        for df in (self.df, self.df.head(50)):
+            for spec, data in zip(specs, compute_plots_data(df, specs)):
+                pd.testing.assert_series_equal(data, compute_plot_data(df, spec))
+
+    def test_no_specs(self):
+        self.assertEqual(render_plots(self.df, [], self.dir / "plots", workers=2), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,26 @@
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from batch_runner import SCRIPTS, Job, run_job
+
+
+class TestBatchRunner(unittest.TestCase):
+
+    def test_handled_errors_fail_the_job(self):
+        for script, (_, input_argument) in SCRIPTS.items():
+            with self.subTest(script=script):
+                argv = list(sys.argv)
+                result = run_job(Job(script, [input_argument, "/nonexistent/input.csv", "--no-cache"]))
+                self.assertEqual(result.exit_code, 1, result.output)
+                self.assertEqual(sys.argv, argv)
+
+    def test_help_succeeds(self):
+        result = run_job(Job("intro_to_python", ["--help"]))
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("usage", result.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
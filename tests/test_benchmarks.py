@@ -0,0 +1,39 @@
+import multiprocessing
+import sys
+import time
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from benchmarks.run import _wait_for_measurement, compare_results
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_dead_process_is_a_failure(self):
+        context = multiprocessing.get_context("spawn")
+        results = context.Queue()
+        process = context.Process(target=sys.exit, args=(3,))
+        process.start()
+        self.assertEqual(_wait_for_measurement(process, results, None), "the benchmark process exited with code 3")
+        process.join()
+
+    def test_timeout_terminates_the_process(self):
+        context = multiprocessing.get_context("spawn")
+        results = context.Queue()
+        process = context.Process(target=time.sleep, args=(60,))
+        process.start()
+        self.assertEqual(_wait_for_measurement(process, results, 0.5), "timed out after 0.5 s")
+        process.join()
+        self.assertIsNotNone(process.exitcode)
+
+    def test_failed_benchmarks_are_not_compared(self):
+        baseline = [{"benchmark": "names", "size": 10, "median_time": 1.0, "tracemalloc_peak_bytes": 100}]
+        results = [{"benchmark": "names", "size": 10, "error": "timed out after 1 s"}]
+        self.assertEqual(compare_results(results, baseline), [])
+        results = [{"benchmark": "names", "size": 10, "median_time": 2.0, "tracemalloc_peak_bytes": 100}]
+        self.assertEqual(len(compare_results(results, baseline)), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
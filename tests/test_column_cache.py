@@ -0,0 +1,37 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+sys.path.insert(0, str(PROJECT_ROOT / "Delopgave_4"))
+from column_cache import load_column_cache, write_column_cache
+
+
+class TestColumnCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.csv_path = Path(self.temp_dir.name) / "data.csv"
+        self.csv_path.write_text("text,number,flag,date\nx,1,True,2020-01-01\ny,2.5,,2021-06-30\n,3,False,2022-12-31\n")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_round_trip_keeps_values_and_dtypes(self):
+        df = pd.read_csv(self.csv_path, parse_dates=["date"])
+        df["mixed"] = pd.Series([1.5, "z", None], dtype=object)
+        df["categories"] = pd.Categorical([3, 1, 3])
+        write_column_cache(df, self.csv_path)
+        cached = load_column_cache(self.csv_path)
+
+        pd.testing.assert_frame_equal(cached, df)
+        self.assertEqual(cached["flag"].tolist()[0::2], [True, False])
+        self.assertIsInstance(cached["mixed"][0], float)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "Delopgave_3"))
+from customer_columns import build_columns, load_npz, rows_to_columns, save_npz, write_columns_csv
+from error_handling import drop_empty_rows, drop_invalid_id, read_csv
+
+CSV_HEADER = "customer_id,name,email,purchase_amount\n"
+
+
+class TestCustomerColumns(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.dir = Path(self.temp_dir.name)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write_input(self, lines: list[str]) -> Path:
+        input_path = self.dir / "input.csv"
+        input_path.write_text(CSV_HEADER + "".join(line + "\n" for line in lines))
+        return input_path
+
+    def test_columnar_output_matches_drop_rows_output(self):
+        input_path = self.write_input([
+            "1,Hailey Little,hailey.little@yahoo.com,718.240",
+            "2,Mark Luna,mark.luna@gmail.com,830.34",
+            "3,Amy Chavez,,839.99",
+            "-4,Ashley Glenn,ashley.glenn@hotmail.com,418.04",
+            "5,Ida Sørensen,ida@example.dk,1e3",
+            "6, Bo Berg ,bo@example.dk,  0.1000 ",
+            "nan,Jon Holm,jon@example.dk,12",
+            "007,Kim Lund,kim@example.dk,100",
+            "8,Lis Ravn,lis@example.dk,-0.0",
+            "9223372036854775807,Max Id,max@example.dk,2.50",
+        ])
+        rows_output = "".join(",".join(row) + "\n" for row in drop_invalid_id(drop_empty_rows(read_csv(input_path))))
+
+        columns_path = self.dir / "columns.csv"
+        columns, _, _ = build_columns(read_csv(input_path), batch_size=3)
+        write_columns_csv(columns, columns_path)
+        self.assertEqual(columns_path.read_bytes(), rows_output.encode())
+
+        npz_path = self.dir / "columns.npz"
+        save_npz(columns, npz_path)
+        npz_csv_path = self.dir / "npz.csv"
+        write_columns_csv(load_npz(npz_path), npz_csv_path)
+        self.assertEqual(npz_csv_path.read_bytes(), rows_output.encode())
+
+    def test_ids_outside_int64_are_dropped(self):
+        input_path = self.write_input([
+            "1,Hailey Little,hailey.little@yahoo.com,78.95",
+            "²,Mark Luna,mark.luna@gmail.com,830.34",
+            "12345678901234567890,Amy Chavez,amy@example.dk,839.99",
+            "9223372036854775808,Ashley Glenn,ashley@example.dk,418.04",
+            "٣,Bo Berg,bo@example.dk,1.00",
+        ])
+        columns, dropped_rows, _ = build_columns(read_csv(input_path))
+        self.assertEqual(columns.customer_id.tolist(), [1])
+        # The four invalid ids and the empty row after the last newline
+        self.assertEqual(dropped_rows, 5)
+
+    def test_header_only_input(self):
+        input_path = self.write_input([])
+        columns_path = self.dir / "columns.csv"
+        columns, dropped_rows, _ = build_columns(read_csv(input_path))
+        write_columns_csv(columns, columns_path)
+        self.assertEqual(columns_path.read_bytes(), b"")
+        self.assertEqual(len(columns.customer_id), 0)
+        self.assertEqual(rows_to_columns([])[1], 0)
+        # Rows that all have the wrong number of columns leave no ids to validate either
+        columns, dropped_rows, _ = build_columns(read_csv(self.write_input(["1,Hailey Little", "2"])))
+        self.assertEqual(len(columns.customer_id), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
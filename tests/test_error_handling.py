@@ -0,0 +1,148 @@
+import contextlib
+import io
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+sys.path.insert(0, str(PROJECT_ROOT / "Delopgave_3"))
+from benchmarks.generators import generate_customer_file
+import error_handling
+from error_handling import (Config, check_arguments, get_migration_checkpoint_path, get_partial_path, migrate_csv,
+                            migrate_csv_parallel, migrate_csv_resumable, setup_parser)
+
+
+class TestArguments(unittest.TestCase):
+
+    def parse(self, arguments: list[str]) -> None:
+        parser = setup_parser(Config())
+        with contextlib.redirect_stderr(io.StringIO()):
+            check_arguments(parser, parser.parse_args(arguments))
+
+    def assert_rejected(self, arguments: list[str]) -> None:
+        with self.assertRaises(SystemExit) as context:
+            self.parse(arguments)
+        self.assertEqual(context.exception.code, 2)
+
+    def test_workers_only_with_the_default_migration(self):
+        self.parse(["-d", "-w", "4"])
+        for mode in ("--verbose", "--columnar", "--integrity", "--resume"):
+            with self.subTest(mode=mode):
+                self.assert_rejected([mode, "-w", "4"])
+
+    def test_modes_are_exclusive(self):
+        for modes in (["--columnar", "--integrity"], ["--integrity", "--resume"], ["--columnar", "--resume"]):
+            with self.subTest(modes=modes):
+                self.assert_rejected(modes)
+
+    def test_options_need_their_mode(self):
+        self.parse(["--columnar", "--npz", "--memory-report"])
+        self.parse(["--integrity", "--spill"])
+        for arguments in (["--npz"], ["--memory-report", "--integrity"], ["--spill"], ["--spill", "--resume"],
+                          ["--verbose", "--resume"], ["--verbose", "--columnar"]):
+            with self.subTest(arguments=arguments):
+                self.assert_rejected(arguments)
+
+
+class TestParallelMigration(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.dir = Path(self.temp_dir.name)
+        patcher = mock.patch.object(Config, "logs_dir", str(self.dir / "logs"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def assert_outputs_match(self, csv_path: Path, worker_counts: tuple[int, ...]) -> None:
+        for drop_rows in (False, True):
+            expected_summary = migrate_csv(csv_path, drop_rows, "serial.csv")
+            expected = (self.dir / "logs" / "serial.csv").read_bytes()
+            for workers in worker_counts:
+                with self.subTest(drop_rows=drop_rows, workers=workers):
+                    summary = migrate_csv_parallel(csv_path, drop_rows, "parallel.csv", workers)
+                    self.assertEqual((self.dir / "logs" / "parallel.csv").read_bytes(), expected)
+                    self.assertEqual(summary, expected_summary)
+
+    def test_generated_file(self):
+        csv_path = self.dir / "customers.csv"
+        generate_customer_file(csv_path, 2_000)
+        self.assert_outputs_match(csv_path, (2, 3, 8))
+
+    def test_chunk_boundaries_around_the_header(self):
+        # With more workers than lines every line is a chunk of its own, so the header and the blank
+        # and empty rows before it end up in different chunks than the first data row
+        contents = {
+            "header_first": "id,name,email,amount\n1,Anna,anna@example.com,10\n2,,bo@example.com,20\nx,Carl,c@example.com,30\n3,Dorte,d@example.com,40",
+            "blank_lines_first": "\n\n,,,\nid,name,email,amount\n1,Anna,anna@example.com,10\n\nx,Carl,c@example.com,30\n3,Dorte,d@example.com,40\n",
+            "invalid_header": "\nname,id,email,amount\n1,Anna,anna@example.com,10\n3,Dorte,d@example.com,40\n",
+            # The first row left is skipped as the header even when its id is valid
+            "no_header": "\n,,,\n1,Anna,anna@example.com,10\n2,Bo,bo@example.com,20\n3,Dorte,d@example.com,40\n",
+        }
+        for name, content in contents.items():
+            with self.subTest(file=name):
+                csv_path = self.dir / f"{name}.csv"
+                csv_path.write_text(content)
+                self.assert_outputs_match(csv_path, (2, 3, 5, 50))
+
+
+class TestResumableMigration(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.dir = Path(self.temp_dir.name)
+        self.logs_dir = self.dir / "logs"
+        patcher = mock.patch.object(Config, "logs_dir", str(self.logs_dir))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.csv_path = self.dir / "customers.csv"
+        generate_customer_file(self.csv_path, 2_000)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def crash_after_checkpoints(self, drop_rows: bool, checkpoints: int) -> None:
+        """Runs migrate_csv_resumable until it has saved the given number of checkpoints, then stops it."""
+        save_checkpoint = error_handling.save_migration_checkpoint
+        calls = 0
+
+        def save_then_crash(*args):
+            nonlocal calls
+            save_checkpoint(*args)
+            calls += 1
+            if calls == checkpoints:
+                raise KeyboardInterrupt
+
+        with mock.patch.object(error_handling, "save_migration_checkpoint", save_then_crash):
+            with self.assertRaises(KeyboardInterrupt):
+                migrate_csv_resumable(self.csv_path, drop_rows, "resumed.csv", checkpoint_every=100)
+
+    def test_resumed_migration_matches_a_full_run(self):
+        output_path = self.logs_dir / "resumed.csv"
+        for drop_rows in (False, True):
+            with self.subTest(drop_rows=drop_rows):
+                expected_summary = migrate_csv(self.csv_path, drop_rows, "full.csv")
+                self.crash_after_checkpoints(drop_rows, checkpoints=5)
+                self.assertFalse(output_path.exists())
+                checkpoint = json.loads(get_migration_checkpoint_path(output_path).read_text())
+                self.assertGreater(checkpoint["input_offset"], 0)
+                # Rows written after the checkpoint but never checkpointed are discarded by the next run
+                with open(get_partial_path(output_path), "a") as partial_file:
+                    partial_file.write("999,half written row")
+
+                summary = migrate_csv_resumable(self.csv_path, drop_rows, "resumed.csv", checkpoint_every=100)
+                self.assertEqual(output_path.read_bytes(), (self.logs_dir / "full.csv").read_bytes())
+                self.assertEqual(summary, expected_summary)
+                self.assertFalse(get_partial_path(output_path).exists())
+                self.assertFalse(get_migration_checkpoint_path(output_path).exists())
+                output_path.unlink()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "Delopgave_3"))
+from error_handling import read_csv
+from integrity import DUPLICATE_EMAIL, DUPLICATE_ID, INVALID_ID, check_integrity, get_quarantine_path
+
+CSV_HEADER = "customer_id,name,email,purchase_amount\n"
+
+
+class TestIntegrity(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.dir = Path(self.temp_dir.name)
+        lines = [
+            "1,Hailey Little,hailey.little@yahoo.com,718.24",
+            "2,Mark Luna,mark.luna@gmail.com,830.34",
+            "3,Amy Chavez,,839.99",
+            "²,Ashley Glenn,ashley.glenn@hotmail.com,418.04",
+            "001,Ida Sørensen,ida@example.dk,12.00",
+            "4,Bo Berg,MARK.LUNA@gmail.com,1.5",
+            '5,"Lis\nRavn",lis@example.dk,2.5',
+            "6,Kim Lund,kim@example.dk,inf",
+            "7,Jon Holm,jon@example.dk,100",
+            "8,Jon Holm,jon@example.dk",
+            "2,Mark Luna,mark.luna@gmail.com,830.34",
+        ]
+        # Many distinct rows after the dirty ones, so the small Bloom filter gives false positives
+        lines += [f"{number},Name {number},name{number}@example.dk,{number}.50" for number in range(10, 2000)]
+        self.input_path = self.dir / "input.csv"
+        self.input_path.write_text(CSV_HEADER + "".join(line + "\n" for line in lines))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def check(self, name: str, spill: bool) -> tuple[dict[str, int], bytes, bytes]:
+        output_path = self.dir / name
+        summary = check_integrity(read_csv(self.input_path), output_path, spill=spill, bloom_bytes=256)
+        return summary, output_path.read_bytes(), get_quarantine_path(output_path).read_bytes()
+
+    def test_spill_matches_in_memory(self):
+        memory_summary, memory_output, memory_quarantine = self.check("memory.csv", spill=False)
+        spill_summary, spill_output, spill_quarantine = self.check("spill.csv", spill=True)
+        self.assertEqual(spill_summary, memory_summary)
+        self.assertEqual(spill_output, memory_output)
+        self.assertEqual(spill_quarantine, memory_quarantine)
+
+    def test_reasons(self):
+        summary, _, _ = self.check("memory.csv", spill=False)
+        self.assertEqual(summary[INVALID_ID], 1)
+        self.assertEqual(summary[DUPLICATE_ID], 2)
+        self.assertEqual(summary[DUPLICATE_EMAIL], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+sys.path.insert(0, str(PROJECT_ROOT / "Delopgave_4"))
+from benchmarks.generators import generate_housing_file
+from intro_pandas import aggregate_in_chunks, compute_aggregates, finalise_aggregates, regional_price_statistics
+
+
+class TestChunkedAggregation(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.csv_path = Path(self.temp_dir.name) / "housing.csv"
+        generate_housing_file(self.csv_path, 1_000)
+        df = pd.read_csv(self.csv_path)
+        # Missing prices are left out of the price statistics but the sale still counts for its house type
+        df.loc[np.random.default_rng(0).random(len(df)) < 0.05, "purchase_price"] = np.nan
+        df.to_csv(self.csv_path, index=False)
+        self.df = pd.read_csv(self.csv_path)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_statistics_match_a_single_pass(self):
+        expected = self.df.groupby("region")["purchase_price"].agg(["count", "mean", "min", "max", "var"])
+        for chunk_size in (7, 250, 10_000):
+            with self.subTest(chunk_size=chunk_size):
+                statistics = regional_price_statistics(aggregate_in_chunks(self.csv_path, chunk_size))
+                np.testing.assert_array_equal(statistics.index, expected.index)
+                np.testing.assert_array_equal(statistics["count"], expected["count"])
+                np.testing.assert_array_equal(statistics[["min", "max"]], expected[["min", "max"]])
+                np.testing.assert_allclose(statistics["mean"], expected["mean"], rtol=1e-12)
+                np.testing.assert_allclose(statistics["var"], expected["var"], rtol=1e-9)
+
+    def test_series_match_compute_aggregates(self):
+        regional_prices, home_types = compute_aggregates(self.csv_path, use_column_cache=False)
+        for chunk_size in (7, 250, 10_000):
+            with self.subTest(chunk_size=chunk_size):
+                chunked_prices, chunked_home_types = finalise_aggregates(aggregate_in_chunks(self.csv_path, chunk_size))
+                pd.testing.assert_series_equal(chunked_prices, regional_prices, rtol=1e-12)
+                pd.testing.assert_series_equal(chunked_home_types, home_types, check_index_type=False)
+
+
+if __name__ == "__main__":
+    unittest.main()
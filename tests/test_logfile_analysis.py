@@ -0,0 +1,102 @@
+import contextlib
+import io
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+sys.path.insert(0, str(PROJECT_ROOT / "Delopgave_2"))
+from benchmarks.generators import generate_log_file
+from logfile_analysis import LOG_LEVELS, get_index_path, get_level_file_path, process_new_lines, query_time_range
+
+
+class TestTimeRange(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.log_path = Path(self.temp_dir.name) / "app.log"
+        generate_log_file(self.log_path, 5_000)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def query(self, use_index: bool = True) -> list[str]:
+        return list(query_time_range(self.log_path, "2024-02-25 12:00:00", "2024-02-25 13:00:00",
+                                     use_index=use_index, index_every=100))
+
+    def test_index_is_built_after_the_first_query(self):
+        expected = self.query(use_index=False)
+        self.assertTrue(expected)
+        self.assertFalse(get_index_path(self.log_path).exists())
+
+        messages = query_time_range(self.log_path, "2024-02-25 12:00:00", "2024-02-25 13:00:00", index_every=100)
+        first_message = next(messages)
+        # The first messages are found by binary search, before the index exists
+        self.assertFalse(get_index_path(self.log_path).exists())
+        self.assertEqual([first_message, *messages], expected)
+        self.assertTrue(get_index_path(self.log_path).exists())
+
+        self.assertEqual(self.query(), expected)
+
+    def test_index_is_extended_with_appended_lines(self):
+        self.query()
+        with open(self.log_path, "a") as file:
+            file.writelines(f"2024-03-01 00:00:{second:02} INFO appended\n" for second in range(10))
+        messages = list(query_time_range(self.log_path, "2024-03-01 00:00:05", index_every=100))
+        self.assertEqual(messages, [f"2024-03-01 00:00:{second:02} INFO appended" for second in range(5, 10)])
+
+
+
+class TestIncremental(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.dir = Path(self.temp_dir.name)
+        self.log_path = self.dir / "app.log"
+        self.logs_dir = self.dir / "logs"
+        self.logs_dir.mkdir()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def append(self, path: Path, lines: list[str]) -> None:
+        with open(path, "a") as file:
+            file.writelines(f"{line}\n" for line in lines)
+
+    def level_files(self) -> dict[str, list[str]]:
+        return {level: get_level_file_path(self.logs_dir, level).read_text().splitlines()
+                for level in LOG_LEVELS if get_level_file_path(self.logs_dir, level).exists()}
+
+    def test_lines_appended_before_rotation_are_kept(self):
+        self.append(self.log_path, ["2024-02-25 09:00:00 INFO first"])
+        process_new_lines(self.log_path, self.logs_dir)
+        self.append(self.log_path, ["2024-02-25 09:00:01 ERROR before rotation"])
+        self.log_path.rename(self.dir / "app.log.1")
+        self.append(self.log_path, ["2024-02-25 09:00:02 INFO after rotation"])
+        process_new_lines(self.log_path, self.logs_dir)
+
+        self.assertEqual(self.level_files()["INFO"], ["2024-02-25 09:00:00 INFO first", "2024-02-25 09:00:02 INFO after rotation"])
+        self.assertEqual(self.level_files()["ERROR"], ["2024-02-25 09:00:01 ERROR before rotation"])
+
+        # The next run only reads the lines appended to the new file
+        self.append(self.log_path, ["2024-02-25 09:00:03 ERROR later"])
+        process_new_lines(self.log_path, self.logs_dir)
+        self.assertEqual(self.level_files()["ERROR"], ["2024-02-25 09:00:01 ERROR before rotation", "2024-02-25 09:00:03 ERROR later"])
+
+    def test_missing_rotated_file_is_reported(self):
+        self.append(self.log_path, ["2024-02-25 09:00:00 INFO first"])
+        process_new_lines(self.log_path, self.logs_dir)
+        # Rotated to a name that isn't found next to the log, like a compressed app.log.1.gz
+        self.log_path.rename(self.dir / "old.log")
+        self.append(self.log_path, ["2024-02-25 09:00:02 INFO after rotation"])
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            process_new_lines(self.log_path, self.logs_dir)
+        self.assertIn("Warning", stderr.getvalue())
+        self.assertEqual(self.level_files()["INFO"], ["2024-02-25 09:00:00 INFO first", "2024-02-25 09:00:02 INFO after rotation"])
+
+
+if __name__ == "__main__":
+    unittest.main()